@@ -59,7 +59,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -85,6 +85,33 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Under ASGI (config.asgi enables ASYNC_VIEWS), the dashboard, activity feed
+# and course progress are served by async views (see courses.async_views),
+# which run their independent queries concurrently on ASYNC_QUERY_WORKERS
+# threads. This pool also bounds the database connections of a process.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+ASYNC_QUERY_WORKERS = int(os.environ.get('ASYNC_QUERY_WORKERS', 8))
+
+# Server-Sent Events stream of progress, activity and certificate events
+# (see courses.events, ASGI only): activity log polling interval, heartbeat
+# (seconds), per-connection queue size before a "resync", connections per
+# process and lifetime of the signed stream URLs
+SSE_POLL_INTERVAL = 1.0
+SSE_HEARTBEAT = 25
+SSE_QUEUE_SIZE = 50
+SSE_MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS', 5000))
+SSE_TICKET_TTL = 60 * 60
+
+# Streaks and leaderboards (see courses.gamification): leaderboards kept in
+# memory per process (most recently viewed first), and interval (seconds) at
+# which their pending updates are written to LeaderboardEntry and rows changed
+# by other processes are read back
+LEADERBOARD_SNAPSHOT_INTERVAL = 30
+LEADERBOARD_MAX_BOARDS = 200
+# Largest time increment (seconds) accepted from a single time-tracking call
+LEADERBOARD_MAX_TIME_INCREMENT = 15 * 60
 
 
 # Database
@@ -97,6 +124,19 @@ DATABASES = {
     }
 }
 
+# Cache shared by all worker processes: set CACHE_REDIS_URL in production.
+# Without it each process has its own local-memory cache, and entries that
+# must be seen by every worker (authenticated users, "not blacklisted"
+# refresh tokens) are not cached at all (see users.cache.cache_is_shared).
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,6 +157,37 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# The profile picks the hasher used for new passwords. Hashes made with the
+# other hashers still verify and are upgraded to the profile at next login.
+# 'argon2' requires the argon2-cffi package.
+
+PASSWORD_HASHING_PROFILE = os.environ.get('PASSWORD_HASHING_PROFILE', 'pbkdf2')
+
+PASSWORD_HASHING_PARAMS = {
+    'pbkdf2_iterations': int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 1_000_000)),
+    'scrypt_work_factor': int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2**14)),
+    'scrypt_block_size': int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8)),
+    'scrypt_parallelism': int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1)),
+    'argon2_time_cost': int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)),
+    'argon2_memory_cost': int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 65536)),
+    'argon2_parallelism': int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)),
+}
+
+_PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'users.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'users.hashers.TunedScryptPasswordHasher',
+    'argon2': 'users.hashers.TunedArgon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [_PASSWORD_HASHER_PROFILES[PASSWORD_HASHING_PROFILE]] + [
+    hasher for profile, hasher in _PASSWORD_HASHER_PROFILES.items()
+    if profile != PASSWORD_HASHING_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -139,6 +210,46 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded images: limits checked on upload, and size of the background pool
+# rendering their resized renditions (see users.images)
+IMAGE_UPLOAD_MAX_SIZE = 15 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+IMAGE_PROCESSING_WORKERS = 2
+
+# Uploads are stored under their content hash (see users.storage): those
+# names never change and are served with far-future cache headers. Django
+# serves MEDIA_URL when DEBUG is on or MEDIA_SERVE_UPLOADS is set; a front
+# web server serving MEDIA_ROOT itself must send the same headers for
+# hashed names (nginx: a location matching /[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}
+# with "add_header Cache-Control 'public, max-age=31536000, immutable'").
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_SERVE_UPLOADS = os.environ.get('MEDIA_SERVE_UPLOADS', '0') == '1'
+# Only these upload prefixes are public; lesson attachments and certificates
+# go through signed URLs (courses.media), so a front web server must not
+# serve MEDIA_ROOT as a whole either
+MEDIA_PUBLIC_PREFIXES = (
+    'profile_pictures/', 'courses/', 'renditions/profile_pictures/', 'renditions/courses/',
+)
+
+# Lesson attachments are served through signed, expiring URLs (see courses.media).
+# 'django' answers Range requests itself; 'x-accel' (nginx, internal location
+# aliasing MEDIA_ROOT at MEDIA_ACCEL_REDIRECT_PREFIX) and 'x-sendfile'
+# (Apache/lighttpd) let the web server send the file.
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+LESSON_MEDIA_URL_TTL = 6 * 60 * 60
+
+# Lesson content (see courses.content): validity period of the shared signed
+# URLs, lifetime of rendered bodies in the cache, and access tracking window
+LESSON_CONTENT_URL_TTL = 10 * 60
+LESSON_CONTENT_CACHE_TIMEOUT = 24 * 60 * 60
+LESSON_ACCESS_TRACK_WINDOW = 5 * 60
+
+# Course bundle imports (see courses.bundles): limits on the uncompressed
+# size (bytes) and the number of entries of an uploaded archive
+COURSE_BUNDLE_MAX_SIZE = 2 * 1024 ** 3
+COURSE_BUNDLE_MAX_ENTRIES = 20_000
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -181,8 +292,18 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
     'JTI_CLAIM': 'jti',
+    # Password changes revoke tokens through their login time (users.authentication),
+    # not a hash of the password: a rehash at login must not log other devices out
+    'CHECK_REVOKE_TOKEN': False,
+    # Refresh tokens check the blacklist through the cache (users.tokens)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.CachedTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.CachedTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers.CachedTokenBlacklistSerializer',
 }
 
+# Lifetime (seconds) of users cached by users.authentication.CachedJWTAuthentication
+AUTH_USER_CACHE_TIMEOUT = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -228,6 +349,6 @@ LOGGING = {
 }
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'users.backends.EmailBackend',
+    # Username or email in a single lookup (replaces ModelBackend + EmailBackend)
+    'users.backends.UsernameOrEmailBackend',
 ]
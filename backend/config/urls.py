@@ -1,8 +1,10 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
-from django.conf.urls.static import static
+from users.storage import serve_media
 
 
 urlpatterns = [
@@ -13,5 +15,12 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.DEBUG or settings.MEDIA_SERVE_UPLOADS:
+    # Content-hashed uploads are served with far-future cache headers
+    # (django.conf.urls.static.static only serves them when DEBUG is on)
+    urlpatterns += [
+        re_path(
+            r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            serve_media, {'document_root': settings.MEDIA_ROOT}
+        ),
+    ]
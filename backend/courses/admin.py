@@ -1,10 +1,96 @@
+import io
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.admin.utils import get_fields_from_path
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.shortcuts import render
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+from .enrollment import enroll_emails, read_emails
+from .versions import publish
 from .models import (
     Course, Category, Enrollment, Lesson, 
     Certificate, Skill, LessonProgress, 
     UserActivity, CourseSkill
 )
 
+# Les listes sont comptées jusqu'à cette limite ; au-delà d'une liste non filtrée,
+# le nombre de lignes est lu dans les statistiques de la base
+COUNT_LIMIT = getattr(settings, 'ADMIN_COUNT_LIMIT', 100_000)
+
+
+def estimated_row_count(model):
+    """Nombre de lignes de la table d'après les statistiques de la base, None si inconnu"""
+    connection = connections[model.objects.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            # Statistiques écrites par ANALYZE (ou PRAGMA optimize)
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NOT NULL LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Pagination sans COUNT(*) complet sur les grandes tables"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate >= COUNT_LIMIT:
+                return estimate
+        # Comptage borné : au-delà de la limite, seules les premières pages sont proposées
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    """
+    Listes des tables volumineuses : objets liés chargés par jointure
+    (list_select_related), nombre de lignes estimé, widgets de clés étrangères
+    sans liste déroulante complète et recherche par préfixe sur des colonnes
+    indexées.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Chaque champ est cherché dans sa propre table, sur son index, puis rattaché
+        # par clé étrangère : pas de OR sur une jointure, qui parcourrait toute la table
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return queryset, False
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            condition = Q()
+            for field in search_fields:
+                lookup = 'iexact' if field.startswith('=') else 'istartswith'
+                path, _, name = field.lstrip('^=').rpartition('__')
+                if path:
+                    related = get_fields_from_path(self.model, path)[-1].related_model
+                    matches = related._default_manager.filter(**{f'{name}__{lookup}': bit}).values('pk')
+                    condition |= Q(**{f'{path}__in': matches})
+                else:
+                    condition |= Q(**{f'{name}__{lookup}': bit})
+            queryset = queryset.filter(condition)
+        return queryset, False
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'color')
@@ -13,35 +99,81 @@ class CategoryAdmin(admin.ModelAdmin):
 class LessonInline(admin.TabularInline):
     model = Lesson
     extra = 1
+    raw_id_fields = ('section',)
 
 class CourseSkillInline(admin.TabularInline):
     model = CourseSkill
     extra = 1
+    autocomplete_fields = ('skill',)
+
+class CohortUploadForm(forms.Form):
+    csv_file = forms.FileField(label="Fichier CSV (emails en première colonne)")
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(PerformanceAdmin):
     list_display = ('title', 'category', 'created_by', 'created_at', 'is_active', 'level')
     list_filter = ('category', 'is_active', 'level', 'created_at')
-    search_fields = ('title', 'description')
+    list_select_related = ('category', 'created_by')
+    search_fields = ('^title',)
+    autocomplete_fields = ('category', 'created_by', 'instructors')
     inlines = [LessonInline, CourseSkillInline]
+    actions = ['enroll_cohort', 'publish_version']
+
+    @admin.action(description="Publier une nouvelle version des cours sélectionnés")
+    def publish_version(self, request, queryset):
+        created = sum(publish(course.pk, request.user)[1] for course in queryset.filter(status='published'))
+        self.message_user(request, f"{created} nouvelle(s) version(s) publiée(s)")
+
+    @admin.action(description="Inscrire une cohorte (CSV d'emails) aux cours sélectionnés")
+    def enroll_cohort(self, request, queryset):
+        if 'apply' in request.POST:
+            form = CohortUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                # Le fichier envoyé est lu en flux, sans être chargé en mémoire
+                upload = form.cleaned_data['csv_file']
+                stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                stats = enroll_emails(read_emails(stream), list(queryset.only('id', 'title', 'published_version')))
+                self.message_user(
+                    request,
+                    f"{stats['enrolled']} nouvelles inscriptions, {stats['unknown']} emails inconnus"
+                )
+                return None
+        else:
+            form = CohortUploadForm()
+        return render(request, 'admin/courses/course/enroll_cohort.html', {
+            **self.admin_site.each_context(request),
+            'title': "Inscrire une cohorte",
+            'opts': self.model._meta,
+            'courses': queryset,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(PerformanceAdmin):
     list_display = ('user', 'course', 'progress', 'enrolled_at', 'completed')
     list_filter = ('completed', 'enrolled_at')
-    search_fields = ('user__username', 'course__title')
+    list_select_related = ('user', 'course')
+    search_fields = ('^user__username', '^course__title')
+    autocomplete_fields = ('user', 'course')
+    raw_id_fields = ('course_version',)
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(PerformanceAdmin):
     list_display = ('title', 'course', 'order')
     list_filter = ('course',)
-    search_fields = ('title', 'description', 'course__title')
+    list_select_related = ('course',)
+    search_fields = ('^title', '^course__title')
     ordering = ('course', 'order')
+    autocomplete_fields = ('course',)
+    raw_id_fields = ('section',)
 
 @admin.register(Certificate)
-class CertificateAdmin(admin.ModelAdmin):
+class CertificateAdmin(PerformanceAdmin):
     list_display = ('user', 'course', 'issue_date', 'certificate_id')
-    search_fields = ('user__username', 'course__title', 'certificate_id')
+    list_select_related = ('user', 'course')
+    search_fields = ('^user__username', '^course__title', '=certificate_id')
+    autocomplete_fields = ('user', 'course')
 
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
@@ -49,13 +181,19 @@ class SkillAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(LessonProgress)
-class LessonProgressAdmin(admin.ModelAdmin):
+class LessonProgressAdmin(PerformanceAdmin):
     list_display = ('user', 'lesson', 'completed', 'completed_at')
     list_filter = ('completed', 'completed_at')
-    search_fields = ('user__username', 'lesson__title')
+    # Le libellé d'une leçon affiche le titre de son cours
+    list_select_related = ('user', 'lesson__course')
+    search_fields = ('^user__username', '^lesson__title')
+    autocomplete_fields = ('user', 'lesson')
+    raw_id_fields = ('course_version',)
 
 @admin.register(UserActivity)
-class UserActivityAdmin(admin.ModelAdmin):
+class UserActivityAdmin(PerformanceAdmin):
     list_display = ('user', 'activity_type', 'description', 'created_at')
     list_filter = ('activity_type', 'created_at')
-    search_fields = ('user__username', 'description')
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    autocomplete_fields = ('user', 'related_course', 'related_lesson')
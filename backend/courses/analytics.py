@@ -0,0 +1,146 @@
+"""
+Calcul des agrégats matérialisés des statistiques instructeurs.
+
+Les vues ne lisent que CourseAnalytics, LessonAnalytics et QuizAnalytics ;
+le calcul (quelques requêtes GROUP BY par cours) est fait par la commande
+refresh_analytics, de manière incrémentale : seuls les cours ayant eu une
+activité depuis le dernier rafraîchissement sont recalculés.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, Min, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Course, Enrollment, Lesson, LessonProgress, Quiz, QuizAttempt,
+    Certificate, CourseAnalytics, LessonAnalytics, QuizAnalytics
+)
+
+LESSON_FIELDS = [
+    'course', 'position', 'started_count', 'completed_count',
+    'drop_off', 'total_time_spent', 'avg_time_spent',
+]
+QUIZ_FIELDS = [
+    'course', 'attempt_count', 'student_count', 'passed_count',
+    'pass_rate', 'avg_score',
+]
+
+
+def refresh_course(course):
+    """Recalcule les agrégats d'un cours (une requête groupée par table source)"""
+    refreshed_at = timezone.now()
+
+    funnel = Enrollment.objects.filter(course=course).aggregate(
+        enrolled=Count('id'),
+        halfway=Count('id', filter=Q(progress__gte=50)),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    started = LessonProgress.objects.filter(
+        lesson__course=course
+    ).values('user_id').distinct().count()
+    certificates = Certificate.objects.filter(course=course).count()
+
+    lesson_stats = {
+        row['lesson_id']: row
+        for row in LessonProgress.objects.filter(lesson__course=course).values('lesson_id').annotate(
+            started=Count('id'),
+            completed=Count('id', filter=Q(completed=True)),
+            total_time=Sum('time_spent'),
+        ).order_by()
+    }
+    quiz_stats = {
+        row['quiz_id']: row
+        for row in QuizAttempt.objects.filter(quiz__lesson__course=course).values('quiz_id').annotate(
+            attempts=Count('id'),
+            students=Count('user_id', distinct=True),
+            passed=Count('user_id', filter=Q(passed=True), distinct=True),
+            average=Avg('score'),
+        ).order_by()
+    }
+
+    lessons = []
+    previous = funnel['enrolled']
+    lesson_ids = Lesson.objects.filter(course=course).order_by(
+        'section__order', 'order', 'id'
+    ).values_list('id', flat=True)
+    for position, lesson_id in enumerate(lesson_ids):
+        stats = lesson_stats.get(lesson_id, {})
+        started_count = stats.get('started', 0)
+        completed_count = stats.get('completed', 0)
+        total_time = stats.get('total_time') or 0
+        lessons.append(LessonAnalytics(
+            lesson_id=lesson_id,
+            course=course,
+            position=position,
+            started_count=started_count,
+            completed_count=completed_count,
+            drop_off=previous - completed_count,
+            total_time_spent=total_time,
+            avg_time_spent=total_time / started_count if started_count else 0,
+        ))
+        previous = completed_count
+
+    quizzes = []
+    for quiz_id in Quiz.objects.filter(lesson__course=course).values_list('id', flat=True):
+        stats = quiz_stats.get(quiz_id, {})
+        students = stats.get('students', 0)
+        quizzes.append(QuizAnalytics(
+            quiz_id=quiz_id,
+            course=course,
+            attempt_count=stats.get('attempts', 0),
+            student_count=students,
+            passed_count=stats.get('passed', 0),
+            pass_rate=stats.get('passed', 0) / students * 100 if students else 0,
+            avg_score=stats.get('average') or 0,
+        ))
+
+    with transaction.atomic():
+        CourseAnalytics.objects.update_or_create(
+            course=course,
+            defaults={
+                'enrolled_count': funnel['enrolled'],
+                'started_count': started,
+                'halfway_count': funnel['halfway'],
+                'completed_count': funnel['completed'],
+                'certificate_count': certificates,
+                'refreshed_at': refreshed_at,
+            }
+        )
+        LessonAnalytics.objects.bulk_create(
+            lessons, update_conflicts=True,
+            unique_fields=['lesson'], update_fields=LESSON_FIELDS,
+        )
+        QuizAnalytics.objects.bulk_create(
+            quizzes, update_conflicts=True,
+            unique_fields=['quiz'], update_fields=QUIZ_FIELDS,
+        )
+
+
+def stale_course_ids():
+    """Cours jamais calculés ou ayant eu une activité depuis le plus ancien rafraîchissement"""
+    course_ids = set(
+        Course.objects.filter(analytics__isnull=True).values_list('id', flat=True)
+    )
+    since = CourseAnalytics.objects.aggregate(since=Min('refreshed_at'))['since']
+    if since is None:
+        return course_ids
+    course_ids.update(
+        Enrollment.objects.filter(last_activity__gte=since).values_list('course_id', flat=True).distinct()
+    )
+    course_ids.update(
+        LessonProgress.objects.filter(last_accessed__gte=since).values_list('lesson__course_id', flat=True).distinct()
+    )
+    course_ids.update(
+        QuizAttempt.objects.filter(created_at__gte=since).values_list('quiz__lesson__course_id', flat=True).distinct()
+    )
+    return course_ids
+
+
+def refresh_stale():
+    """Rafraîchit les cours modifiés et avance le filigrane des autres, retourne le nombre de cours recalculés"""
+    started = timezone.now()
+    course_ids = stale_course_ids()
+    for course in Course.objects.filter(id__in=course_ids):
+        refresh_course(course)
+    # Sans activité depuis le filigrane, les agrégats des autres cours sont valides à "started"
+    CourseAnalytics.objects.filter(refreshed_at__lt=started).update(refreshed_at=started)
+    return len(course_ids)
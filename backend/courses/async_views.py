@@ -0,0 +1,266 @@
+"""
+Vues asynchrones des lectures à forte dispersion (tableau de bord, fil
+d'activité, progression d'un cours), servies à la place des vues DRF
+lorsque l'application tourne sous ASGI (ASYNC_VIEWS, voir config.asgi).
+
+Chaque vue lance ses groupes de requêtes indépendants en même temps : chaque
+groupe (requêtes et sérialisation) s'exécute dans un thread du pool
+ASYNC_QUERY_WORKERS, qui borne aussi le nombre de connexions à la base.
+Les lectures isolées passent par l'ORM asynchrone. Un processus ASGI sert
+ainsi de nombreux clients lents sans bloquer un worker par requête.
+
+Les réponses sont identiques à celles des vues synchrones de courses.views.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated
+
+from users.authentication import AUTH_TIME_CLAIM, CachedJWTAuthentication
+
+from . import events
+from .models import Certificate, Course, CourseSection, Enrollment, LessonProgress, Quiz, UserActivity
+from .serializers import CourseListSerializer, EnrollmentSerializer, UserActivitySerializer
+
+WORKERS = getattr(settings, 'ASYNC_QUERY_WORKERS', 8)
+
+_executor = None
+
+
+def _run(func):
+    try:
+        return func()
+    finally:
+        # Les threads du pool sont réutilisés : même règle que la fin d'une requête
+        close_old_connections()
+
+
+async def gather(*funcs):
+    """Exécute des fonctions synchrones indépendantes en parallèle et retourne leurs résultats"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='async-queries')
+    return await asyncio.gather(*(
+        sync_to_async(_run, thread_sensitive=False, executor=_executor)(func) for func in funcs
+    ))
+
+
+class AsyncAPIView(View):
+    """Vue asynchrone authentifiée par JWT (CachedJWTAuthentication), réponses JSON"""
+    http_method_names = ['get', 'head', 'options']
+
+    authentication = CachedJWTAuthentication()
+
+    async def authenticate(self, request):
+        return await self.authentication.aauthenticate(request)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await self.authenticate(request)
+            if user is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+            response = JsonResponse(detail, status=401)
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+            return response
+        request.user = user
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return JsonResponse({'detail': str(exc)}, status=404)
+
+
+class DashboardStatsView(AsyncAPIView):
+    """Vue asynchrone des statistiques du tableau de bord d'un utilisateur"""
+
+    async def get(self, request):
+        user = request.user
+
+        def in_progress():
+            enrollments = Enrollment.objects.filter(
+                user=user,
+                completed=False
+            ).select_related('course').order_by('-last_activity')[:5]
+            return EnrollmentSerializer(enrollments, many=True).data
+
+        def totals():
+            return (
+                Enrollment.objects.filter(user=user, completed=True).count(),
+                LessonProgress.objects.filter(user=user).aggregate(total=Sum('time_spent'))['total'] or 0,
+                Certificate.objects.filter(user=user).count(),
+            )
+
+        def recent_activities():
+            activities = UserActivity.objects.filter(user=user).order_by('-created_at')[:10]
+            return UserActivitySerializer(activities, many=True).data
+
+        def recommended():
+            # Cours populaires de catégories similaires aux inscriptions
+            user_categories = Enrollment.objects.filter(user=user).values_list('course__category', flat=True).distinct()
+            courses = Course.objects.filter(
+                status='published',
+                is_active=True
+            ).filter(
+                Q(category__in=user_categories) | Q(featured=True)
+            ).exclude(
+                enrollments__user=user
+            ).annotate(
+                enrollment_count=Count('enrollments')
+            ).order_by('-enrollment_count', '-created_at')[:5]
+            return CourseListSerializer(courses, many=True).data
+
+        courses, (completed_courses, total_time_spent, certificates_count), activities, recommended_courses = await gather(
+            in_progress, totals, recent_activities, recommended
+        )
+
+        return JsonResponse({
+            "courses_completed": completed_courses,
+            "total_hours_learned": round(total_time_spent / 3600, 1),
+            "certificates_earned": certificates_count,
+            "in_progress_courses": courses,
+            "recent_activities": activities,
+            "recommended_courses": recommended_courses
+        })
+
+
+class UserActivitiesView(AsyncAPIView):
+    """Vue asynchrone de l'historique d'activité de l'utilisateur connecté"""
+
+    async def get(self, request):
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 10))
+
+        filters = {'user': request.user}
+        activity_type = request.GET.get('type')
+        if activity_type:
+            filters['activity_type'] = activity_type
+
+        activities = UserActivity.objects.filter(
+            **filters
+        ).select_related(
+            'related_course', 'related_lesson'
+        ).order_by('-created_at')
+        start = (page - 1) * page_size
+
+        def page_data():
+            return UserActivitySerializer(activities[start:start + page_size], many=True).data
+
+        data, total_count = await gather(page_data, activities.count)
+
+        return JsonResponse({
+            "activities": data,
+            "total": total_count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total_count + page_size - 1) // page_size
+        })
+
+
+class CourseProgressView(AsyncAPIView):
+    """Vue asynchrone de la progression globale d'un cours"""
+
+    async def get(self, request, course_id):
+        user_id = request.user.id
+
+        def sections():
+            return list(CourseSection.objects.filter(course_id=course_id).prefetch_related('lessons'))
+
+        def progress():
+            return {
+                row['lesson_id']: row for row in LessonProgress.objects.filter(
+                    user_id=user_id, lesson__course_id=course_id
+                ).values('lesson_id', 'completed', 'last_position', 'time_spent')
+            }
+
+        def quizzes():
+            return set(Quiz.objects.filter(lesson__course_id=course_id).values_list('lesson_id', flat=True))
+
+        async def enrollment():
+            try:
+                return await Enrollment.objects.select_related('course').aget(user_id=user_id, course_id=course_id)
+            except Enrollment.DoesNotExist:
+                # Même message que get_object_or_404 dans la vue synchrone
+                model = Enrollment if await Course.objects.filter(id=course_id).aexists() else Course
+                raise Http404(f"No {model._meta.object_name} matches the given query.")
+
+        # L'inscription (qui vérifie aussi le cours) est lue pendant les autres requêtes
+        enrollment, (course_sections, lesson_progress, quiz_lessons) = await asyncio.gather(
+            enrollment(), gather(sections, progress, quizzes)
+        )
+
+        sections_data = []
+        for section in course_sections:
+            lessons_data = []
+            for lesson in section.lessons.all():
+                row = lesson_progress.get(lesson.id)
+                lessons_data.append({
+                    'id': lesson.id,
+                    'title': lesson.title,
+                    'duration': lesson.duration,
+                    'content_type': lesson.content_type,
+                    'has_quiz': lesson.id in quiz_lessons,
+                    'progress': {
+                        'completed': row['completed'],
+                        'last_position': row['last_position'],
+                        'time_spent': row['time_spent']
+                    } if row else {
+                        'completed': False,
+                        'last_position': 0,
+                        'time_spent': 0
+                    }
+                })
+            sections_data.append({
+                'id': section.id,
+                'title': section.title,
+                'order': section.order,
+                'lessons': lessons_data
+            })
+
+        return JsonResponse({
+            'course_id': enrollment.course.id,
+            'course_title': enrollment.course.title,
+            'overall_progress': enrollment.progress,
+            'completed': enrollment.completed,
+            'sections': sections_data,
+            'certificate_issued': enrollment.certificate_issued
+        })
+
+
+class EventStreamView(AsyncAPIView):
+    """Flux SSE des événements de progression, d'activité et de certificats de l'utilisateur"""
+
+    async def authenticate(self, request):
+        # EventSource n'envoie pas d'en-tête Authorization : ticket signé (voir EventTicketView)
+        ticket = request.GET.get('ticket')
+        if ticket is None:
+            return await super().authenticate(request)
+        payload = events.read_ticket(ticket)
+        if payload is None:
+            return None
+        # Mêmes vérifications qu'un jeton : compte actif, mot de passe inchangé depuis la connexion
+        user_id, auth_time = payload
+        user = await self.authentication.aget_user(user_id)
+        return self.authentication.check_user(user, {AUTH_TIME_CLAIM: auth_time})
+
+    async def get(self, request):
+        if events.hub.connections >= events.MAX_CONNECTIONS:
+            response = JsonResponse({'detail': "Trop de connexions, réessayez plus tard."}, status=503)
+            response['Retry-After'] = 30
+            return response
+
+        last_id = request.headers.get('Last-Event-ID')
+        subscriber = events.hub.subscribe(request.user.id)
+        response = StreamingHttpResponse(
+            events.stream(subscriber, int(last_id) if last_id and last_id.isdigit() else None),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx ne doit pas mettre le flux en tampon
+        return response
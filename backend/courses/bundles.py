@@ -0,0 +1,348 @@
+"""
+Export et import de cours complets (catégories, compétences, sections,
+leçons, quiz, questions, réponses, pièces jointes et images) sous forme
+d'une archive unique.
+
+Format de l'archive (zip) :
+- records.jsonl : les lignes de chaque modèle, dans l'ordre des dépendances.
+  Chaque bloc commence par un en-tête {"model": ..., "fields": [...]} suivi
+  d'une ligne par objet, un simple tableau de valeurs dans l'ordre des champs
+  (les clés étrangères sont les identifiants d'origine) ;
+- files/<nom> : les fichiers référencés par les champs fichier, sous leur nom
+  de stockage ;
+- manifest.json : format, cours exportés et nombre de lignes par modèle.
+
+L'export lit chaque modèle par curseur et écrit l'archive au fil de l'eau.
+L'import lit records.jsonl ligne à ligne et insère par lots (bulk_create) :
+seules les correspondances entre identifiants d'origine et nouveaux
+identifiants sont gardées en mémoire. Catégories et compétences existantes
+(même slug, même nom) sont réutilisées ; l'import est atomique.
+
+Les cours importés sont des brouillons actifs, sans mise en avant ni prix :
+statut, visibilité et tarif ne sont jamais repris de l'archive. La taille
+décompressée et le nombre d'entrées de l'archive sont plafonnés avant toute
+lecture (les tailles déclarées bornent ce que zipfile décompresse).
+"""
+import io
+import json
+import logging
+import posixpath
+import shutil
+import zipfile
+from collections import Counter
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from users.images import process_image, submit
+from users.storage import is_referenced
+from .models import Answer, Category, Course, CourseSection, CourseSkill, Lesson, Question, Quiz, Skill
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 'course-bundle'
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+RECORDS = 'records.jsonl'
+FILES_PREFIX = 'files/'
+DEFAULT_BATCH_SIZE = 1000
+# Lignes existantes réutilisées plutôt que réinsérées (absentes du décompte de l'import)
+REUSED = ('category', 'skill')
+# Plafonds de l'archive importée (taille décompressée totale en octets, nombre d'entrées)
+MAX_UNCOMPRESSED_SIZE = getattr(settings, 'COURSE_BUNDLE_MAX_SIZE', 2 * 1024 ** 3)
+MAX_ENTRIES = getattr(settings, 'COURSE_BUNDLE_MAX_ENTRIES', 20_000)
+# Champs des cours remis à leur valeur par défaut à l'import
+RESET_COURSE_FIELDS = ('status', 'is_active', 'featured', 'price', 'discount_price')
+
+# (nom, modèle, champs exportés, {clé étrangère: modèle référencé}) dans l'ordre des dépendances
+SPECS = [
+    ('category', Category, ('id', 'name', 'description', 'color', 'icon', 'slug'), {}),
+    ('skill', Skill, ('id', 'name'), {}),
+    ('course', Course, (
+        'id', 'title', 'slug', 'subtitle', 'description', 'image', 'thumbnail', 'category', 'total_hours',
+        'level', 'is_active', 'status', 'featured', 'price', 'discount_price', 'language', 'prerequisites',
+        'objectives', 'target_audience', 'syllabus', 'meta_keywords', 'certificate_available',
+    ), {'category': 'category'}),
+    ('course_skill', CourseSkill, ('course', 'skill'), {'course': 'course', 'skill': 'skill'}),
+    ('section', CourseSection, ('id', 'course', 'title', 'description', 'order'), {'course': 'course'}),
+    ('lesson', Lesson, (
+        'id', 'course', 'section', 'title', 'description', 'content_type', 'video_url', 'video_duration',
+        'content', 'order', 'duration', 'is_free', 'attachment',
+    ), {'course': 'course', 'section': 'section'}),
+    ('quiz', Quiz, (
+        'id', 'lesson', 'title', 'description', 'pass_percentage', 'questions_per_attempt', 'stratify_by',
+    ), {'lesson': 'lesson'}),
+    ('question', Question, ('id', 'quiz', 'text', 'explanation', 'order', 'tag', 'difficulty'), {'quiz': 'quiz'}),
+    ('answer', Answer, ('question', 'text', 'is_correct'), {'question': 'question'}),
+]
+SPECS_BY_NAME = {spec[0]: spec for spec in SPECS}
+
+
+class BundleError(Exception):
+    """Archive invalide ou incompatible avec la base"""
+
+
+def _file_fields(model, fields):
+    return [field for field in fields if isinstance(model._meta.get_field(field), models.FileField)]
+
+
+def _column(model, field):
+    # Les clés étrangères sont lues par leur colonne (course_id) sans jointure
+    return model._meta.get_field(field).attname
+
+
+def _querysets(course_ids):
+    """Lignes de chaque modèle rattachées aux cours, dans l'ordre de SPECS"""
+    return {
+        'category': Category.objects.filter(courses__id__in=course_ids).distinct(),
+        'skill': Skill.objects.filter(courseskill__course_id__in=course_ids).distinct(),
+        'course': Course.objects.filter(id__in=course_ids),
+        'course_skill': CourseSkill.objects.filter(course_id__in=course_ids),
+        'section': CourseSection.objects.filter(course_id__in=course_ids),
+        'lesson': Lesson.objects.filter(course_id__in=course_ids),
+        'quiz': Quiz.objects.filter(lesson__course_id__in=course_ids),
+        'question': Question.objects.filter(quiz__lesson__course_id__in=course_ids),
+        'answer': Answer.objects.filter(question__quiz__lesson__course_id__in=course_ids),
+    }
+
+
+def export_bundle(course_ids, output, chunk_size=DEFAULT_BATCH_SIZE):
+    """
+    Écrit l'archive des cours dans output (chemin ou fichier binaire, éventuellement
+    non positionnable) et retourne le manifeste
+    """
+    course_ids = list(course_ids)
+    querysets = _querysets(course_ids)
+    counts, files = Counter(), {}
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(RECORDS, 'w', force_zip64=True) as raw, io.TextIOWrapper(raw, encoding='utf-8') as records:
+            for name, model, fields, _ in SPECS:
+                file_fields = {fields.index(field): model._meta.get_field(field) for field in _file_fields(model, fields)}
+                records.write(json.dumps({'model': name, 'fields': fields}) + '\n')
+                rows = querysets[name].order_by('pk').values_list(*[_column(model, field) for field in fields])
+                for row in rows.iterator(chunk_size=chunk_size):
+                    for index, field in file_fields.items():
+                        if row[index]:
+                            files.setdefault(row[index], field.storage)
+                    records.write(json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n')
+                    counts[name] += 1
+
+        exported_files = []
+        for name, storage in files.items():
+            try:
+                source = storage.open(name, 'rb')
+            except FileNotFoundError:
+                logger.warning("Fichier absent du stockage, non exporté : %s", name)
+                continue
+            # Médias déjà compressés : stockés tels quels
+            with source, archive.open(zipfile.ZipInfo(FILES_PREFIX + name), 'w', force_zip64=True) as target:
+                shutil.copyfileobj(source, target)
+            exported_files.append(name)
+
+        manifest = {
+            'format': FORMAT,
+            'version': FORMAT_VERSION,
+            'exported_at': timezone.now().isoformat(),
+            'courses': list(Course.objects.filter(id__in=course_ids).order_by('id').values('id', 'slug', 'title')),
+            'counts': dict(counts),
+            'files': len(exported_files),
+        }
+        archive.writestr(MANIFEST, json.dumps(manifest, indent=2, ensure_ascii=False))
+    return manifest
+
+
+def check_limits(archive):
+    entries = archive.infolist()
+    if len(entries) > MAX_ENTRIES:
+        raise BundleError(f"Archive trop volumineuse : plus de {MAX_ENTRIES} entrées")
+    if sum(entry.file_size for entry in entries) > MAX_UNCOMPRESSED_SIZE:
+        raise BundleError(f"Archive trop volumineuse : plus de {MAX_UNCOMPRESSED_SIZE} octets décompressés")
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise BundleError("Archive sans manifeste : ce n'est pas un export de cours")
+    if manifest.get('format') != FORMAT:
+        raise BundleError(f"Format d'archive inconnu : {manifest.get('format')!r}")
+    if manifest.get('version') != FORMAT_VERSION:
+        raise BundleError(f"Version d'archive non prise en charge : {manifest.get('version')}")
+    return manifest
+
+
+class BundleImporter:
+    """Insère les lignes d'une archive par lots, en traduisant les clés étrangères"""
+
+    def __init__(self, archive, owner, batch_size=DEFAULT_BATCH_SIZE):
+        self.archive = archive
+        self.owner = owner
+        self.batch_size = batch_size
+        self.members = set(archive.namelist())
+        self.ids = {name: {} for name, *_ in SPECS}
+        self.counts = Counter()
+        self.restored = set()
+
+    def run(self):
+        spec, batch = None, []
+        with self.archive.open(RECORDS) as raw:
+            for number, line in enumerate(io.TextIOWrapper(raw, encoding='utf-8'), start=1):
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    self.flush(spec, batch)
+                    spec, batch = self.header(record, number), []
+                    continue
+                if spec is None or len(record) != len(spec[1]):
+                    raise BundleError(f"{RECORDS}, ligne {number} : ligne inattendue")
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self.flush(spec, batch)
+                    batch = []
+        self.flush(spec, batch)
+        return self.counts
+
+    def header(self, record, number):
+        if record.get('model') not in SPECS_BY_NAME:
+            raise BundleError(f"{RECORDS}, ligne {number} : modèle inconnu {record.get('model')!r}")
+        name, model, fields, _ = SPECS_BY_NAME[record['model']]
+        unknown = set(record['fields']) - set(fields)
+        if unknown:
+            raise BundleError(f"{RECORDS}, ligne {number} : champs inconnus pour {name} : {', '.join(sorted(unknown))}")
+        return name, record['fields']
+
+    def flush(self, spec, batch):
+        if not batch:
+            return
+        name, fields = spec
+        rows = [dict(zip(fields, values)) for values in batch]
+        getattr(self, f'insert_{name}', self.insert)(name, rows)
+
+    def restore_file(self, model, field_name, stored_name):
+        """Copie un fichier de l'archive dans le stockage et retourne son nouveau nom"""
+        member = FILES_PREFIX + stored_name
+        if not stored_name or member not in self.members:
+            return ''
+        field = model._meta.get_field(field_name)
+        filename = field.generate_filename(None, posixpath.basename(stored_name))
+        with self.archive.open(member) as source:
+            name = field.storage.save(filename, File(source, name=filename))
+        self.restored.add((model, field_name, name))
+        return name
+
+    def discard_files(self):
+        """Après annulation, supprime les fichiers copiés qu'aucune autre ligne n'utilise"""
+        for model, field_name, name in self.restored:
+            if not is_referenced(model, field_name, name):
+                model._meta.get_field(field_name).storage.delete(name)
+
+    def build(self, name, rows):
+        _, model, _, foreign_keys = SPECS_BY_NAME[name]
+        objs = []
+        for row in rows:
+            old_id = row.pop('id', None)
+            for field, target in foreign_keys.items():
+                if row.get(field) is not None:
+                    try:
+                        row[model._meta.get_field(field).attname] = self.ids[target][row.pop(field)]
+                    except KeyError:
+                        raise BundleError(f"{name} {old_id} : référence {field} absente de l'archive")
+                else:
+                    row.pop(field, None)
+            for field in _file_fields(model, row):
+                row[field] = self.restore_file(model, field, row[field])
+            objs.append((old_id, model(**row)))
+        return objs
+
+    def insert(self, name, rows, objs=None):
+        model = SPECS_BY_NAME[name][1]
+        objs = objs if objs is not None else self.build(name, rows)
+        created = model.objects.bulk_create([obj for _, obj in objs], batch_size=self.batch_size)
+        for (old_id, _), obj in zip(objs, created):
+            if old_id is not None:
+                self.ids[name][old_id] = obj.pk
+        self.counts[name] += len(created)
+        return created
+
+    def reuse(self, name, rows, key):
+        """Réutilise les lignes existantes de même clé (slug, nom), insère les autres"""
+        model = SPECS_BY_NAME[name][1]
+        existing = dict(model.objects.filter(**{f'{key}__in': [row[key] for row in rows]}).values_list(key, 'pk'))
+        missing = []
+        for row in rows:
+            if row[key] in existing:
+                self.ids[name][row['id']] = existing[row[key]]
+            else:
+                missing.append(row)
+        if missing:
+            self.insert(name, missing)
+
+    def insert_category(self, name, rows):
+        for row in rows:
+            # Comme Category.save, que bulk_create n'appelle pas
+            row['slug'] = row.get('slug') or slugify(row['name'])
+        self.reuse(name, rows, 'slug')
+
+    def insert_skill(self, name, rows):
+        self.reuse(name, rows, 'name')
+
+    def insert_course(self, name, rows):
+        conflicts = Course.objects.filter(slug__in=[row['slug'] for row in rows]).values_list('slug', flat=True)
+        if conflicts:
+            raise BundleError(f"Cours déjà présents (slug) : {', '.join(sorted(conflicts))}")
+        objs = self.build(name, rows)
+        for _, course in objs:
+            course.created_by = self.owner
+            for field in RESET_COURSE_FIELDS:
+                setattr(course, field, Course._meta.get_field(field).get_default())
+        created = self.insert(name, rows, objs)
+        # Les déclinaisons des images sont générées en arrière-plan, comme à l'envoi
+        for course in created:
+            for field_name in Course.RENDITION_FIELDS:
+                if getattr(course, field_name):
+                    submit(process_image, Course._meta.label, course.pk, field_name)
+
+    def insert_lesson(self, name, rows):
+        objs = self.build(name, rows)
+        for _, lesson in objs:
+            lesson.content_version = lesson.compute_content_version()
+        self.insert(name, rows, objs)
+
+
+def import_bundle(source, owner, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Importe une archive (chemin ou fichier binaire positionnable) ; les cours
+    importés appartiennent à owner. Retourne (identifiants des cours créés, lignes
+    insérées par modèle).
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise BundleError("Le fichier n'est pas une archive zip")
+
+    with archive:
+        check_limits(archive)
+        manifest = read_manifest(archive)
+        if RECORDS not in archive.namelist():
+            raise BundleError(f"Archive incomplète : {RECORDS} manquant")
+        importer = BundleImporter(archive, owner, batch_size=batch_size)
+        try:
+            with transaction.atomic():
+                counts = importer.run()
+                expected = {
+                    name: count for name, count in manifest.get('counts', {}).items() if count and name not in REUSED
+                }
+                if expected != {name: count for name, count in counts.items() if name not in REUSED}:
+                    raise BundleError("Archive incomplète : le nombre de lignes ne correspond pas au manifeste")
+        except Exception as exc:
+            importer.discard_files()
+            if isinstance(exc, (json.JSONDecodeError, UnicodeDecodeError, zipfile.BadZipFile)):
+                raise BundleError(f"Archive illisible : {exc}")
+            if isinstance(exc, IntegrityError):
+                raise BundleError(f"Archive incompatible avec la base : {exc}")
+            raise
+    return list(importer.ids['course'].values()), counts
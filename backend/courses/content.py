@@ -0,0 +1,156 @@
+"""
+Diffusion du contenu des leçons en deux temps.
+
+1. Autorisation (par utilisateur) : une requête vérifie l'accès à la leçon et
+   lit l'empreinte de son contenu ; une URL de contenu signée et de courte
+   durée est émise. Le suivi d'accès des étudiants inscrits (LessonProgress,
+   activité « leçon commencée ») est enregistré en arrière-plan, au plus une
+   fois par fenêtre, et ne ralentit donc pas l'ouverture de la leçon.
+2. Contenu (indépendant de l'utilisateur) : l'URL ne dépend que de la leçon,
+   de l'empreinte et d'une échéance arrondie, elle est donc identique pour
+   tous les étudiants pendant une même période et peut être mise en cache
+   par un CDN. Le corps JSON rendu est mis en cache par version (cache local
+   de chaque processus, ou partagé si CACHE_REDIS_URL est configuré) : une
+   copie locale ne peut pas devenir fausse, une nouvelle version du contenu
+   change la clé.
+"""
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Enrollment, Lesson, LessonProgress, UserActivity
+from .permissions import is_course_instructor
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité (secondes) des URLs de contenu ; elles changent une fois par période
+URL_TTL = getattr(settings, 'LESSON_CONTENT_URL_TTL', 10 * 60)
+# Durée de conservation du contenu rendu dans le cache
+CACHE_TIMEOUT = getattr(settings, 'LESSON_CONTENT_CACHE_TIMEOUT', 24 * 60 * 60)
+# Un accès n'est enregistré qu'une fois par fenêtre (secondes) et par leçon
+ACCESS_TRACK_WINDOW = getattr(settings, 'LESSON_ACCESS_TRACK_WINDOW', 5 * 60)
+SIGNING_SALT = 'courses.content.lesson'
+
+CONTENT_FIELDS = ['id', 'title', 'description', 'content_type', 'content', 'video_url', 'video_duration', 'duration']
+
+_signer = signing.Signer(salt=SIGNING_SALT)
+
+
+def authorize(user, lesson_id, fields=()):
+    """
+    Retourne la leçon si l'utilisateur peut la consulter : leçon gratuite,
+    inscription ou instructeur. None si la leçon n'existe pas, False si
+    l'accès est refusé. Seuls les champs d'autorisation sont chargés, plus
+    ceux demandés par `fields` ; l'annotation `enrolled` indique l'inscription.
+    """
+    lesson = Lesson.objects.filter(id=lesson_id).annotate(
+        enrolled=Exists(Enrollment.objects.filter(user=user, course_id=OuterRef('course_id')))
+    ).select_related('course').only(
+        'id', 'title', 'course_id', 'is_free', 'content_version', 'course__id', 'course__created_by', *fields
+    ).first()
+    if lesson is None:
+        return None
+    if lesson.is_free or lesson.enrolled or is_course_instructor(user, lesson.course):
+        return lesson
+    return False
+
+
+def content_version(lesson):
+    """Empreinte du contenu, calculée et enregistrée si la leçon a été créée en masse"""
+    if not lesson.content_version:
+        full = Lesson.objects.get(id=lesson.id)
+        lesson.content_version = full.compute_content_version()
+        Lesson.objects.filter(id=lesson.id).update(content_version=lesson.content_version)
+    return lesson.content_version
+
+
+def content_url(request, lesson):
+    """URL signée du contenu (identique pour tous les utilisateurs pendant une période) et son échéance"""
+    expires = (math.floor(time.time() / URL_TTL) + 2) * URL_TTL
+    token = _signer.sign_object({'l': lesson.id, 'v': content_version(lesson), 'e': expires})
+    url = reverse('lesson-content', kwargs={'token': token})
+    return request.build_absolute_uri(url) if request else url, datetime.fromtimestamp(expires, tz=dt_timezone.utc)
+
+
+def read_token(token):
+    """Retourne (lesson_id, version, échéance) ou None si le jeton est invalide ou expiré"""
+    try:
+        payload = _signer.unsign_object(token)
+    except signing.BadSignature:
+        return None
+    if payload['e'] < time.time():
+        return None
+    return payload['l'], payload['v'], payload['e']
+
+
+def rendered_content(lesson_id, version):
+    """Corps JSON du contenu depuis le cache, None si la version n'est plus la bonne"""
+    key = f"lesson-content:{lesson_id}:{version}"
+    body = cache.get(key)
+    if body is None:
+        data = Lesson.objects.filter(id=lesson_id, content_version=version).values(*CONTENT_FIELDS).first()
+        if data is None:
+            return None
+        data['version'] = version
+        body = json.dumps(data).encode()
+        cache.set(key, body, CACHE_TIMEOUT)
+    return body
+
+
+def record_access(user_id, lesson_id, course_id, title):
+    """Met à jour le suivi de la leçon ; la première consultation crée l'activité"""
+    updated = LessonProgress.objects.filter(user_id=user_id, lesson_id=lesson_id).update(
+        last_accessed=timezone.now()
+    )
+    if updated:
+        return
+    progress, created = LessonProgress.objects.get_or_create(user_id=user_id, lesson_id=lesson_id)
+    if created:
+        UserActivity.objects.create(
+            user_id=user_id,
+            activity_type='lesson_started',
+            description=f"A commencé la leçon '{title}'",
+            related_course_id=course_id,
+            related_lesson_id=lesson_id
+        )
+
+
+_executor = None
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Suivi d'accès aux leçons en échec")
+    finally:
+        connection.close()
+
+
+def track_access(user, lesson):
+    """
+    Enregistre l'accès en arrière-plan, au plus une fois par fenêtre. Les
+    accès sans inscription (leçon gratuite, instructeur) ne sont pas suivis.
+    """
+    if not lesson.enrolled:
+        return
+    if not cache.add(f"lesson-access:{user.id}:{lesson.id}", True, timeout=ACCESS_TRACK_WINDOW):
+        return
+
+    def start():
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lesson-access')
+        _executor.submit(_run, record_access, user.id, lesson.id, lesson.course_id, lesson.title)
+    transaction.on_commit(start)
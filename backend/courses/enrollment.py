@@ -0,0 +1,107 @@
+"""
+Inscription en masse d'utilisateurs à un ensemble de cours.
+
+Les entrées sont consommées par lots : pour chaque lot, une requête résout
+les emails, une requête récupère les inscriptions existantes, puis les
+inscriptions et activités manquantes sont insérées avec bulk_create. La
+mémoire utilisée dépend de la taille du lot, pas de la taille du fichier.
+"""
+import csv
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from .models import Enrollment, UserActivity
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 1000
+# Nouveaux essais d'un lot après un conflit avec une inscription concurrente
+CONFLICT_RETRIES = 3
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_emails(lines):
+    """Extrait les emails (première colonne) d'un flux CSV, ligne par ligne"""
+    for row in csv.reader(lines):
+        if row and '@' in row[0]:
+            yield row[0].strip().lower()
+
+
+def enroll_user_ids(user_ids, courses):
+    """Inscrit un lot d'utilisateurs aux cours donnés, retourne le nombre de nouvelles inscriptions"""
+    course_ids = [course.id for course in courses]
+    for attempt in range(CONFLICT_RETRIES):
+        try:
+            with transaction.atomic():
+                existing = set(
+                    Enrollment.objects.filter(
+                        user_id__in=user_ids, course_id__in=course_ids
+                    ).values_list('user_id', 'course_id')
+                )
+                missing = [
+                    (user_id, course)
+                    for user_id in user_ids
+                    for course in courses
+                    if (user_id, course.id) not in existing
+                ]
+                if not missing:
+                    return 0
+
+                # Sans ignore_conflicts : les activités correspondent exactement aux lignes insérées
+                Enrollment.objects.bulk_create([
+                    Enrollment(user_id=user_id, course=course, course_version_id=course.published_version_id, progress=0.0)
+                    for user_id, course in missing
+                ])
+                UserActivity.objects.bulk_create([
+                    UserActivity(
+                        user_id=user_id,
+                        activity_type='course_enrolled',
+                        description=f"S'est inscrit au cours '{course.title}'",
+                        related_course=course,
+                    )
+                    for user_id, course in missing
+                ])
+            return len(missing)
+        except IntegrityError:
+            # Inscription concurrente d'un même couple : le lot est relu et inséré à nouveau
+            if attempt == CONFLICT_RETRIES - 1:
+                raise
+
+
+def enroll_users(user_ids, courses, batch_size=DEFAULT_BATCH_SIZE):
+    """Inscrit un flux d'identifiants d'utilisateurs aux cours donnés"""
+    stats = Counter()
+    for chunk in chunked(user_ids, batch_size):
+        stats['users'] += len(chunk)
+        stats['enrolled'] += enroll_user_ids(chunk, courses)
+    return stats
+
+
+def enroll_emails(emails, courses, batch_size=DEFAULT_BATCH_SIZE):
+    """Inscrit un flux d'emails aux cours donnés ; les emails inconnus sont comptés"""
+    stats = Counter()
+    for chunk in chunked(emails, batch_size):
+        emails_set = set(chunk)
+        matches = list(
+            User.objects.annotate(email_lower=Lower('email')).filter(
+                email_lower__in=emails_set
+            ).values_list('id', 'email_lower')
+        )
+        user_ids = [user_id for user_id, email in matches]
+        stats['lines'] += len(chunk)
+        stats['users'] += len(user_ids)
+        stats['unknown'] += len(emails_set - {email for user_id, email in matches})
+        stats['enrolled'] += enroll_user_ids(user_ids, courses)
+    return stats
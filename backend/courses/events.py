@@ -0,0 +1,261 @@
+"""
+Flux d'événements (Server-Sent Events) de progression, d'activité et de
+certificats pour l'utilisateur connecté, servi sous ASGI.
+
+Source des événements : les écritures signalées (leçon terminée, quiz, fin
+de cours, certificat, inscription, y compris les insertions en masse)
+enregistrent une UserActivity. Les écritures de temps passé et de position
+de lecture, trop fréquentes, n'en enregistrent pas et ne sont pas diffusées.
+Le journal d'activité sert donc de file d'événements : un seul hub par
+processus le lit (une requête par intervalle, uniquement s'il y a des
+abonnés) et distribue les nouvelles lignes aux connexions de leurs
+utilisateurs. Cela fonctionne quel que soit le processus qui a écrit, et un
+client qui se reconnecte reprend après son dernier identifiant
+(Last-Event-ID).
+
+Une transaction peut valider un identifiant plus petit après un plus grand :
+les identifiants sautés par le curseur sont relus à chaque interrogation
+jusqu'à leur apparition, ou pendant GAP_TIMEOUT secondes (transaction
+annulée), quel que soit leur nombre.
+
+Chaque activité donne un événement "activity", complété par "progress"
+(état de l'inscription) pour les activités liées à un cours et par
+"certificate" pour un certificat obtenu.
+
+Contre-pression : chaque connexion a une file bornée. Un client trop lent
+pour la vider perd les événements en attente et reçoit un unique événement
+"resync", qui lui demande de recharger l'état par l'API REST. Le nombre de
+connexions par processus est plafonné (503 au-delà).
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max, Q
+from django.urls import reverse
+
+from .models import Certificate, Enrollment, UserActivity
+from .serializers import UserActivitySerializer
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = getattr(settings, 'SSE_POLL_INTERVAL', 1.0)
+HEARTBEAT = getattr(settings, 'SSE_HEARTBEAT', 25)
+QUEUE_SIZE = getattr(settings, 'SSE_QUEUE_SIZE', 50)
+MAX_CONNECTIONS = getattr(settings, 'SSE_MAX_CONNECTIONS', 5000)
+TICKET_TTL = getattr(settings, 'SSE_TICKET_TTL', 60 * 60)
+SIGNING_SALT = 'courses.events.ticket'
+
+# Nombre maximal d'activités lues par interrogation
+BATCH_SIZE = 1000
+# Durée (secondes) pendant laquelle un identifiant sauté est encore attendu
+GAP_TIMEOUT = getattr(settings, 'SSE_GAP_TIMEOUT', 60)
+# Activités manquées renvoyées à la reconnexion ; au-delà, "resync"
+BACKLOG_SIZE = 50
+
+PROGRESS_ACTIVITIES = ('lesson_completed', 'quiz_completed', 'course_completed', 'certificate_earned')
+
+RESYNC = object()
+
+
+def stream_ticket(request, user, auth_time):
+    """
+    URL signée du flux (EventSource ne peut pas envoyer d'en-tête
+    Authorization). Le ticket porte l'instant de connexion du jeton qui l'a
+    obtenu : un changement de mot de passe le révoque comme le jeton.
+    """
+    ticket = signing.dumps([user.id, auth_time], salt=SIGNING_SALT)
+    url = reverse('event-stream') + '?ticket=' + ticket
+    return request.build_absolute_uri(url) if request else url
+
+
+def read_ticket(ticket):
+    """(utilisateur, instant de connexion) du ticket, None s'il est invalide ou expiré"""
+    try:
+        user_id, auth_time = signing.loads(ticket, salt=SIGNING_SALT, max_age=TICKET_TTL)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return user_id, auth_time
+
+
+def format_event(event_id, event_type, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+def build_events(activities):
+    """Événements SSE (user_id, identifiant, texte) des activités, avec l'état des inscriptions et certificats"""
+    user_ids = {activity.user_id for activity in activities}
+    course_ids = {activity.related_course_id for activity in activities if activity.related_course_id}
+    enrollments, certificates = {}, {}
+    if any(activity.activity_type in PROGRESS_ACTIVITIES for activity in activities):
+        enrollments = {
+            (row['user_id'], row['course_id']): row for row in Enrollment.objects.filter(
+                user_id__in=user_ids, course_id__in=course_ids
+            ).values('user_id', 'course_id', 'progress', 'completed', 'completion_date', 'certificate_issued')
+        }
+    if any(activity.activity_type == 'certificate_earned' for activity in activities):
+        certificates = {
+            (row['user_id'], row['course_id']): row for row in Certificate.objects.filter(
+                user_id__in=user_ids, course_id__in=course_ids
+            ).values('user_id', 'course_id', 'certificate_id', 'issue_date')
+        }
+
+    events = []
+    for activity, data in zip(activities, UserActivitySerializer(activities, many=True).data):
+        user_id, event_id = activity.user_id, activity.id
+        events.append((user_id, event_id, format_event(event_id, 'activity', data)))
+        key = (user_id, activity.related_course_id)
+        if activity.activity_type in PROGRESS_ACTIVITIES and key in enrollments:
+            progress = {k: v for k, v in enrollments[key].items() if k != 'user_id'}
+            events.append((user_id, event_id, format_event(event_id, 'progress', progress)))
+        if activity.activity_type == 'certificate_earned' and key in certificates:
+            certificate = {k: v for k, v in certificates[key].items() if k != 'user_id'}
+            events.append((user_id, event_id, format_event(event_id, 'certificate', certificate)))
+    return events
+
+
+def _activities():
+    return UserActivity.objects.select_related('related_course', 'related_lesson').order_by('id')
+
+
+def latest_activity_id():
+    return UserActivity.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def missed_events(user_id, last_id):
+    """Événements postérieurs à last_id, ou None s'il y en a trop (le client doit se resynchroniser)"""
+    activities = list(_activities().filter(user_id=user_id, id__gt=last_id)[:BACKLOG_SIZE + 1])
+    if len(activities) > BACKLOG_SIZE:
+        return None
+    return [(event_id, text) for _, event_id, text in build_events(activities)]
+
+
+class Subscriber:
+    """Connexion d'un utilisateur : file bornée d'événements (identifiant, texte) déjà formatés"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Client trop lent : on abandonne ce qui attend et on demande une resynchronisation
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class EventHub:
+    """Distribue les nouvelles activités aux abonnés du processus (une boucle d'événements)"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.connections = 0
+        self.cursor = None
+        # Identifiants sautés par le curseur (transactions pas encore validées) : échéance d'attente
+        self.gaps = {}
+        self.task = None
+
+    def subscribe(self, user_id):
+        subscriber = Subscriber(user_id)
+        self.subscribers[user_id].add(subscriber)
+        self.connections += 1
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        connections = self.subscribers.get(subscriber.user_id)
+        if connections and subscriber in connections:
+            connections.discard(subscriber)
+            self.connections -= 1
+            if not connections:
+                del self.subscribers[subscriber.user_id]
+
+    def poll(self, user_ids):
+        """Nouvelles activités depuis le curseur, et identifiants sautés validés depuis (exécuté dans un thread)"""
+        try:
+            if self.cursor is None:
+                # Les activités antérieures au démarrage ne sont pas rediffusées
+                self.cursor = latest_activity_id()
+                self.gaps = {}
+                return []
+            now = time.monotonic()
+            self.gaps = {activity_id: deadline for activity_id, deadline in self.gaps.items() if deadline > now}
+            query = Q(id__gt=self.cursor)
+            if self.gaps:
+                query |= Q(id__in=list(self.gaps))
+            # Toutes les activités sont lues (identifiants seulement) pour repérer les sauts
+            rows = UserActivity.objects.filter(query).order_by('id').values_list('id', 'user_id')[:BATCH_SIZE]
+            new_ids = []
+            for activity_id, user_id in rows:
+                if activity_id > self.cursor:
+                    for missing in range(max(self.cursor + 1, activity_id - BATCH_SIZE), activity_id):
+                        self.gaps[missing] = now + GAP_TIMEOUT
+                    self.cursor = activity_id
+                else:
+                    del self.gaps[activity_id]
+                if user_id in user_ids:
+                    new_ids.append(activity_id)
+            if not new_ids:
+                return []
+            return build_events(list(_activities().filter(id__in=new_ids)))
+        finally:
+            close_old_connections()
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                try:
+                    events = await sync_to_async(self.poll, thread_sensitive=False)(set(self.subscribers))
+                except Exception:
+                    logger.exception("Lecture du journal d'activité en échec")
+                    events = []
+                for user_id, event_id, text in events:
+                    for subscriber in self.subscribers.get(user_id, ()):
+                        subscriber.push((event_id, text))
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            self.task = None
+            self.cursor = None  # Aucun abonné : on repartira de la dernière activité
+
+
+hub = EventHub()
+
+
+async def stream(subscriber, last_id=None):
+    """Corps de la réponse SSE ; l'abonnement est libéré quand le client se déconnecte"""
+    resync = "event: resync\ndata: {}\n\n"
+    delivered = 0
+    try:
+        yield "retry: 5000\n\n"  # Délai de reconnexion du navigateur (ms)
+        if last_id is not None:
+            backlog = await sync_to_async(missed_events, thread_sensitive=False)(subscriber.user_id, last_id)
+            if backlog is None:
+                yield resync
+            for delivered, text in backlog or ():
+                yield text
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is RESYNC:
+                yield resync
+                continue
+            event_id, text = item
+            if event_id > delivered:  # Déjà envoyé avec les événements manqués
+                yield text
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,584 @@
+"""
+Séries d'apprentissage et classements.
+
+Séries : chaque utilisateur a une ligne LearningStreak avec un bitmap des
+jours actifs (bit i : actif i jours avant le dernier jour actif, sur
+STREAK_WINDOW jours) et ses séries courante et maximale. Elle est mise à jour
+à la première écriture de progression de la journée (un cache.add évite les
+écritures suivantes), sans jamais relire LessonProgress ni UserActivity.
+
+Classements : par cours et par catégorie, sur deux métriques (leçons
+terminées, temps passé). Chaque processus garde en mémoire les classements
+consultés, sous forme de listes triées par blocs indexées par un arbre de
+Fenwick : une écriture de progression les met à jour en O(log n), le top N
+se lit en O(log n + N) et le rang d'un utilisateur en O(log n). Les écarts
+sont cumulés et écrits périodiquement en base (LeaderboardEntry, un upsert
+par ligne modifiée) par un thread du processus, qui relit ensuite les
+lignes modifiées par les autres processus. La base est la référence : un
+classement est chargé depuis LeaderboardEntry à la première consultation,
+et rebuild_leaderboards recalcule le tout depuis l'historique.
+
+Chaque reconstruction incrémente LeaderboardGeneration. Un processus qui
+constate, au moment d'écrire (ligne verrouillée), que la génération a changé
+abandonne ses écarts en attente (déjà comptés par la reconstruction) et ses
+classements chargés, au lieu de les ajouter aux totaux recalculés. Les écarts
+enregistrés entre la reconstruction et cette constatation (au plus
+SNAPSHOT_INTERVAL secondes) sont perdus : reconstruire en période creuse.
+"""
+import atexit
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    LeaderboardEntry, LeaderboardGeneration, LearningStreak, LessonProgress, ProgressSyncEvent, QuizAttempt
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = getattr(settings, 'LEADERBOARD_SNAPSHOT_INTERVAL', 30)
+MAX_BOARDS = getattr(settings, 'LEADERBOARD_MAX_BOARDS', 200)
+# Temps maximal (secondes) compté pour un seul envoi de temps passé
+MAX_TIME_INCREMENT = getattr(settings, 'LEADERBOARD_MAX_TIME_INCREMENT', 15 * 60)
+# Marge relue en arrière : une ligne peut être validée après l'instant de sa mise à jour
+LOOKBACK = timedelta(seconds=max(SNAPSHOT_INTERVAL, 5))
+
+METRICS = ('completions', 'time_spent')
+SCOPES = ('course', 'category')
+
+# Bitmap des jours actifs : tient dans un BigIntegerField signé
+STREAK_WINDOW = 63
+STREAK_MASK = (1 << STREAK_WINDOW) - 1
+
+
+# Séries d'apprentissage
+
+def _runs(days):
+    """(jours consécutifs jusqu'au dernier jour actif, plus longue suite de jours) d'un bitmap"""
+    longest = run = 0
+    for offset in range(STREAK_WINDOW):
+        run = run + 1 if days >> offset & 1 else 0
+        longest = max(longest, run)
+    return ((days ^ (days + 1)) >> 1).bit_length(), longest
+
+
+def advance_streak(streak, day):
+    """Enregistre le jour comme actif ; retourne True si la ligne a changé"""
+    last = streak.last_active_on
+    if last is not None and day <= last:
+        # Jour déjà compté, ou activité antérieure rejouée (synchronisation hors ligne)
+        offset = (last - day).days
+        if offset >= STREAK_WINDOW or streak.activity_days & (1 << offset):
+            return False
+        streak.activity_days |= 1 << offset
+        # Le jour comblé peut prolonger la série courante ou relier deux séries passées
+        current, longest = _runs(streak.activity_days)
+        if current < STREAK_WINDOW:
+            streak.current_streak = current
+        streak.longest_streak = max(streak.longest_streak, streak.current_streak, longest)
+        return True
+
+    gap = (day - last).days if last is not None else STREAK_WINDOW
+    days = (streak.activity_days << gap) | 1 if gap < STREAK_WINDOW else 1
+    streak.activity_days = days & STREAK_MASK
+    streak.current_streak = streak.current_streak + 1 if gap == 1 else 1
+    streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+    streak.last_active_on = day
+    return True
+
+
+def mark_active(user_id, day=None):
+    """Compte le jour dans la série de l'utilisateur (une écriture par jour au plus)"""
+    day = day or timezone.localdate()
+    if not cache.add(f"learning-day:{user_id}:{day.isoformat()}", True, timeout=2 * 24 * 60 * 60):
+        return
+    with transaction.atomic():
+        streak, _ = LearningStreak.objects.select_for_update().get_or_create(user_id=user_id)
+        if advance_streak(streak, day):
+            streak.save()
+
+
+def streak_status(streak, today=None):
+    """État d'une série à la date du jour (la série courante est rompue après un jour sans activité)"""
+    today = today or timezone.localdate()
+    if streak is None or streak.last_active_on is None:
+        return {
+            'current_streak': 0,
+            'longest_streak': 0,
+            'last_active_on': None,
+            'active_today': False,
+            'active_days': [],
+        }
+    last = streak.last_active_on
+    gap = (today - last).days
+    return {
+        'current_streak': streak.current_streak if gap <= 1 else 0,
+        'longest_streak': streak.longest_streak,
+        'last_active_on': last,
+        'active_today': gap == 0,
+        'active_days': [
+            last - timedelta(days=offset)
+            for offset in reversed(range(STREAK_WINDOW)) if streak.activity_days & (1 << offset)
+        ],
+    }
+
+
+# Structures triées
+
+class RankedList:
+    """
+    Liste triée découpée en blocs d'au plus 2 * LOAD clés, avec un arbre de
+    Fenwick sur la taille des blocs : insertion, suppression et rang en
+    O(log n) (plus un déplacement mémoire borné par la taille d'un bloc),
+    lecture des k premières clés en O(log n + k).
+    """
+    LOAD = 500
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._blocks = [keys[start:start + self.LOAD] for start in range(0, len(keys), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(keys)
+        self._build_index()
+
+    def _build_index(self):
+        tree = [0] * (len(self._blocks) + 1)
+        for index, block in enumerate(self._blocks, 1):
+            tree[index] += len(block)
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _update(self, block_index, delta):
+        index = block_index + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, block_index):
+        # Nombre de clés des blocs qui précèdent block_index
+        total, index = 0, block_index
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        if not self._blocks:
+            self._blocks, self._maxes, self._len = [[key]], [key], 1
+            self._build_index()
+            return
+        index = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, key)
+        self._maxes[index] = block[-1]
+        self._len += 1
+        if len(block) > 2 * self.LOAD:
+            # Découpage (tous les LOAD ajouts au plus) : index reconstruit en O(n / LOAD)
+            self._blocks[index:index + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._maxes[index:index + 1] = [block[self.LOAD - 1], block[-1]]
+            self._build_index()
+        else:
+            self._update(index, 1)
+
+    def remove(self, key):
+        index = bisect_left(self._maxes, key)
+        block = self._blocks[index] if index < len(self._blocks) else []
+        position = bisect_left(block, key)
+        if position == len(block) or block[position] != key:
+            raise KeyError(key)
+        del block[position]
+        self._len -= 1
+        if block:
+            self._maxes[index] = block[-1]
+            self._update(index, -1)
+        else:
+            del self._blocks[index], self._maxes[index]
+            self._build_index()
+
+    def rank(self, key):
+        """Nombre de clés strictement inférieures à key"""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._blocks):
+            return self._len
+        return self._prefix(index) + bisect_left(self._blocks[index], key)
+
+    def head(self, count):
+        """Les count plus petites clés"""
+        keys = []
+        for block in self._blocks:
+            if len(keys) >= count:
+                break
+            keys.extend(block[:count - len(keys)])
+        return keys
+
+
+class Leaderboard:
+    """Classement d'un cours ou d'une catégorie : une liste triée (-valeur, utilisateur) par métrique"""
+
+    def __init__(self, rows=()):
+        # rows : (user_id, completions, time_spent)
+        self.scores = {user_id: tuple(values) for user_id, *values in rows}
+        self.ranked = {
+            metric: RankedList((-values[index], user_id) for user_id, values in self.scores.items())
+            for index, metric in enumerate(METRICS)
+        }
+
+    def __len__(self):
+        return len(self.scores)
+
+    def set(self, user_id, values):
+        previous = self.scores.get(user_id)
+        for index, metric in enumerate(METRICS):
+            if previous is not None:
+                if previous[index] == values[index]:
+                    continue
+                self.ranked[metric].remove((-previous[index], user_id))
+            self.ranked[metric].add((-values[index], user_id))
+        self.scores[user_id] = tuple(values)
+
+    def increment(self, user_id, deltas):
+        previous = self.scores.get(user_id, (0,) * len(METRICS))
+        self.set(user_id, tuple(value + delta for value, delta in zip(previous, deltas)))
+
+    def top(self, metric, count):
+        """[(rang, user_id, valeur)] des count premiers ; les ex aequo partagent le rang"""
+        entries, rank, previous = [], 0, None
+        for position, (negated, user_id) in enumerate(self.ranked[metric].head(count), 1):
+            if negated != previous:
+                rank, previous = position, negated
+            entries.append((rank, user_id, -negated))
+        return entries
+
+    def rank(self, metric, user_id):
+        """(rang, valeur) de l'utilisateur, None s'il n'est pas classé"""
+        values = self.scores.get(user_id)
+        if values is None:
+            return None
+        value = values[METRICS.index(metric)]
+        return self.ranked[metric].rank((-value,)) + 1, value
+
+
+# Classements du processus
+
+def _upsert_sql():
+    table = connection.ops.quote_name(LeaderboardEntry._meta.db_table)
+    return (
+        f"INSERT INTO {table} (scope, scope_id, user_id, completions, time_spent, updated_at) "
+        f"VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT (scope, scope_id, user_id) DO UPDATE SET "
+        f"completions = {table}.completions + excluded.completions, "
+        f"time_spent = {table}.time_spent + excluded.time_spent, "
+        f"updated_at = excluded.updated_at"
+    )
+
+
+def current_generation(lock=False):
+    """Numéro de la dernière reconstruction (ligne verrouillée si lock, dans une transaction)"""
+    rows = LeaderboardGeneration.objects.select_for_update() if lock else LeaderboardGeneration.objects
+    return rows.get_or_create(pk=1)[0].number
+
+
+class Leaderboards:
+    """
+    Classements chargés par le processus (les MAX_BOARDS derniers consultés),
+    écarts en attente d'écriture, et thread d'écriture et de relecture.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Classements et écarts en attente
+        self.sync_lock = threading.Lock()  # Chargements, écritures et relectures
+        self.boards = OrderedDict()
+        self.pending = defaultdict(lambda: [0] * len(METRICS))
+        self.cursor = None
+        self.generation = None  # Reconstruction à laquelle se rapportent classements et écarts
+        self.thread = None
+
+    def adopt_generation(self):
+        if self.generation is None:
+            generation = current_generation()
+            with self.lock:
+                if self.generation is None:
+                    self.generation = generation
+
+    def record(self, user_id, scopes, deltas):
+        """Ajoute des écarts (leçons terminées, temps passé) pour un utilisateur dans des classements"""
+        self.adopt_generation()
+        with self.lock:
+            for key in scopes:
+                pending = self.pending[(*key, user_id)]
+                for index, delta in enumerate(deltas):
+                    pending[index] += delta
+                board = self.boards.get(key)
+                if board is not None:
+                    board.increment(user_id, deltas)
+        self.start()
+
+    def board(self, scope, scope_id):
+        """Classement chargé (depuis LeaderboardEntry à la première consultation)"""
+        key = (scope, scope_id)
+        with self.lock:
+            board = self.boards.get(key)
+            if board is not None:
+                self.boards.move_to_end(key)
+                return board
+
+        with self.sync_lock:
+            with self.lock:
+                board = self.boards.get(key)
+            if board is None:
+                self.adopt_generation()
+                if self.cursor is None:
+                    self.cursor = timezone.now()
+                board = Leaderboard(LeaderboardEntry.objects.filter(
+                    scope=scope, scope_id=scope_id
+                ).values_list('user_id', *METRICS).iterator(chunk_size=10000))
+                with self.lock:
+                    # Écarts enregistrés mais pas encore écrits : absents de la base
+                    for (pending_scope, pending_id, user_id), deltas in self.pending.items():
+                        if (pending_scope, pending_id) == key:
+                            board.increment(user_id, deltas)
+                    self.boards[key] = board
+                    while len(self.boards) > MAX_BOARDS:
+                        self.boards.popitem(last=False)
+        self.start()
+        return board
+
+    def flush(self):
+        """Écrit les écarts en attente (un upsert cumulatif par ligne)"""
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(lambda: [0] * len(METRICS))
+        rows = [(*key, *deltas) for key, deltas in pending.items() if any(deltas)]
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                # Verrou : une reconstruction ne peut pas être validée entre cette lecture et l'écriture
+                generation = current_generation(lock=True)
+                if generation != self.generation:
+                    # Reconstruction par un autre processus : ces écarts y sont déjà comptés
+                    self.clear(generation)
+                    return 0
+                if rows:
+                    with connection.cursor() as cursor:
+                        cursor.executemany(_upsert_sql(), [(*row, now) for row in rows])
+        except Exception:
+            # Écarts remis en attente pour la prochaine écriture
+            with self.lock:
+                for scope, scope_id, user_id, *deltas in rows:
+                    pending = self.pending[(scope, scope_id, user_id)]
+                    for index, delta in enumerate(deltas):
+                        pending[index] += delta
+            raise
+        return len(rows)
+
+    def pull(self):
+        """Relit les lignes modifiées (par tous les processus) des classements chargés"""
+        with self.lock:
+            keys = list(self.boards)
+        if not keys or self.cursor is None:
+            return
+        started = timezone.now()
+        scopes = defaultdict(list)
+        for scope, scope_id in keys:
+            scopes[scope].append(scope_id)
+        condition = Q()
+        for scope, scope_ids in scopes.items():
+            condition |= Q(scope=scope, scope_id__in=scope_ids)
+        rows = LeaderboardEntry.objects.filter(
+            condition, updated_at__gte=self.cursor - LOOKBACK
+        ).values_list('scope', 'scope_id', 'user_id', *METRICS)
+        with self.lock:
+            for scope, scope_id, user_id, *values in rows:
+                board = self.boards.get((scope, scope_id))
+                if board is None:
+                    continue
+                deltas = self.pending.get((scope, scope_id, user_id), (0,) * len(METRICS))
+                board.set(user_id, tuple(value + delta for value, delta in zip(values, deltas)))
+        self.cursor = started
+
+    def sync(self):
+        with self.sync_lock:
+            self.flush()
+            self.pull()
+
+    def run(self):
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Écriture des classements en échec")
+            finally:
+                close_old_connections()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='leaderboards', daemon=True)
+                self.thread.start()
+                atexit.register(self.shutdown)
+
+    def shutdown(self):
+        try:
+            with self.sync_lock:
+                self.flush()
+        except Exception:
+            logger.exception("Écriture des classements en échec")
+
+    def clear(self, generation=None):
+        """Oublie les classements chargés et les écarts en attente (après une reconstruction en base)"""
+        with self.lock:
+            self.boards.clear()
+            self.pending.clear()
+            self.cursor = None
+            self.generation = generation
+
+
+leaderboards = Leaderboards()
+
+
+def record_progress(user_id, course, completions=0, time_spent=0):
+    """
+    Enregistre une écriture de progression (après validation de la
+    transaction) : jour actif de la série et écarts des classements du cours
+    et de sa catégorie (course vaut None pour une écriture sans écart, comme
+    une position de lecture).
+    """
+    def apply():
+        try:
+            mark_active(user_id)
+            if course is not None and (completions or time_spent):
+                leaderboards.record(
+                    user_id,
+                    [('course', course.id), ('category', course.category_id)],
+                    (completions, time_spent)
+                )
+        except Exception:
+            logger.exception("Mise à jour des séries et classements en échec")
+    transaction.on_commit(apply)
+
+
+def leaderboard_data(scope, scope_id, metric, limit, user):
+    """Top du classement et position de l'utilisateur"""
+    board = leaderboards.board(scope, scope_id)
+    top = board.top(metric, limit)
+    usernames = dict(
+        get_user_model().objects.filter(id__in=[user_id for _, user_id, _ in top]).values_list('id', 'username')
+    )
+    me = board.rank(metric, user.id)
+    return {
+        'scope': scope,
+        'scope_id': scope_id,
+        'metric': metric,
+        'participants': len(board),
+        'entries': [
+            {'rank': rank, 'user_id': user_id, 'username': usernames.get(user_id), 'value': value}
+            for rank, user_id, value in top
+        ],
+        'me': {'rank': me[0], 'value': me[1]} if me is not None else None,
+    }
+
+
+# Reconstruction depuis l'historique
+
+def rebuild_leaderboards(batch_size=5000):
+    """Recalcule toutes les lignes LeaderboardEntry depuis LessonProgress ; retourne leur nombre"""
+    totals = defaultdict(lambda: [0, 0])
+    rows = LessonProgress.objects.values(
+        'user_id', 'lesson__course_id', 'lesson__course__category_id'
+    ).annotate(
+        completions=Count('id', filter=Q(completed=True)),
+        time=Sum('time_spent')
+    ).order_by()
+    for row in rows.iterator(chunk_size=10000):
+        for key in (('course', row['lesson__course_id']), ('category', row['lesson__course__category_id'])):
+            values = totals[(*key, row['user_id'])]
+            values[0] += row['completions']
+            values[1] += row['time'] or 0
+
+    now = timezone.now()
+    entries = [
+        LeaderboardEntry(
+            scope=scope, scope_id=scope_id, user_id=user_id,
+            completions=completions, time_spent=time_spent, updated_at=now
+        )
+        for (scope, scope_id, user_id), (completions, time_spent) in totals.items()
+        if completions or time_spent
+    ]
+    with transaction.atomic():
+        # Les processus qui écrivent attendent la fin de la transaction, puis voient la nouvelle génération
+        generation = current_generation(lock=True) + 1
+        LeaderboardGeneration.objects.filter(pk=1).update(number=generation)
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=batch_size)
+    with leaderboards.sync_lock:
+        leaderboards.clear(generation)
+    return len(entries)
+
+
+def rebuild_streaks(today=None, batch_size=5000):
+    """
+    Complète les séries avec l'historique des écritures de progression des
+    STREAK_WINDOW derniers jours (leçons terminées, tentatives de quiz,
+    événements synchronisés), fusionné avec les jours déjà comptés par
+    mark_active. Les lignes sont mises à jour en place : aucun jour compté ni
+    aucune série maximale n'est perdu. Retourne le nombre de séries.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=STREAK_WINDOW - 1)
+    days = defaultdict(set)
+    sources = (
+        (LessonProgress.objects.filter(completed=True), 'completed_at'),
+        (QuizAttempt.objects.all(), 'created_at'),
+        (ProgressSyncEvent.objects.all(), 'applied_at'),
+    )
+    for queryset, field in sources:
+        rows = queryset.filter(**{f'{field}__date__gte': start}).annotate(
+            day=TruncDate(field)
+        ).values_list('user_id', 'day').distinct().order_by()
+        for user_id, day in rows.iterator(chunk_size=10000):
+            days[user_id].add(day)
+
+    stored = LearningStreak.objects.in_bulk(days.keys())
+    created, updated = [], []
+    for user_id, active_days in days.items():
+        previous = stored.get(user_id)
+        if previous is not None and previous.last_active_on is not None:
+            active_days |= {
+                previous.last_active_on - timedelta(days=offset)
+                for offset in range(STREAK_WINDOW) if previous.activity_days >> offset & 1
+            }
+        streak = LearningStreak(user_id=user_id)
+        for day in sorted(active_days):
+            advance_streak(streak, day)
+        if previous is None:
+            created.append(streak)
+            continue
+        if previous.last_active_on == streak.last_active_on:
+            # Une série plus longue que la fenêtre n'est connue que du compteur enregistré
+            streak.current_streak = max(streak.current_streak, previous.current_streak)
+        streak.longest_streak = max(streak.longest_streak, previous.longest_streak)
+        updated.append(streak)
+    with transaction.atomic():
+        LearningStreak.objects.bulk_create(created, batch_size=batch_size, ignore_conflicts=True)
+        LearningStreak.objects.bulk_update(
+            updated, ['last_active_on', 'activity_days', 'current_streak', 'longest_streak'], batch_size=batch_size
+        )
+    return len(created) + len(updated)
@@ -0,0 +1,163 @@
+"""
+Export en flux du carnet de notes d'un cours.
+
+Trois curseurs triés par utilisateur (inscriptions, progression des leçons,
+meilleurs scores de quiz) sont parcourus par blocs et fusionnés au fil de
+l'eau : chaque ligne du carnet est produite dès que les données d'un
+étudiant sont complètes, sans jamais charger le cours entier en mémoire.
+"""
+import csv
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import Max
+
+from .models import Enrollment, Lesson, LessonProgress, Quiz, QuizAttempt
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # L'export Parquet est optionnel
+    pyarrow = None
+
+PARQUET_AVAILABLE = pyarrow is not None
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = ('csv', 'parquet')
+FIXED_COLUMNS = [
+    'user_id', 'username', 'email', 'progress', 'completed',
+    'lessons_completed', 'time_spent',
+]
+
+
+class _UserStream:
+    """Flux de lignes groupées par utilisateur, consommé dans l'ordre croissant des ids"""
+
+    def __init__(self, rows):
+        self._groups = groupby(rows, key=itemgetter(0))
+        self._current = next(self._groups, None)
+
+    def take(self, user_id):
+        """Retourne les lignes de user_id en sautant celles des utilisateurs précédents"""
+        while self._current is not None and self._current[0] < user_id:
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != user_id:
+            return []
+        rows = list(self._current[1])
+        self._current = next(self._groups, None)
+        return rows
+
+
+class Gradebook:
+    """Carnet de notes d'un cours : une ligne par étudiant inscrit"""
+
+    def __init__(self, course, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.course = course
+        self.chunk_size = chunk_size
+        self.lesson_ids = list(
+            Lesson.objects.filter(course=course).order_by(
+                'section__order', 'order', 'id'
+            ).values_list('id', flat=True)
+        )
+        self.quiz_ids = list(
+            Quiz.objects.filter(lesson__course=course).order_by('lesson_id').values_list('id', flat=True)
+        )
+
+    @property
+    def columns(self):
+        return (
+            FIXED_COLUMNS
+            + [f"lesson_{lesson_id}_completed" for lesson_id in self.lesson_ids]
+            + [f"quiz_{quiz_id}_best_score" for quiz_id in self.quiz_ids]
+        )
+
+    def _enrollments(self):
+        return Enrollment.objects.filter(course=self.course).order_by('user_id').values_list(
+            'user_id', 'user__username', 'user__email', 'progress', 'completed'
+        ).iterator(chunk_size=self.chunk_size)
+
+    def _lesson_progress(self):
+        return LessonProgress.objects.filter(lesson__course=self.course).order_by('user_id').values_list(
+            'user_id', 'lesson_id', 'completed', 'time_spent'
+        ).iterator(chunk_size=self.chunk_size)
+
+    def _quiz_scores(self):
+        return QuizAttempt.objects.filter(quiz__lesson__course=self.course).values(
+            'user_id', 'quiz_id'
+        ).annotate(best=Max('score')).order_by('user_id').values_list(
+            'user_id', 'quiz_id', 'best'
+        ).iterator(chunk_size=self.chunk_size)
+
+    def rows(self):
+        """Produit les lignes du carnet (sans l'en-tête), une par étudiant"""
+        progress_stream = _UserStream(self._lesson_progress())
+        quiz_stream = _UserStream(self._quiz_scores())
+        lesson_index = {lesson_id: i for i, lesson_id in enumerate(self.lesson_ids)}
+        quiz_index = {quiz_id: i for i, quiz_id in enumerate(self.quiz_ids)}
+
+        for user_id, username, email, progress, completed in self._enrollments():
+            lessons = [False] * len(self.lesson_ids)
+            time_spent = 0
+            for _, lesson_id, lesson_completed, lesson_time in progress_stream.take(user_id):
+                time_spent += lesson_time
+                if lesson_id in lesson_index:
+                    lessons[lesson_index[lesson_id]] = lesson_completed
+            scores = [None] * len(self.quiz_ids)
+            for _, quiz_id, best in quiz_stream.take(user_id):
+                scores[quiz_index[quiz_id]] = best
+            yield [
+                user_id, username, email, round(progress, 1), completed,
+                sum(lessons), time_spent, *lessons, *scores,
+            ]
+
+
+class _Echo:
+    """Pseudo-fichier qui renvoie directement ce qu'on lui écrit"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(gradebook):
+    """Produit le carnet au format CSV, ligne par ligne"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(gradebook.columns)
+    for row in gradebook.rows():
+        yield writer.writerow(row)
+
+
+def parquet_schema(gradebook):
+    fields = [
+        ('user_id', pyarrow.int64()),
+        ('username', pyarrow.string()),
+        ('email', pyarrow.string()),
+        ('progress', pyarrow.float64()),
+        ('completed', pyarrow.bool_()),
+        ('lessons_completed', pyarrow.int64()),
+        ('time_spent', pyarrow.int64()),
+    ]
+    fields += [(f"lesson_{lesson_id}_completed", pyarrow.bool_()) for lesson_id in gradebook.lesson_ids]
+    fields += [(f"quiz_{quiz_id}_best_score", pyarrow.float64()) for quiz_id in gradebook.quiz_ids]
+    return pyarrow.schema(fields)
+
+
+def write_parquet(gradebook, output):
+    """Écrit le carnet au format Parquet, un groupe de lignes par bloc"""
+    if pyarrow is None:
+        raise RuntimeError("L'export Parquet nécessite le paquet pyarrow.")
+    schema = parquet_schema(gradebook)
+
+    def to_batch(rows):
+        return pyarrow.RecordBatch.from_pylist(
+            [dict(zip(schema.names, values)) for values in rows], schema=schema
+        )
+
+    with pyarrow.parquet.ParquetWriter(output, schema) as writer:
+        batch = []
+        for row in gradebook.rows():
+            batch.append(row)
+            if len(batch) >= gradebook.chunk_size:
+                writer.write_batch(to_batch(batch))
+                batch = []
+        if batch:
+            writer.write_batch(to_batch(batch))
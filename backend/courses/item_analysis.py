@@ -0,0 +1,256 @@
+"""
+Analyse d'items des quiz : difficulté et discrimination des questions.
+
+Pour chaque question : nombre de réponses, indice de difficulté (p, part
+de bonnes réponses) et discrimination (corrélation point-bisériale entre la
+réussite à la question et le score du reste de la tentative, c'est-à-dire
+la part de bonnes réponses aux autres questions répondues). Pour chaque
+réponse proposée : taux de sélection et discrimination du choix ; un
+distracteur choisi surtout par les meilleurs étudiants signale une
+question ambiguë (ou une erreur de corrigé).
+
+Ces indicateurs se déduisent de sommes cumulables (QuestionStatistics,
+AnswerStatistics) : chaque tentative soumise les incrémente, dans sa
+transaction, par un upsert par ligne. rebuild recalcule toutes les sommes
+en un seul parcours de QuizAnswer trié par tentative, les lignes verrouillées.
+"""
+import math
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+from .models import Answer, AnswerStatistics, Question, QuestionStatistics, QuizAnswer
+
+QUESTION_SUMS = (
+    'responses', 'correct_count', 'paired_responses', 'paired_correct',
+    'rest_score_sum', 'rest_score_sq_sum', 'correct_rest_score_sum',
+)
+ANSWER_SUMS = ('selections', 'paired_selections', 'selected_rest_score_sum')
+
+# Seuils de signalement (au-dessous de MIN_RESPONSES réponses, aucun signalement)
+MIN_RESPONSES = 20
+EASY_P_VALUE = 0.9
+HARD_P_VALUE = 0.3
+LOW_DISCRIMINATION = 0.2
+# Distracteur à discrimination positive, choisi par au moins cette part des réponses : question ambiguë
+AMBIGUOUS_SELECTION_RATE = 0.1
+
+COLUMNS = [
+    'quiz_id', 'quiz_title', 'question_id', 'question', 'tag', 'difficulty', 'responses',
+    'p_value', 'discrimination', 'flags', 'answer_id', 'answer', 'is_correct', 'selections',
+    'selection_rate', 'answer_discrimination',
+]
+
+
+def contributions(answers):
+    """
+    Sommes apportées par une tentative, à partir de ses réponses
+    (question_id, answer_id, is_correct) : ({question_id: sommes}, {answer_id: sommes})
+    """
+    answered = len(answers)
+    correct = sum(1 for *_, is_correct in answers if is_correct)
+    questions, choices = {}, {}
+    for question_id, answer_id, is_correct in answers:
+        hit = int(is_correct)
+        if answered > 1:
+            rest = (correct - hit) / (answered - 1)
+            questions[question_id] = (1, hit, 1, hit, rest, rest * rest, rest * hit)
+            choices[answer_id] = (1, 1, rest)
+        else:
+            # Aucune autre question : compte pour la difficulté, pas pour la discrimination
+            questions[question_id] = (1, hit, 0, 0, 0.0, 0.0, 0.0)
+            choices[answer_id] = (1, 0, 0.0)
+    return questions, choices
+
+
+def _upsert(model, columns, rows):
+    table = connection.ops.quote_name(model._meta.db_table)
+    key = connection.ops.quote_name(model._meta.pk.column)
+    quoted = [connection.ops.quote_name(column) for column in columns]
+    sql = (
+        f"INSERT INTO {table} ({key}, {', '.join(quoted)}) "
+        f"VALUES ({', '.join(['%s'] * (len(columns) + 1))}) "
+        f"ON CONFLICT ({key}) DO UPDATE SET "
+        + ', '.join(f"{column} = {table}.{column} + excluded.{column}" for column in quoted)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(pk, *values) for pk, values in rows.items()])
+
+
+def record_attempt(quiz_answers):
+    """Ajoute les réponses d'une tentative aux statistiques (dans la transaction de la tentative)"""
+    if not quiz_answers:
+        return
+    questions, choices = contributions([
+        (quiz_answer.question_id, quiz_answer.answer_id, quiz_answer.is_correct) for quiz_answer in quiz_answers
+    ])
+    _upsert(QuestionStatistics, QUESTION_SUMS, questions)
+    _upsert(AnswerStatistics, ANSWER_SUMS, choices)
+
+
+def rebuild(course=None, batch_size=5000):
+    """
+    Recalcule les statistiques (de tous les quiz ou de ceux d'un cours) en un
+    parcours de QuizAnswer trié par tentative ; retourne le nombre de questions.
+
+    Les lignes de statistiques sont d'abord créées (à zéro) puis verrouillées :
+    une tentative soumise pendant le recalcul attend sa fin pour ajouter ses
+    sommes, et n'est donc ni perdue ni comptée deux fois.
+    """
+    answers = QuizAnswer.objects.order_by('attempt_id')
+    questions = Question.objects.all()
+    choices = Answer.objects.all()
+    if course is not None:
+        answers = answers.filter(question__quiz__lesson__course=course)
+        questions = questions.filter(quiz__lesson__course=course)
+        choices = choices.filter(question__quiz__lesson__course=course)
+
+    with transaction.atomic():
+        QuestionStatistics.objects.bulk_create(
+            [QuestionStatistics(question_id=pk) for pk in questions.values_list('id', flat=True)],
+            batch_size=batch_size, ignore_conflicts=True
+        )
+        AnswerStatistics.objects.bulk_create(
+            [AnswerStatistics(answer_id=pk) for pk in choices.values_list('id', flat=True)],
+            batch_size=batch_size, ignore_conflicts=True
+        )
+        question_stats = list(QuestionStatistics.objects.select_for_update().filter(question__in=questions))
+        answer_stats = list(AnswerStatistics.objects.select_for_update().filter(answer__in=choices))
+
+        question_sums = defaultdict(lambda: [0] * len(QUESTION_SUMS))
+        answer_sums = defaultdict(lambda: [0] * len(ANSWER_SUMS))
+        rows = answers.values_list('attempt_id', 'question_id', 'answer_id', 'is_correct').iterator(chunk_size=10000)
+        for _, attempt_rows in groupby(rows, key=itemgetter(0)):
+            attempt_questions, attempt_choices = contributions([row[1:] for row in attempt_rows])
+            for sums, deltas in ((question_sums, attempt_questions), (answer_sums, attempt_choices)):
+                for pk, values in deltas.items():
+                    totals = sums[pk]
+                    for index, value in enumerate(values):
+                        totals[index] += value
+
+        for stats_rows, sums, columns in (
+            (question_stats, question_sums, QUESTION_SUMS), (answer_stats, answer_sums, ANSWER_SUMS)
+        ):
+            for stats in stats_rows:
+                for column, value in zip(columns, sums.get(stats.pk) or [0] * len(columns)):
+                    setattr(stats, column, value)
+        QuestionStatistics.objects.bulk_update(question_stats, QUESTION_SUMS, batch_size=batch_size)
+        AnswerStatistics.objects.bulk_update(answer_stats, ANSWER_SUMS, batch_size=batch_size)
+    return len(question_sums)
+
+
+def point_biserial(count, selected, total, squares, selected_total):
+    """
+    Corrélation entre un indicateur (réussite, choix d'une réponse) et le
+    score du reste, à partir de sommes : None si elle n'est pas définie
+    """
+    if count < 2 or selected in (0, count):
+        return None
+    mean = total / count
+    variance = squares / count - mean * mean
+    if variance <= 1e-12:
+        return None
+    share = selected / count
+    selected_mean = selected_total / selected
+    other_mean = (total - selected_total) / (count - selected)
+    return (selected_mean - other_mean) / math.sqrt(variance) * math.sqrt(share * (1 - share))
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+def question_report(question):
+    """Indicateurs d'une question et de ses réponses (réponses préchargées avec leurs statistiques)"""
+    stats = getattr(question, 'statistics', None) or QuestionStatistics(question=question)
+    p_value = stats.correct_count / stats.responses if stats.responses else None
+    discrimination = point_biserial(
+        stats.paired_responses, stats.paired_correct,
+        stats.rest_score_sum, stats.rest_score_sq_sum, stats.correct_rest_score_sum
+    )
+
+    answers, ambiguous = [], False
+    for answer in question.answers.all():
+        answer_stats = getattr(answer, 'statistics', None) or AnswerStatistics(answer=answer)
+        answer_discrimination = point_biserial(
+            stats.paired_responses, answer_stats.paired_selections,
+            stats.rest_score_sum, stats.rest_score_sq_sum, answer_stats.selected_rest_score_sum
+        )
+        selection_rate = answer_stats.selections / stats.responses if stats.responses else None
+        if (
+            not answer.is_correct and answer_discrimination is not None and answer_discrimination > 0
+            and selection_rate >= AMBIGUOUS_SELECTION_RATE
+        ):
+            ambiguous = True
+        answers.append({
+            'answer_id': answer.id,
+            'text': answer.text,
+            'is_correct': answer.is_correct,
+            'selections': answer_stats.selections,
+            'selection_rate': _round(selection_rate),
+            'discrimination': _round(answer_discrimination),
+        })
+
+    flags = []
+    if stats.responses >= MIN_RESPONSES:
+        if p_value > EASY_P_VALUE:
+            flags.append('too_easy')
+        elif p_value < HARD_P_VALUE:
+            flags.append('too_hard')
+        if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+            flags.append('low_discrimination')
+        if ambiguous:
+            flags.append('ambiguous')
+
+    return {
+        'question_id': question.id,
+        'text': question.text,
+        'order': question.order,
+        'tag': question.tag,
+        'difficulty': question.difficulty,
+        'responses': stats.responses,
+        'p_value': _round(p_value),
+        'discrimination': _round(discrimination),
+        'flags': flags,
+        'answers': answers,
+    }
+
+
+class ItemReport:
+    """Statistiques d'item des quiz d'un cours (JSON par quiz, ou lignes CSV par réponse)"""
+    columns = COLUMNS
+
+    def __init__(self, course, chunk_size=500):
+        self.course = course
+        self.chunk_size = chunk_size
+
+    def questions(self):
+        return Question.objects.filter(quiz__lesson__course=self.course).select_related(
+            'quiz', 'statistics'
+        ).prefetch_related(
+            Prefetch('answers', queryset=Answer.objects.select_related('statistics').order_by('id'))
+        ).order_by('quiz__lesson_id', 'order', 'id').iterator(chunk_size=self.chunk_size)
+
+    def data(self):
+        quizzes = []
+        for quiz, questions in groupby(self.questions(), key=lambda question: question.quiz):
+            quizzes.append({
+                'quiz_id': quiz.id,
+                'title': quiz.title,
+                'questions': [question_report(question) for question in questions],
+            })
+        return {'course_id': self.course.id, 'quizzes': quizzes}
+
+    def rows(self):
+        for question in self.questions():
+            report = question_report(question)
+            for answer in report['answers']:
+                yield [
+                    question.quiz_id, question.quiz.title, report['question_id'], report['text'],
+                    report['tag'], report['difficulty'], report['responses'], report['p_value'],
+                    report['discrimination'], ' '.join(report['flags']), answer['answer_id'], answer['text'],
+                    answer['is_correct'], answer['selections'], answer['selection_rate'], answer['discrimination'],
+                ]
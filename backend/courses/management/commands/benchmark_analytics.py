@@ -0,0 +1,54 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from courses.models import Course, CourseAnalytics, LessonAnalytics, QuizAnalytics
+from courses.analytics import refresh_course
+from courses.serializers import (
+    CourseAnalyticsSerializer, LessonAnalyticsSerializer, QuizAnalyticsSerializer
+)
+
+class Command(BaseCommand):
+    help = 'Compare le calcul direct des statistiques à la lecture des agrégats matérialisés'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='ID du cours (par défaut : le cours le plus suivi)')
+        parser.add_argument('--iterations', type=int, default=20, help='Nombre de mesures par scénario')
+
+    def timed(self, func, iterations):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), max(samples)
+
+    def handle(self, *args, **options):
+        courses = Course.objects.annotate(enrolled=Count('enrollments')).order_by('-enrolled')
+        if options['course']:
+            courses = courses.filter(id=options['course'])
+        course = courses.first()
+        if course is None:
+            raise CommandError("Aucun cours disponible (voir seed_courses --courses)")
+
+        def read_materialized():
+            analytics = CourseAnalytics.objects.select_related('course').get(course=course)
+            return (
+                CourseAnalyticsSerializer(analytics).data,
+                LessonAnalyticsSerializer(
+                    LessonAnalytics.objects.filter(course=course).select_related('lesson'), many=True
+                ).data,
+                QuizAnalyticsSerializer(
+                    QuizAnalytics.objects.filter(course=course).select_related('quiz'), many=True
+                ).data,
+            )
+
+        iterations = options['iterations']
+        refresh_course(course)
+        live = self.timed(lambda: refresh_course(course), iterations)
+        materialized = self.timed(read_materialized, iterations)
+
+        self.stdout.write(f"Cours \"{course.title}\" : {course.enrolled} inscrits, {course.lessons.count()} leçons")
+        self.stdout.write(f"  calcul complet (refresh) : médiane {live[0]:.2f} ms, max {live[1]:.2f} ms")
+        self.stdout.write(f"  lecture matérialisée     : médiane {materialized[0]:.2f} ms, max {materialized[1]:.2f} ms")
+        self.stdout.write(self.style.SUCCESS(f"Gain : x{live[0] / materialized[0]:.1f}"))
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.models import Enrollment
+
+HANDLERS = ('wsgi', 'asgi')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le déploiement WSGI (vues synchrones, un thread par requête) au déploiement "
+        "ASGI (vues asynchrones) sur le tableau de bord, le fil d'activité et la progression, "
+        "à budget de workers égal"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--handler', choices=HANDLERS, help='Mesurer un seul mode, dans ce processus')
+        parser.add_argument('--requests', type=int, default=300, help='Nombre total de requêtes par mode')
+        parser.add_argument('--clients', type=int, default=50, help='Nombre de clients simultanés')
+        parser.add_argument(
+            '--workers', type=int, default=(os.cpu_count() or 1) * 2,
+            help="Budget de threads : threads WSGI, ou pool de requêtes ASGI (ASYNC_QUERY_WORKERS)"
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=2.0,
+            help="Latence simulée (ms) ajoutée à chaque requête SQL, comme avec une base distante"
+        )
+        parser.add_argument('--users', type=int, default=20, help="Nombre d'utilisateurs inscrits utilisés")
+
+    def handle(self, *args, **options):
+        if options['handler']:
+            return self.measure(options)
+
+        self.stdout.write(
+            f"{options['clients']} clients simultanés, {options['workers']} threads, "
+            f"{options['requests']} requêtes par mode, latence SQL simulée {options['db_latency']} ms"
+        )
+        # Un processus par mode : les vues routées dépendent de ASYNC_VIEWS
+        for handler in HANDLERS:
+            env = dict(
+                os.environ,
+                ASYNC_VIEWS='1' if handler == 'asgi' else '0',
+                ASYNC_QUERY_WORKERS=str(options['workers']),
+            )
+            command = [
+                sys.executable, sys.argv[0], 'benchmark_asgi', '--handler', handler,
+                '--requests', str(options['requests']), '--clients', str(options['clients']),
+                '--workers', str(options['workers']), '--db-latency', str(options['db_latency']),
+                '--users', str(options['users']),
+            ]
+            result = subprocess.run(command, env=env, capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(result.stderr.strip().splitlines()[-1])
+            self.stdout.write(result.stdout.rstrip())
+
+    def targets(self, count):
+        # Une inscription par utilisateur actif
+        enrollments = {}
+        for enrollment in Enrollment.objects.filter(user__is_active=True).select_related('user').order_by('user_id', 'id').iterator():
+            enrollments.setdefault(enrollment.user_id, enrollment)
+            if len(enrollments) >= count:
+                break
+        if not enrollments:
+            raise CommandError("Aucune inscription disponible (voir seed_courses)")
+        targets = []
+        for enrollment in enrollments.values():
+            authorization = f'Bearer {AccessToken.for_user(enrollment.user)}'
+            for url in (
+                '/api/courses/dashboard/',
+                '/api/courses/activities/?page=1&page_size=10',
+                f'/api/courses/courses/{enrollment.course_id}/progress/',
+            ):
+                parts = urlsplit(url)
+                targets.append((parts.path, parts.query, authorization))
+        return targets
+
+    def simulate_latency(self, latency):
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency / 1000)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # Chaque thread garde le même objet connexion d'une reconnexion à l'autre
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if latency:
+            connection_created.connect(install, weak=False)
+
+    def measure(self, options):
+        handler = options['handler']
+        if (handler == 'asgi') != settings.ASYNC_VIEWS:
+            raise CommandError(f"--handler {handler} demande ASYNC_VIEWS={'1' if handler == 'asgi' else '0'}")
+        targets = self.targets(options['users'])
+        count, clients = options['requests'], options['clients']
+        self.simulate_latency(options['db_latency'])
+
+        if handler == 'wsgi':
+            samples, elapsed = self.run_wsgi(targets, count, clients, options['workers'])
+        else:
+            samples, elapsed = asyncio.run(self.run_asgi(targets, count, clients))
+        self.stdout.write(
+            f"{handler.upper():<5} p50 {statistics.median(samples):8.2f} ms   "
+            f"p99 {percentile(samples, 0.99):8.2f} ms   {count / elapsed:7.1f} req/s"
+        )
+
+    def run_wsgi(self, targets, count, clients, workers):
+        """Application WSGI réelle, un thread par requête comme un serveur à threads"""
+        application = get_wsgi_application()
+
+        def start_response(status, headers, exc_info=None):
+            if not status.startswith('200'):
+                raise CommandError(status)
+
+        # Les clients au-delà du nombre de threads attendent un worker libre :
+        # la latence mesurée inclut cette attente
+        def timed(index, submitted):
+            path, query, authorization = targets[index % len(targets)]
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost', 'HTTP_AUTHORIZATION': authorization,
+                'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+            }
+            response = application(environ, start_response)
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return (time.perf_counter() - submitted) * 1000
+
+        samples = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in range(0, count, clients):
+                submitted = time.perf_counter()
+                futures = [pool.submit(timed, index, submitted) for index in range(batch, min(count, batch + clients))]
+                samples.extend(future.result() for future in futures)
+        return samples, time.perf_counter() - started
+
+    async def run_asgi(self, targets, count, clients):
+        """Application ASGI réelle, toutes les requêtes dans une boucle d'événements"""
+        application = get_asgi_application()
+
+        async def timed(index):
+            path, query, authorization = targets[index % len(targets)]
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'localhost'), (b'authorization', authorization.encode())],
+            }
+            finished = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start' and message['status'] != 200:
+                    raise CommandError(f"{path} : {message['status']}")
+                if message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            submitted = time.perf_counter()
+            await application(scope, receive, send)
+            return (time.perf_counter() - submitted) * 1000
+
+        samples = []
+        started = time.perf_counter()
+        for batch in range(0, count, clients):
+            samples.extend(await asyncio.gather(*(timed(index) for index in range(batch, min(count, batch + clients)))))
+        return samples, time.perf_counter() - started
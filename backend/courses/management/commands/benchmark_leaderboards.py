@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import LeaderboardEntry
+from courses.gamification import METRICS, Leaderboard
+
+class Command(BaseCommand):
+    help = 'Mesure les classements en mémoire (mises à jour, top N, rang) face aux requêtes SQL équivalentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Nombre d\'utilisateurs classés')
+        parser.add_argument('--updates', type=int, default=100000, help='Nombre de mises à jour incrémentales')
+        parser.add_argument('--iterations', type=int, default=200, help='Nombre de mesures par lecture')
+        parser.add_argument('--sql-iterations', type=int, default=20, help='Nombre de mesures par requête SQL')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def timed(self, func, iterations):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), max(samples)
+
+    def report(self, label, timing, unit='ms'):
+        median, worst = timing
+        if unit == 'µs':
+            median, worst = median * 1000, worst * 1000
+        self.stdout.write(f"  {label:<32}: médiane {median:.2f} {unit}, max {worst:.2f} {unit}")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = options['users']
+        rows = [(user_id, rng.randint(0, 50), rng.randint(0, 36000)) for user_id in range(1, users + 1)]
+
+        started = time.perf_counter()
+        board = Leaderboard(rows)
+        build = time.perf_counter() - started
+
+        updates = [
+            (rng.randint(1, users), (rng.randint(0, 1), rng.randint(0, 600)))
+            for _ in range(options['updates'])
+        ]
+        started = time.perf_counter()
+        for user_id, deltas in updates:
+            board.increment(user_id, deltas)
+        update_rate = len(updates) / (time.perf_counter() - started)
+
+        iterations = options['iterations']
+        self.stdout.write(f"Classement de {users} utilisateurs")
+        self.stdout.write(f"  construction                    : {build * 1000:.0f} ms")
+        self.stdout.write(f"  mises à jour incrémentales      : {update_rate:,.0f} / s")
+        memory = {
+            metric: (
+                self.timed(lambda: board.top(metric, 10), iterations),
+                self.timed(lambda: board.rank(metric, rng.randint(1, users)), iterations),
+            )
+            for metric in METRICS
+        }
+        for metric, (top, rank) in memory.items():
+            self.report(f"top 10 {metric} (mémoire)", top, 'µs')
+            self.report(f"rang {metric} (mémoire)", rank, 'µs')
+
+        # Même classement en base, calculé à chaque lecture (transaction annulée à la fin)
+        sql_iterations = options['sql_iterations']
+        with transaction.atomic():
+            LeaderboardEntry.objects.bulk_create([
+                LeaderboardEntry(scope='course', scope_id=0, user_id=user_id, completions=values[0], time_spent=values[1])
+                for user_id, values in board.scores.items()
+            ], batch_size=5000)
+            entries = LeaderboardEntry.objects.filter(scope='course', scope_id=0)
+            for metric in METRICS:
+                def sql_top():
+                    return list(entries.order_by(f'-{metric}', 'user_id').values_list('user_id', metric)[:10])
+
+                def sql_rank():
+                    value = entries.filter(user_id=rng.randint(1, users)).values_list(metric, flat=True).first()
+                    return entries.filter(**{f'{metric}__gt': value}).count() + 1
+
+                top, rank = self.timed(sql_top, sql_iterations), self.timed(sql_rank, sql_iterations)
+                self.report(f"top 10 {metric} (SQL)", top)
+                self.report(f"rang {metric} (SQL)", rank)
+                self.stdout.write(self.style.SUCCESS(
+                    f"  gain {metric} : top 10 x{top[0] / memory[metric][0][0]:.0f}, "
+                    f"rang x{rank[0] / memory[metric][1][0]:.0f}"
+                ))
+            transaction.set_rollback(True)
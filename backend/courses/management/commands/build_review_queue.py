@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from courses.reviews import build_queue
+
+class Command(BaseCommand):
+    help = 'Ajoute aux files de révision les questions ratées de l\'historique des quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Nombre d\'éléments insérés par requête')
+
+    def handle(self, *args, **options):
+        created = build_queue(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{created} questions ajoutées aux files de révision"))
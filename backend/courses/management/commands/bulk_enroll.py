@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from courses.enrollment import enroll_emails, read_emails, DEFAULT_BATCH_SIZE
+
+class Command(BaseCommand):
+    help = 'Inscrit une cohorte (CSV d\'emails étudiants) à un ensemble de cours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='Fichier CSV dont la première colonne contient les emails')
+        parser.add_argument('--course', type=int, action='append', dest='course_ids', default=[], help='ID d\'un cours (option répétable)')
+        parser.add_argument('--all-courses', action='store_true', help='Inscrire la cohorte à tous les cours actifs')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Nombre d\'emails traités par lot')
+
+    def handle(self, *args, **options):
+        if options['all_courses']:
+            courses = list(Course.objects.filter(is_active=True).only('id', 'title', 'published_version'))
+        else:
+            courses = list(Course.objects.filter(id__in=options['course_ids']).only('id', 'title', 'published_version'))
+            missing = set(options['course_ids']) - {course.id for course in courses}
+            if missing:
+                raise CommandError(f"Cours introuvables: {', '.join(map(str, sorted(missing)))}")
+        if not courses:
+            raise CommandError("Aucun cours sélectionné (utilisez --course ou --all-courses)")
+
+        # Le fichier est lu ligne par ligne : la mémoire ne dépend que de --batch-size
+        with open(options['csv_file'], newline='', encoding='utf-8-sig') as handle:
+            stats = enroll_emails(read_emails(handle), courses, batch_size=options['batch_size'])
+
+        if stats['unknown']:
+            self.stdout.write(self.style.WARNING(f"{stats['unknown']} emails sans compte utilisateur"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {stats['enrolled']} nouvelles inscriptions "
+            f"({stats['users']} utilisateurs, {len(courses)} cours)"
+        ))
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from courses.models import Course, Lesson, Quiz, Question, Answer
+from courses.seeding import BulkSeeder, DEFAULT_BATCH_SIZE
+from courses import synthetic
 import random
 
 class Command(BaseCommand):
@@ -8,10 +10,16 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--force', action='store_true', help='Force recreation of quizzes even if they exist')
+        parser.add_argument('--bulk', action='store_true', help='Generate generic quizzes with bulk_create (load-test datasets)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed used in bulk mode')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Number of quizzes inserted per batch in bulk mode')
 
     def handle(self, *args, **options):
         force = options.get('force', False)
         
+        if options['bulk']:
+            return self.handle_bulk(force, options['seed'], options['batch_size'])
+        
         # Get all lessons that could have a quiz
         eligible_lessons = Lesson.objects.filter(content_type__in=['text', 'video'])
         
@@ -46,6 +54,38 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'Successfully created {quiz_count} quizzes'))
     
+    def handle_bulk(self, force, seed, batch_size):
+        """Create generic quizzes for every eligible lesson, batch by batch"""
+        eligible_lessons = Lesson.objects.filter(content_type__in=['text', 'video'])
+        if force:
+            deleted, _ = Quiz.objects.filter(lesson__in=eligible_lessons).delete()
+            self.stdout.write(f'Deleted {deleted} existing rows')
+        else:
+            eligible_lessons = eligible_lessons.filter(quiz__isnull=True)
+        
+        seeder = BulkSeeder(batch_size=batch_size)
+        quiz_count = 0
+        pairs = []
+        lessons = eligible_lessons.order_by('id').only('id', 'title')
+        for lesson in lessons.iterator(chunk_size=batch_size):
+            # One generator per lesson keeps the output independent of batching
+            rng = random.Random(f"{seed}:quiz:{lesson.id}")
+            if rng.random() > 0.75:  # 75% chance of creating a quiz
+                continue
+            pairs.append((lesson, synthetic.build_quiz(rng, lesson.title)))
+            if len(pairs) >= batch_size:
+                with transaction.atomic():
+                    quiz_count += len(seeder.insert_quizzes(pairs))
+                pairs = []
+        if pairs:
+            with transaction.atomic():
+                quiz_count += len(seeder.insert_quizzes(pairs))
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {quiz_count} quizzes '
+            f'({seeder.total_rows} rows, {seeder.rows_per_second:.0f} rows/s)'
+        ))
+    
     def create_quiz(self, lesson):
         """Create a quiz with questions and answers for a lesson"""
         course_name = lesson.course.title.lower()
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from courses.models import Course, Enrollment
+from courses.models import Course
+from courses.enrollment import enroll_users
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -20,26 +20,13 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"L'utilisateur {username} n'existe pas"))
             return
             
-        courses = Course.objects.all()
-        if not courses.exists():
+        courses = list(Course.objects.only('id', 'title', 'published_version'))
+        if not courses:
             self.stdout.write(self.style.ERROR("Aucun cours disponible"))
             return
             
-        count = 0
-        for course in courses:
-            enrollment, created = Enrollment.objects.get_or_create(
-                user=user,
-                course=course,
-                defaults={
-                    'progress': 0,
-                    'enrolled_at': timezone.now()
-                }
-            )
-            
-            if created:
-                count += 1
-                self.stdout.write(self.style.SUCCESS(f"Inscrit à: {course.title}"))
-            else:
-                self.stdout.write(self.style.WARNING(f"Déjà inscrit à: {course.title}"))
-                
-        self.stdout.write(self.style.SUCCESS(f"Total: {count} nouvelles inscriptions")) 
\ No newline at end of file
+        stats = enroll_users([user.id], courses)
+        already = len(courses) - stats['enrolled']
+        if already:
+            self.stdout.write(self.style.WARNING(f"Déjà inscrit à {already} cours"))
+        self.stdout.write(self.style.SUCCESS(f"Total: {stats['enrolled']} nouvelles inscriptions"))
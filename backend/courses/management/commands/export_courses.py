@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from courses.bundles import export_bundle, DEFAULT_BATCH_SIZE
+
+class Command(BaseCommand):
+    help = 'Exporte des cours complets (sections, leçons, quiz, compétences, fichiers) dans une archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Fichier de l\'archive (.zip)')
+        parser.add_argument('--course', type=int, action='append', dest='course_ids', default=[], help='ID d\'un cours (option répétable)')
+        parser.add_argument('--all-courses', action='store_true', help='Exporter tous les cours actifs')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_BATCH_SIZE, help='Nombre de lignes lues par bloc')
+
+    def handle(self, *args, **options):
+        if options['all_courses']:
+            course_ids = list(Course.objects.filter(is_active=True).values_list('id', flat=True))
+        else:
+            course_ids = list(Course.objects.filter(id__in=options['course_ids']).values_list('id', flat=True))
+            missing = set(options['course_ids']) - set(course_ids)
+            if missing:
+                raise CommandError(f"Cours introuvables: {', '.join(map(str, sorted(missing)))}")
+        if not course_ids:
+            raise CommandError("Aucun cours sélectionné (utilisez --course ou --all-courses)")
+
+        manifest = export_bundle(course_ids, options['output'], chunk_size=options['chunk_size'])
+
+        counts = ', '.join(f"{count} {name}" for name, count in manifest['counts'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(manifest['courses'])} cours exportés dans {options['output']} ({counts}, {manifest['files']} fichiers)"
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from courses.gradebook import Gradebook, iter_csv, write_parquet, FORMATS, DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Exporte le carnet de notes d\'un cours (CSV ou Parquet) en flux'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int, help='ID du cours')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Format de sortie')
+        parser.add_argument('--output', type=str, default='-', help='Fichier de sortie (- pour la sortie standard, CSV uniquement)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Nombre de lignes lues par bloc')
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(id=options['course_id'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Le cours {options['course_id']} n'existe pas")
+
+        book = Gradebook(course, chunk_size=options['chunk_size'])
+        output = options['output']
+
+        if options['format'] == 'parquet':
+            if output == '-':
+                raise CommandError("L'export Parquet nécessite --output")
+            try:
+                write_parquet(book, output)
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+        else:
+            if output == '-':
+                for line in iter_csv(book):
+                    self.stdout.write(line, ending='')
+            else:
+                with open(output, 'w', newline='', encoding='utf-8') as handle:
+                    handle.writelines(iter_csv(book))
+
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f"Carnet de notes exporté dans {output}"))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from courses.bundles import import_bundle, BundleError, DEFAULT_BATCH_SIZE
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Importe les cours d\'une archive produite par export_courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', type=str, help='Fichier de l\'archive (.zip)')
+        parser.add_argument('--owner', type=str, default='admin', help='Nom de l\'utilisateur propriétaire des cours importés')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Nombre de lignes insérées par lot')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"L'utilisateur {options['owner']} n'existe pas")
+
+        started = time.perf_counter()
+        try:
+            course_ids, counts = import_bundle(options['bundle'], owner, batch_size=options['batch_size'])
+        except (BundleError, OSError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        rows = sum(counts.values())
+        details = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(course_ids)} cours importés en {elapsed:.1f} s ({details} ; {rows / elapsed if elapsed else 0:.0f} lignes/s)"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from courses.gamification import rebuild_leaderboards, rebuild_streaks
+
+class Command(BaseCommand):
+    help = 'Recalcule les classements et les séries d\'apprentissage depuis l\'historique de progression'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-streaks', action='store_true', help='Ne recalculer que les classements')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Nombre de lignes insérées par requête')
+
+    def handle(self, *args, **options):
+        entries = rebuild_leaderboards(batch_size=options['batch_size'])
+        self.stdout.write(f"{entries} lignes de classement recalculées")
+        if not options['skip_streaks']:
+            streaks = rebuild_streaks(batch_size=options['batch_size'])
+            self.stdout.write(f"{streaks} séries recalculées")
+        self.stdout.write(self.style.SUCCESS("Classements reconstruits"))
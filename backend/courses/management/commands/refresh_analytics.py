@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from courses.models import Course
+from courses.analytics import refresh_course, refresh_stale
+
+class Command(BaseCommand):
+    help = 'Rafraîchit les statistiques matérialisées des instructeurs (à planifier, ex. cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids', default=[], help='ID d\'un cours à recalculer (option répétable)')
+        parser.add_argument('--full', action='store_true', help='Recalculer tous les cours, même sans nouvelle activité')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        if options['course_ids'] or options['full']:
+            courses = Course.objects.all()
+            if options['course_ids']:
+                courses = courses.filter(id__in=options['course_ids'])
+            count = 0
+            for course in courses.iterator():
+                refresh_course(course)
+                count += 1
+        else:
+            count = refresh_stale()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{count} cours rafraîchis en {elapsed:.2f}s"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from courses.item_analysis import rebuild
+
+class Command(BaseCommand):
+    help = 'Recalcule les statistiques d\'item des questions de quiz depuis l\'historique des réponses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='ID du cours (par défaut : tous les quiz)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Nombre de lignes écrites par requête')
+
+    def handle(self, *args, **options):
+        course = None
+        if options['course']:
+            course = Course.objects.filter(id=options['course']).first()
+            if course is None:
+                raise CommandError(f"Cours introuvable: {options['course']}")
+        count = rebuild(course, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Statistiques recalculées pour {count} questions"))
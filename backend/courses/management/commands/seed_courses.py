@@ -1,6 +1,11 @@
-from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from django.utils.text import slugify
 from courses.models import Category, Course, CourseSection, Lesson
+from courses.seeding import BulkSeeder, DEFAULT_BATCH_SIZE
+from courses import synthetic
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -8,10 +13,18 @@ User = get_user_model()
 class Command(BaseCommand):
     help = 'Crée des données de démonstration pour les cours'
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write(self.style.SUCCESS('Création des données de démonstration...'))
-        
-        # Création des utilisateurs si nécessaire
+    def add_arguments(self, parser):
+        # Mode "charge" : données synthétiques déterministes insérées par lots
+        parser.add_argument('--courses', type=int, default=0, help='Nombre de cours synthétiques à générer (active le mode charge)')
+        parser.add_argument('--lessons-per-course', type=int, default=10, help='Nombre de leçons par cours')
+        parser.add_argument('--users', type=int, default=0, help='Nombre d\'utilisateurs synthétiques à générer')
+        parser.add_argument('--enrollments-per-user', type=int, default=3, help='Nombre d\'inscriptions par utilisateur synthétique')
+        parser.add_argument('--quiz-ratio', type=float, default=0.5, help='Proportion des leçons texte/vidéo recevant un quiz')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du générateur (mêmes données pour une même graine)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Taille des lots bulk_create')
+        parser.add_argument('--workers', type=int, default=1, help='Nombre de processus de génération')
+
+    def get_admin_user(self):
         admin_user, created = User.objects.get_or_create(
             username='admin',
             defaults={
@@ -24,6 +37,16 @@ class Command(BaseCommand):
             admin_user.set_password('adminpassword')
             admin_user.save()
             self.stdout.write(self.style.SUCCESS('Utilisateur admin créé'))
+        return admin_user
+
+    def handle(self, *args, **kwargs):
+        if kwargs['courses'] > 0:
+            return self.handle_scale(**kwargs)
+
+        self.stdout.write(self.style.SUCCESS('Création des données de démonstration...'))
+        
+        # Création des utilisateurs si nécessaire
+        admin_user = self.get_admin_user()
         
         # Création des catégories
         categories = [
@@ -300,4 +323,64 @@ class Command(BaseCommand):
                         )
                         self.stdout.write(self.style.SUCCESS(f'    Leçon "{lesson.title}" créée'))
         
-        self.stdout.write(self.style.SUCCESS('Création des données de démonstration terminée !')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Création des données de démonstration terminée !')) 
+
+    def handle_scale(self, **options):
+        """Génère un jeu de données de charge avec bulk_create, éventuellement en parallèle"""
+        seed = options['seed']
+        course_count = options['courses']
+        lessons_per_course = options['lessons_per_course']
+        user_count = options['users']
+        batch_size = options['batch_size']
+        workers = options['workers']
+
+        first_slug = slugify(synthetic.build_course(seed, 0, 0)['title'])
+        if Course.objects.filter(slug=first_slug).exists():
+            raise CommandError(f"Les données de la graine {seed} existent déjà, utilisez une autre --seed")
+
+        admin_user = self.get_admin_user()
+        categories = []
+        for topic in synthetic.TOPICS:
+            category, _ = Category.objects.get_or_create(
+                slug=slugify(f"synthetique {topic}"),
+                defaults={'name': f"{topic} (synthétique)"}
+            )
+            categories.append(category)
+
+        seeder = BulkSeeder(batch_size=batch_size)
+        chunk = max(1, batch_size // max(lessons_per_course, 1))
+        tasks = [
+            (seed, start, min(start + chunk, course_count), lessons_per_course, options['quiz_ratio'])
+            for start in range(0, course_count, chunk)
+        ]
+
+        course_map = {}
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            # map() conserve l'ordre des tranches : le résultat reste déterministe
+            plans_iter = executor.map(synthetic.build_courses, tasks) if executor else map(synthetic.build_courses, tasks)
+            for plans in plans_iter:
+                with transaction.atomic():
+                    course_map.update(seeder.insert_courses(plans, categories, admin_user))
+                self.stdout.write(f"{len(course_map)}/{course_count} cours, {seeder.rows_per_second:.0f} lignes/s")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if user_count:
+            # Un seul hachage partagé : le hacheur domine sinon le temps de génération
+            password_hash = make_password(f"load-{seed}")
+            for start in range(0, user_count, batch_size):
+                stop = min(start + batch_size, user_count)
+                with transaction.atomic():
+                    user_ids = seeder.insert_users(seed, start, stop, password_hash)
+                    seeder.insert_enrollments(
+                        seed, start, user_ids, course_map, options['enrollments_per_user']
+                    )
+                self.stdout.write(f"{stop}/{user_count} utilisateurs, {seeder.rows_per_second:.0f} lignes/s")
+
+        for label, count in sorted(seeder.counts.items()):
+            self.stdout.write(f"  {label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{seeder.total_rows} lignes insérées ({seeder.rows_per_second:.0f} lignes/s)"
+        ))
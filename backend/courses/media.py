@@ -0,0 +1,165 @@
+"""
+Diffusion des pièces jointes des leçons (PDF, audio, vidéo, présentations).
+
+L'autorisation (inscription au cours ou instructeur) est vérifiée une seule
+fois, quand l'URL est émise : l'URL est signée et expire, et chaque requête
+de lecture (un lecteur vidéo en envoie une par plage) ne vérifie plus que la
+signature, sans aucune requête en base.
+
+Trois modes de diffusion (MEDIA_SERVE_MODE) :
+- 'django' : Django répond aux requêtes Range ; le fichier est transmis au
+  serveur WSGI (wsgi.file_wrapper, donc sendfile avec gunicorn) sans être
+  chargé en mémoire ;
+- 'x-accel' : nginx envoie le fichier (X-Accel-Redirect vers une location
+  "internal" pointant sur MEDIA_ROOT, MEDIA_ACCEL_REDIRECT_PREFIX) ;
+- 'x-sendfile' : Apache/lighttpd envoient le fichier (X-Sendfile).
+Dans les deux derniers cas, le serveur web gère lui-même les plages.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+
+URL_TTL = getattr(settings, 'LESSON_MEDIA_URL_TTL', 6 * 60 * 60)
+SERVE_MODE = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+CHUNK_SIZE = 64 * 1024
+SIGNING_SALT = 'courses.media.attachment'
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def sign_attachment(lesson, user):
+    """Jeton signé donnant accès à la pièce jointe actuelle de la leçon"""
+    return signing.dumps(
+        {'lesson': lesson.id, 'user': user.id, 'name': lesson.attachment.name},
+        salt=SIGNING_SALT, compress=True
+    )
+
+
+def attachment_url(request, lesson, user):
+    """URL signée et temporaire de la pièce jointe (l'appelant a vérifié l'accès)"""
+    if not lesson.attachment:
+        return None
+    url = reverse('lesson-media', kwargs={
+        'token': sign_attachment(lesson, user),
+        'filename': os.path.basename(lesson.attachment.name),
+    })
+    return request.build_absolute_uri(url) if request else url
+
+
+def read_token(token):
+    """Retourne le nom du fichier autorisé par le jeton, ou lève Http404"""
+    try:
+        payload = signing.loads(token, salt=SIGNING_SALT, max_age=URL_TTL)
+    except signing.BadSignature:  # Inclut SignatureExpired
+        raise Http404("Lien invalide ou expiré.")
+    return payload['name']
+
+
+def parse_range(header, size):
+    """
+    Retourne (début, fin inclusive) pour une plage unique valide, None si
+    l'en-tête est absent ou non géré (réponse complète), ou lève ValueError
+    si la plage ne peut pas être satisfaite.
+    """
+    match = RANGE_HEADER.match(header or '')
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffixe : les N derniers octets
+        length = int(end)
+        if length == 0:
+            raise ValueError
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+class _BoundedFile:
+    """Lecture d'une plage [offset, offset + length) d'un fichier, par blocs"""
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.remaining = length
+
+    def __iter__(self):
+        while self.remaining > 0:
+            chunk = self.handle.read(min(CHUNK_SIZE, self.remaining))
+            if not chunk:
+                break
+            self.remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        # Appelé par Django à la fin de la réponse, même si le client s'est déconnecté
+        self.handle.close()
+
+
+def _content_type(name):
+    content_type, encoding = mimetypes.guess_type(name)
+    return content_type or 'application/octet-stream'
+
+
+def serve_file(request, storage, name):
+    """Répond avec le fichier, en tenant compte des requêtes Range"""
+    if SERVE_MODE == 'x-accel':
+        response = HttpResponse(content_type=_content_type(name))
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX + name
+    elif SERVE_MODE == 'x-sendfile':
+        response = HttpResponse(content_type=_content_type(name))
+        response['X-Sendfile'] = storage.path(name)
+    else:
+        response = _serve_range(request, storage, name)
+    response['Cache-Control'] = f'private, max-age={URL_TTL}'
+    return response
+
+
+def _serve_range(request, storage, name):
+    try:
+        size = storage.size(name)
+    except FileNotFoundError:
+        raise Http404("Fichier introuvable.")
+    # Le nom est dérivé du contenu (voir users.storage) : c'est aussi un validateur fort
+    etag = f'"{os.path.splitext(os.path.basename(name))[0]}"'
+
+    header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        header = None
+    try:
+        byte_range = parse_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    handle = storage.open(name, 'rb')
+    if byte_range is None:
+        # Fichier complet : FileResponse passe le fichier à wsgi.file_wrapper (sendfile)
+        response = FileResponse(handle, content_type=_content_type(name))
+    else:
+        start, end = byte_range
+        handle.seek(start)
+        if end == size - 1:
+            # Plage jusqu'à la fin (cas des lecteurs vidéo) : sendfile depuis la position courante
+            response = FileResponse(handle, content_type=_content_type(name), status=206)
+        else:
+            response = StreamingHttpResponse(
+                _BoundedFile(handle, end - start + 1), content_type=_content_type(name), status=206
+            )
+            response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
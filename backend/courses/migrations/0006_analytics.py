@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_courseprogress_timespent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrolled_count', models.PositiveIntegerField(default=0)),
+                ('started_count', models.PositiveIntegerField(default=0, help_text='Étudiants ayant commencé au moins une leçon')),
+                ('halfway_count', models.PositiveIntegerField(default=0, help_text='Étudiants ayant atteint 50% de progression')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('certificate_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Course analytics',
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0, help_text='Rang de la leçon dans le parcours du cours')),
+                ('started_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('drop_off', models.IntegerField(default=0, help_text="Étudiants perdus depuis l'étape précédente")),
+                ('total_time_spent', models.PositiveBigIntegerField(default=0)),
+                ('avg_time_spent', models.FloatField(default=0, help_text='Temps moyen par étudiant (en secondes)')),
+            ],
+            options={
+                'verbose_name_plural': 'Lesson analytics',
+                'ordering': ['course', 'position'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizAnalytics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('passed_count', models.PositiveIntegerField(default=0, help_text='Étudiants ayant réussi au moins une fois')),
+                ('pass_rate', models.FloatField(default=0)),
+                ('avg_score', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Quiz analytics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['last_activity'], name='courses_enr_last_ac_e4ae27_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['last_accessed'], name='courses_les_last_ac_e6fd4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['created_at'], name='courses_qui_created_f2b7e8_idx'),
+        ),
+        migrations.AddField(
+            model_name='courseanalytics',
+            name='course',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='lessonanalytics',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_analytics', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='lessonanalytics',
+            name='lesson',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='courses.lesson'),
+        ),
+        migrations.AddField(
+            model_name='quizanalytics',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_analytics', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='quizanalytics',
+            name='quiz',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analytics', to='courses.quiz'),
+        ),
+    ]
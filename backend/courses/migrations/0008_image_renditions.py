@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:15
+
+import users.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_progresssyncevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='courses/', validators=[users.images.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='courses/thumbnails/', validators=[users.images.validate_image_upload]),
+        ),
+    ]
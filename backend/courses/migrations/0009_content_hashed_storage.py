@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:17
+
+import users.images
+import users.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.content_hashed_storage, upload_to='courses/', validators=[users.images.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.content_hashed_storage, upload_to='courses/thumbnails/', validators=[users.images.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='attachment',
+            field=models.FileField(blank=True, null=True, storage=users.storage.content_hashed_storage, upload_to='lessons/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_content_hashed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='content_version',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Recherche de l'admin par préfixe, insensible à la casse (istartswith) :
+# (index, table, colonne)
+PREFIX_INDEXES = [
+    ('certificate_id_nocase_idx', 'courses_certificate', 'certificate_id'),
+    ('course_title_nocase_idx', 'courses_course', 'title'),
+    ('lesson_title_nocase_idx', 'courses_lesson', 'title'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # SQLite : LIKE 'x%' n'utilise qu'un index NOCASE ; PostgreSQL : istartswith
+    # compare UPPER(colonne::text) avec LIKE, d'où un index d'expression text_pattern_ops
+    vendor = schema_editor.connection.vendor
+    quote = schema_editor.quote_name
+    for name, table, column in PREFIX_INDEXES:
+        if vendor == 'sqlite':
+            expression = f'{quote(column)} COLLATE NOCASE'
+        elif vendor == 'postgresql':
+            expression = f'(UPPER({quote(column)}::text)) text_pattern_ops'
+        else:
+            continue
+        schema_editor.execute(f'CREATE INDEX {quote(name)} ON {quote(table)} ({expression})')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for name, _, _ in PREFIX_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['created_at'], name='courses_use_created_d55b3a_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('courses', '0012_admin_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningStreak',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='learning_streak', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_active_on', models.DateField(blank=True, null=True)),
+                ('activity_days', models.BigIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('course', 'Cours'), ('category', 'Catégorie')], max_length=10)),
+                ('scope_id', models.PositiveIntegerField()),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('time_spent', models.PositiveBigIntegerField(default=0, help_text='Temps passé (en secondes)')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Leaderboard entries',
+                'indexes': [models.Index(fields=['updated_at'], name='courses_lea_updated_7cbe7e_idx')],
+                'unique_together': {('scope', 'scope_id', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_gamification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ease_factor', models.FloatField(default=2.5)),
+                ('interval', models.PositiveIntegerField(default=0, help_text='Intervalle actuel (en jours)')),
+                ('repetitions', models.PositiveSmallIntegerField(default=0)),
+                ('lapses', models.PositiveIntegerField(default=0)),
+                ('due_on', models.DateField()),
+                ('last_reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'due_on'], name='courses_rev_user_id_1582bb_idx')],
+                'unique_together': {('user', 'question')},
+            },
+        ),
+    ]
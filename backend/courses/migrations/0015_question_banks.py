@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_review_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Facile'), (2, 'Moyenne'), (3, 'Difficile')], default=2),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tag',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_per_attempt',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Nombre de questions tirées par tentative (vide : toutes les questions)', null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='stratify_by',
+            field=models.CharField(blank=True, choices=[('', 'Aucune'), ('tag', 'Étiquette'), ('difficulty', 'Difficulté')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='question_ids',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_question_banks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerStatistics',
+            fields=[
+                ('answer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='courses.answer')),
+                ('selections', models.PositiveIntegerField(default=0)),
+                ('paired_selections', models.PositiveIntegerField(default=0)),
+                ('selected_rest_score_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Answer statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStatistics',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='courses.question')),
+                ('responses', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('paired_responses', models.PositiveIntegerField(default=0)),
+                ('paired_correct', models.PositiveIntegerField(default=0)),
+                ('rest_score_sum', models.FloatField(default=0)),
+                ('rest_score_sq_sum', models.FloatField(default=0)),
+                ('correct_rest_score_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Question statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_item_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
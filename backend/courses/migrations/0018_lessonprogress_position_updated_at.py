@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_leaderboard_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='position_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.text import slugify
+from django.utils import timezone
+import hashlib
 import uuid
 from django.contrib.auth.models import User
+from users.images import RenditionsMixin, validate_image_upload
+from users.storage import content_hashed_storage
 
 # Create your models here.
 
@@ -24,7 +28,7 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
 
-class Course(models.Model):
+class Course(RenditionsMixin, models.Model):
     LEVEL_CHOICES = [
         ('beginner', 'Débutant'),
         ('intermediate', 'Intermédiaire'),
@@ -41,8 +45,16 @@ class Course(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     subtitle = models.CharField(max_length=255, blank=True)
     description = models.TextField()
-    image = models.ImageField(upload_to='courses/', blank=True, null=True)
-    thumbnail = models.ImageField(upload_to='courses/thumbnails/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='courses/', storage=content_hashed_storage, blank=True, null=True,
+        validators=[validate_image_upload]
+    )
+    thumbnail = models.ImageField(
+        upload_to='courses/thumbnails/', storage=content_hashed_storage, blank=True, null=True,
+        validators=[validate_image_upload]
+    )
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    thumbnail_renditions = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='courses')
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_courses')
     instructors = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='taught_courses', blank=True)
@@ -62,11 +74,42 @@ class Course(models.Model):
     syllabus = models.TextField(blank=True, help_text="Plan du cours")
     meta_keywords = models.CharField(max_length=255, blank=True, help_text="Mots-clés pour le référencement")
     certificate_available = models.BooleanField(default=True)
+    # Instantané compilé à la publication (voir courses.versions)
+    published_version = models.ForeignKey(
+        'CourseVersion', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+
+    # Les déclinaisons des images sont générées en arrière-plan (voir users.images)
+    RENDITION_FIELDS = {
+        'image': ('image_renditions', 'cover'),
+        'thumbnail': ('thumbnail_renditions', 'card'),
+    }
+    
+    # Recherche de l'admin par préfixe, insensible à la casse : index propre à
+    # chaque base, créé par la migration 0012 (course_title_nocase_idx)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_status = instance.__dict__.get('status')
+        instance._stored_is_active = instance.__dict__.get('is_active')
+        return instance
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        status_changed = getattr(self, '_stored_status', None) != self.status
+        active_changed = getattr(self, '_stored_is_active', None) != self.is_active
         super().save(*args, **kwargs)
+        self._stored_status = self.status
+        self._stored_is_active = self.is_active
+        if status_changed:
+            # Publication compilée à la validation, une fois les sections et leçons de la transaction écrites
+            from .versions import status_changed as on_status_changed
+            transaction.on_commit(lambda: on_status_changed(self.pk, self.status))
+        elif active_changed:
+            from .versions import forget_current
+            transaction.on_commit(lambda: forget_current(self.pk))
     
     def __str__(self):
         return self.title
@@ -94,6 +137,23 @@ class CourseSection(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+class LessonQuerySet(models.QuerySet):
+    """Les mises à jour en masse du contenu invalident aussi son empreinte (voir Lesson.save)"""
+
+    def update(self, **kwargs):
+        if 'content_version' not in kwargs and not kwargs.keys().isdisjoint(Lesson.CONTENT_FIELDS):
+            # Vide : recalculée au prochain accès par courses.content.content_version
+            kwargs['content_version'] = ''
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        if 'content_version' not in fields and not set(fields).isdisjoint(Lesson.CONTENT_FIELDS):
+            objs = list(objs)
+            for lesson in objs:
+                lesson.content_version = lesson.compute_content_version()
+            fields = [*fields, 'content_version']
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
 class Lesson(models.Model):
     CONTENT_TYPE_CHOICES = [
         ('video', 'Vidéo'),
@@ -116,13 +176,33 @@ class Lesson(models.Model):
     order = models.PositiveIntegerField(default=0)
     duration = models.CharField(max_length=20, default='10 min')  # Durée estimée de la leçon
     is_free = models.BooleanField(default=False, help_text="Leçon disponible en preview gratuit")
-    attachment = models.FileField(upload_to='lessons/', null=True, blank=True)
+    attachment = models.FileField(upload_to='lessons/', storage=content_hashed_storage, null=True, blank=True)
+    # Empreinte du contenu servi par courses.content (vide : calculée au premier accès)
+    content_version = models.CharField(max_length=16, blank=True, editable=False)
+    
+    CONTENT_FIELDS = ('title', 'description', 'content_type', 'content', 'video_url', 'video_duration', 'duration')
+    
+    objects = LessonQuerySet.as_manager()
     
     class Meta:
         ordering = ['order']
+        # Index de recherche par préfixe : migration 0012 (lesson_title_nocase_idx)
         
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+    
+    def compute_content_version(self):
+        digest = hashlib.sha256()
+        for field in self.CONTENT_FIELDS:
+            digest.update(str(getattr(self, field)).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()[:16]
+    
+    def save(self, *args, **kwargs):
+        self.content_version = self.compute_content_version()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'content_version']
+        super().save(*args, **kwargs)
 
 class Skill(models.Model):
     name = models.CharField(max_length=100)
@@ -137,6 +217,31 @@ class CourseSkill(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.skill.name}"
 
+class CourseVersion(models.Model):
+    """Instantané immuable de l'arborescence d'un cours publié (voir courses.versions)"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField()
+    document = models.JSONField()
+    # Leçons comptées dans la progression des inscriptions à cette version
+    lesson_ids = models.JSONField(default=list)
+    checksum = models.CharField(max_length=64)
+    published_at = models.DateTimeField(auto_now_add=True)
+    published_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    
+    class Meta:
+        unique_together = ['course', 'number']
+        ordering = ['-number']
+    
+    def __str__(self):
+        return f"{self.course.title} - v{self.number}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Une version publiée ne peut pas être modifiée.")
+        super().save(*args, **kwargs)
+
 class Certificate(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='certificates')
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
@@ -144,6 +249,8 @@ class Certificate(models.Model):
     certificate_id = models.CharField(max_length=50, unique=True)
     pdf_file = models.FileField(upload_to='certificates/', blank=True, null=True)
     
+    # Index de recherche par préfixe : migration 0012 (certificate_id_nocase_idx)
+    
     def save(self, *args, **kwargs):
         if not self.certificate_id:
             self.certificate_id = f"CERT-{uuid.uuid4().hex[:8].upper()}"
@@ -161,9 +268,24 @@ class Enrollment(models.Model):
     completed = models.BooleanField(default=False)
     completion_date = models.DateTimeField(null=True, blank=True)
     certificate_issued = models.BooleanField(default=False)
+    # Version du cours suivie : la progression est calculée sur ses leçons (vide : cours en direct)
+    course_version = models.ForeignKey(
+        'CourseVersion', on_delete=models.SET_NULL, null=True, blank=True, related_name='enrollments'
+    )
     
     class Meta:
         unique_together = ['user', 'course']
+        indexes = [
+            models.Index(fields=['last_activity']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.course_version_id is None:
+            # Lu en base : l'instance du cours peut précéder la dernière publication
+            self.course_version_id = Course.objects.filter(pk=self.course_id).values_list(
+                'published_version_id', flat=True
+            ).first()
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.user} - {self.course}"
@@ -175,12 +297,21 @@ class LessonProgress(models.Model):
     completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
     last_position = models.PositiveIntegerField(default=0, help_text="Dernière position dans la vidéo (en secondes)")
+    # Instant de la position enregistrée : une position regroupée plus ancienne ne l'écrase pas
+    position_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
     time_spent = models.PositiveIntegerField(default=0, help_text="Temps total passé sur cette leçon (en secondes)")
     notes = models.TextField(blank=True, help_text="Notes personnelles de l'utilisateur")
     last_accessed = models.DateTimeField(auto_now=True)
+    # Version du cours au moment où la leçon a été terminée
+    course_version = models.ForeignKey(
+        'CourseVersion', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
     
     class Meta:
         unique_together = ['user', 'lesson']
+        indexes = [
+            models.Index(fields=['last_accessed']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.lesson.title} - {'Complété' if self.completed else 'En cours'}"
@@ -204,6 +335,9 @@ class UserActivity(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'User activities'
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.activity_type} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
@@ -214,6 +348,17 @@ class Quiz(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     pass_percentage = models.PositiveSmallIntegerField(default=70)  # Pourcentage minimum pour réussir
+    # Mode banque de questions (voir courses.quizzes) : questions tirées à chaque tentative
+    STRATIFY_CHOICES = [
+        ('', 'Aucune'),
+        ('tag', 'Étiquette'),
+        ('difficulty', 'Difficulté'),
+    ]
+    
+    questions_per_attempt = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text="Nombre de questions tirées par tentative (vide : toutes les questions)"
+    )
+    stratify_by = models.CharField(max_length=10, choices=STRATIFY_CHOICES, blank=True, default='')
     
     class Meta:
         verbose_name_plural = 'Quizzes'
@@ -226,12 +371,35 @@ class Question(models.Model):
     text = models.TextField()
     explanation = models.TextField(blank=True, help_text="Explication affichée après réponse incorrecte")
     order = models.PositiveIntegerField(default=0)
+    DIFFICULTY_CHOICES = [
+        (1, 'Facile'),
+        (2, 'Moyenne'),
+        (3, 'Difficile'),
+    ]
+    
+    tag = models.CharField(max_length=50, blank=True)
+    difficulty = models.PositiveSmallIntegerField(choices=DIFFICULTY_CHOICES, default=2)
     
     class Meta:
         ordering = ['order']
     
     def __str__(self):
         return f"Question {self.order+1}: {self.text[:50]}..."
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._invalidate_bank()
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._invalidate_bank()
+        return result
+    
+    def _invalidate_bank(self):
+        # Identifiants de la banque du quiz (tirages) relus à la prochaine tentative
+        from .quizzes import invalidate_bank
+        quiz_id = self.quiz_id
+        transaction.on_commit(lambda: invalidate_bank(quiz_id))
 
 class Answer(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
@@ -247,9 +415,14 @@ class QuizAttempt(models.Model):
     score = models.FloatField()  # Pourcentage de réussite
     passed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Questions tirées (mode banque) : entiers 32 bits little-endian, vide si toutes les questions
+    question_ids = models.BinaryField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.quiz} - Score: {self.score}%"
@@ -303,3 +476,167 @@ class TimeSpent(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.duration} seconds"
+
+
+# Agrégats matérialisés pour les statistiques des instructeurs
+class CourseAnalytics(models.Model):
+    """Entonnoir inscription → achèvement d'un cours, recalculé par refresh_analytics"""
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='analytics')
+    enrolled_count = models.PositiveIntegerField(default=0)
+    started_count = models.PositiveIntegerField(default=0, help_text="Étudiants ayant commencé au moins une leçon")
+    halfway_count = models.PositiveIntegerField(default=0, help_text="Étudiants ayant atteint 50% de progression")
+    completed_count = models.PositiveIntegerField(default=0)
+    certificate_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = 'Course analytics'
+    
+    def __str__(self):
+        return f"Analytics: {self.course.title}"
+
+class LessonAnalytics(models.Model):
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='analytics')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lesson_analytics')
+    position = models.PositiveIntegerField(default=0, help_text="Rang de la leçon dans le parcours du cours")
+    started_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    drop_off = models.IntegerField(default=0, help_text="Étudiants perdus depuis l'étape précédente")
+    total_time_spent = models.PositiveBigIntegerField(default=0)
+    avg_time_spent = models.FloatField(default=0, help_text="Temps moyen par étudiant (en secondes)")
+    
+    class Meta:
+        ordering = ['course', 'position']
+        verbose_name_plural = 'Lesson analytics'
+    
+    def __str__(self):
+        return f"Analytics: {self.lesson.title}"
+
+class QuizAnalytics(models.Model):
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='analytics')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='quiz_analytics')
+    attempt_count = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    passed_count = models.PositiveIntegerField(default=0, help_text="Étudiants ayant réussi au moins une fois")
+    pass_rate = models.FloatField(default=0)
+    avg_score = models.FloatField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Quiz analytics'
+    
+    def __str__(self):
+        return f"Analytics: {self.quiz.title}"
+
+class ProgressSyncEvent(models.Model):
+    """Identifiants des événements de progression déjà appliqués (rejeux des clients hors ligne)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='progress_sync_events')
+    event_id = models.CharField(max_length=64)
+    applied_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['user', 'event_id']
+    
+    def __str__(self):
+        return f"{self.user} - {self.event_id}"
+
+class LearningStreak(models.Model):
+    """Série de jours d'apprentissage consécutifs d'un utilisateur (voir courses.gamification)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='learning_streak'
+    )
+    last_active_on = models.DateField(null=True, blank=True)
+    # Bit i : activité le jour last_active_on - i jours (fenêtre glissante de 63 jours)
+    activity_days = models.BigIntegerField(default=0)
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user} - {self.current_streak} jour(s)"
+
+class LeaderboardEntry(models.Model):
+    """Instantané du score d'un utilisateur dans un classement de cours ou de catégorie"""
+    SCOPE_CHOICES = [
+        ('course', 'Cours'),
+        ('category', 'Catégorie'),
+    ]
+    
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveIntegerField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    completions = models.PositiveIntegerField(default=0)
+    time_spent = models.PositiveBigIntegerField(default=0, help_text="Temps passé (en secondes)")
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['scope', 'scope_id', 'user']
+        verbose_name_plural = 'Leaderboard entries'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} - {self.user_id}"
+
+class LeaderboardGeneration(models.Model):
+    """Numéro de la dernière reconstruction des classements (une seule ligne, voir courses.gamification)"""
+    number = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Génération {self.number}"
+
+class ReviewItem(models.Model):
+    """Question à revoir par un utilisateur, planifiée par répétition espacée (voir courses.reviews)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='review_items')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    ease_factor = models.FloatField(default=2.5)
+    interval = models.PositiveIntegerField(default=0, help_text="Intervalle actuel (en jours)")
+    repetitions = models.PositiveSmallIntegerField(default=0)  # Révisions réussies consécutives
+    lapses = models.PositiveIntegerField(default=0)
+    due_on = models.DateField()
+    last_reviewed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['user', 'question']
+        indexes = [
+            # File du jour : un parcours d'intervalle sur (user, due_on)
+            models.Index(fields=['user', 'due_on']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} - Q: {self.question_id} - {self.due_on}"
+
+class QuestionStatistics(models.Model):
+    """
+    Statistiques d'item d'une question, sous forme de sommes cumulables
+    (voir courses.item_analysis) : taux de réussite et discrimination en
+    sont dérivés sans relire QuizAnswer.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    responses = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    # Réponses dont la tentative compte au moins une autre question (score du reste défini)
+    paired_responses = models.PositiveIntegerField(default=0)
+    paired_correct = models.PositiveIntegerField(default=0)
+    rest_score_sum = models.FloatField(default=0)
+    rest_score_sq_sum = models.FloatField(default=0)
+    correct_rest_score_sum = models.FloatField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Question statistics'
+    
+    def __str__(self):
+        return f"Statistiques: {self.question}"
+
+class AnswerStatistics(models.Model):
+    """Statistiques d'une réponse proposée : sélections et score du reste de ceux qui l'ont choisie"""
+    answer = models.OneToOneField(Answer, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    selections = models.PositiveIntegerField(default=0)
+    paired_selections = models.PositiveIntegerField(default=0)
+    selected_rest_score_sum = models.FloatField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Answer statistics'
+    
+    def __str__(self):
+        return f"Statistiques: {self.answer}"
@@ -0,0 +1,33 @@
+from rest_framework import permissions
+
+
+def is_course_instructor(user, course):
+    """Le créateur du cours, ses instructeurs et le staff peuvent gérer un cours"""
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or course.created_by_id == user.id:
+        return True
+    return course.instructors.filter(pk=user.pk).exists()
+
+
+def is_instructor(user):
+    """Le staff et les utilisateurs qui ont créé ou enseignent au moins un cours"""
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or user.created_courses.exists() or user.taught_courses.exists()
+
+
+class IsInstructor(permissions.BasePermission):
+    """Réserve une action aux instructeurs (quel que soit le cours)"""
+    message = "Action réservée aux instructeurs."
+
+    def has_permission(self, request, view):
+        return is_instructor(request.user)
+
+
+class IsCourseInstructor(permissions.BasePermission):
+    """Réserve l'accès aux données d'un cours à ses instructeurs"""
+    message = "Vous n'êtes pas instructeur de ce cours."
+
+    def has_object_permission(self, request, view, obj):
+        return is_course_instructor(request.user, obj)
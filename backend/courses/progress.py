@@ -0,0 +1,402 @@
+"""
+Écritures de progression partagées par les vues.
+
+La position de lecture est synchronisée très souvent par le lecteur vidéo :
+elle est écrite par un UPDATE conditionnel unique, et les envois rapprochés
+d'un même client sont regroupés en mémoire (seule la dernière position est
+conservée). Un thread du processus écrit les positions regroupées à chaque
+fenêtre, sauf si une position plus récente a déjà été écrite entre-temps
+(position_updated_at). Les positions regroupées ne vivent que dans la mémoire
+du processus : un arrêt brutal (SIGKILL, recyclage d'un worker sans atexit)
+perd au plus la dernière fenêtre de chaque lecture ; le lecteur envoie
+flush=true à la pause et à la fermeture pour écrire la position sans délai.
+
+Les clients hors ligne rejouent leurs événements par lots : un lot est
+appliqué dans une seule transaction avec des requêtes groupées, et chaque
+inscription concernée n'est recalculée qu'une fois.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from . import gamification
+from .models import (
+    Certificate, Enrollment, Lesson, LessonProgress,
+    ProgressSyncEvent, UserActivity
+)
+from .versions import follow_published, progress_counts, version_lesson_ids
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal (en secondes) entre deux écritures de position d'un même client
+POSITION_SYNC_WINDOW = getattr(settings, 'LESSON_POSITION_SYNC_WINDOW', 5)
+# Durée pendant laquelle l'accès d'un utilisateur à une leçon vérifié reste valable
+POSITION_ACCESS_TTL = 5 * 60
+
+
+def _position_key(user_id, lesson_id):
+    return f"lesson-position:{user_id}:{lesson_id}"
+
+
+class PendingPositions:
+    """Positions regroupées du processus, écrites à chaque fenêtre par un thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.thread = None
+
+    def set(self, user_id, lesson_id, position):
+        with self.lock:
+            self.positions[(user_id, lesson_id)] = (position, timezone.now())
+        self.start()
+
+    def get(self, user_id, lesson_id):
+        with self.lock:
+            pending = self.positions.get((user_id, lesson_id))
+        return pending[0] if pending is not None else None
+
+    def discard(self, user_id, lesson_id):
+        with self.lock:
+            self.positions.pop((user_id, lesson_id), None)
+
+    def flush(self):
+        """Écrit les positions en attente ; retourne leur nombre"""
+        with self.lock:
+            positions, self.positions = self.positions, {}
+        for (user_id, lesson_id), (position, received_at) in positions.items():
+            # Une position écrite directement après sa réception n'est pas écrasée
+            LessonProgress.objects.filter(
+                Q(position_updated_at__isnull=True) | Q(position_updated_at__lt=received_at),
+                user_id=user_id, lesson_id=lesson_id
+            ).exclude(
+                last_position=position
+            ).update(last_position=position, position_updated_at=received_at, last_accessed=timezone.now())
+        return len(positions)
+
+    def run(self):
+        while True:
+            time.sleep(POSITION_SYNC_WINDOW)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Écriture des positions de lecture en échec")
+            finally:
+                close_old_connections()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='lesson-positions', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+
+pending_positions = PendingPositions()
+
+
+def pending_position(user_id, lesson_id):
+    """Dernière position reçue mais pas encore écrite en base, ou None"""
+    return pending_positions.get(user_id, lesson_id)
+
+
+def check_position_access(user, lesson_id):
+    """Vérifie (404) que la leçon existe et que l'utilisateur suit son cours ; résultat gardé en cache"""
+    key = f"{_position_key(user.id, lesson_id)}:access"
+    if cache.get(key):
+        return
+    lesson = get_object_or_404(Lesson, id=lesson_id)
+    get_object_or_404(Enrollment, user=user, course_id=lesson.course_id)
+    cache.set(key, True, timeout=POSITION_ACCESS_TTL)
+
+
+def write_position(user, lesson_id, position):
+    """
+    Écrit la position avec un seul UPDATE conditionnel (aucune écriture si elle
+    n'a pas changé). La ligne de progression n'est créée, après vérification
+    de l'inscription, que lors de la toute première synchronisation. Une
+    écriture compte le jour dans la série (sans écart de classement).
+    """
+    now = timezone.now()
+    updated = LessonProgress.objects.filter(
+        user=user, lesson_id=lesson_id
+    ).exclude(
+        last_position=position
+    ).update(last_position=position, position_updated_at=now, last_accessed=now)
+    if not updated:
+        if LessonProgress.objects.filter(user=user, lesson_id=lesson_id).exists():
+            return False
+
+        lesson = get_object_or_404(Lesson, id=lesson_id)
+        get_object_or_404(Enrollment, user=user, course_id=lesson.course_id)
+        LessonProgress.objects.update_or_create(
+            user=user, lesson=lesson, defaults={'last_position': position, 'position_updated_at': now}
+        )
+    gamification.record_progress(user.id, None)
+    return True
+
+
+def sync_position(user, lesson_id, position, flush=False):
+    """
+    Enregistre une position de lecture. Retourne (écrite, regroupée) : si une
+    écriture a déjà eu lieu dans la fenêtre courante, la position est gardée
+    en attente et sera écrite à la fin de la fenêtre (ou immédiatement si
+    flush=True, par exemple à la mise en pause).
+    """
+    check_position_access(user, lesson_id)
+    key = _position_key(user.id, lesson_id)
+    if not flush and not cache.add(f"{key}:window", True, timeout=POSITION_SYNC_WINDOW):
+        pending_positions.set(user.id, lesson_id, position)
+        return False, True
+
+    if flush:
+        cache.set(f"{key}:window", True, timeout=POSITION_SYNC_WINDOW)
+    pending_positions.discard(user.id, lesson_id)
+    return write_position(user, lesson_id, position), False
+
+
+def recompute_course_progress(enrollment):
+    """Recalcule le pourcentage de progression d'une inscription (leçons de la version suivie)"""
+    completed_lessons, total_lessons = progress_counts(enrollment)
+    if total_lessons == 0:
+        return enrollment
+    enrollment.progress = (completed_lessons / total_lessons) * 100
+    enrollment.save()
+    return enrollment
+
+
+EVENT_COMPLETE = 'complete'
+EVENT_POSITION = 'position'
+EVENT_TIME = 'time'
+EVENT_TYPES = (EVENT_COMPLETE, EVENT_POSITION, EVENT_TIME)
+# Nouveaux essais d'une synchronisation après un conflit avec un rejeu concurrent
+CONFLICT_RETRIES = 3
+
+
+def complete_enrollments(user, enrollments, now):
+    """
+    Recalcule la progression de plusieurs inscriptions d'un utilisateur en deux
+    requêtes groupées, puis gère la fin de cours (certificat et activités)
+    comme CompleteLesson. Retourne les activités à créer.
+    """
+    course_ids = [enrollment.course_id for enrollment in enrollments]
+    # Inscriptions à une version : ses leçons ; sinon toutes les leçons actuelles du cours
+    versions = version_lesson_ids(
+        enrollment.course_version_id for enrollment in enrollments if enrollment.course_version_id
+    )
+    # Leçons existantes : celles d'une version qui ont été supprimées ne sont plus comptées
+    existing = defaultdict(set)
+    for lesson_id, course_id in Lesson.objects.filter(course_id__in=course_ids).values_list('id', 'course_id'):
+        existing[course_id].add(lesson_id)
+    completed = defaultdict(set)
+    for lesson_id, course_id in LessonProgress.objects.filter(
+        user=user, lesson__course_id__in=course_ids, completed=True
+    ).values_list('lesson_id', 'lesson__course_id'):
+        completed[course_id].add(lesson_id)
+
+    activities = []
+    for enrollment in enrollments:
+        lesson_ids = existing[enrollment.course_id]
+        if enrollment.course_version_id in versions:
+            lesson_ids = lesson_ids & versions[enrollment.course_version_id]
+        total, done = len(lesson_ids), len(completed[enrollment.course_id] & lesson_ids)
+        if total == 0:
+            continue
+        enrollment.progress = (done / total) * 100
+        if enrollment.progress < 100 or enrollment.completed:
+            continue
+
+        course = enrollment.course
+        enrollment.completed = True
+        enrollment.completion_date = now
+        if course.certificate_available and not enrollment.certificate_issued:
+            Certificate.objects.create(
+                user=user,
+                course=course,
+                certificate_id=f"CERT-{uuid.uuid4().hex[:8].upper()}"
+            )
+            enrollment.certificate_issued = True
+            activities.append(UserActivity(
+                user=user,
+                activity_type='certificate_earned',
+                description=f"A obtenu un certificat pour le cours '{course.title}'",
+                related_course=course
+            ))
+        activities.append(UserActivity(
+            user=user,
+            activity_type='course_completed',
+            description=f"A terminé le cours '{course.title}'",
+            related_course=course
+        ))
+    return activities
+
+
+def apply_progress_events(user, events):
+    """
+    Applique une liste ordonnée d'événements {event_id, type, lesson_id, value}.
+    Les événements déjà appliqués (même event_id) sont ignorés. Retourne
+    (résultats par événement, progression des cours concernés).
+    """
+    for attempt in range(CONFLICT_RETRIES):
+        try:
+            with transaction.atomic():
+                return _apply_events(user, events, timezone.now())
+        except IntegrityError:
+            # Rejeu concurrent des mêmes événements : le lot est relu, ils y sont alors des doublons
+            if attempt == CONFLICT_RETRIES - 1:
+                raise
+
+
+def _apply_events(user, events, now):
+    results = [None] * len(events)
+
+    # Doublons dans le lot puis rejeux déjà appliqués : une seule requête
+    first_seen = {}
+    for index, event in enumerate(events):
+        if event['event_id'] in first_seen:
+            results[index] = {'status': 'duplicate'}
+        else:
+            first_seen[event['event_id']] = index
+    already_applied = set(
+        ProgressSyncEvent.objects.filter(
+            user=user, event_id__in=first_seen.keys()
+        ).values_list('event_id', flat=True)
+    )
+    candidates = []
+    for event_id, index in first_seen.items():
+        if event_id in already_applied:
+            results[index] = {'status': 'duplicate'}
+        else:
+            candidates.append(index)
+
+    lessons = Lesson.objects.select_related('course').in_bulk(
+        {events[index]['lesson_id'] for index in candidates}
+    )
+    enrollments = {
+        enrollment.course_id: enrollment
+        for enrollment in Enrollment.objects.filter(
+            user=user, course_id__in={lesson.course_id for lesson in lessons.values()}
+        ).select_related('course')
+    }
+    pending = []
+    for index in candidates:
+        lesson = lessons.get(events[index]['lesson_id'])
+        if lesson is None or lesson.course_id not in enrollments:
+            results[index] = {
+                'status': 'error',
+                'detail': "Leçon introuvable ou cours non suivi."
+            }
+        else:
+            pending.append(index)
+    # Terminer une leçon fait passer l'inscription à la version publiée du cours
+    follow_published([
+        enrollments[lessons[events[index]['lesson_id']].course_id]
+        for index in pending if events[index]['type'] == EVENT_COMPLETE
+    ])
+
+    # Les événements sont réservés avant d'être appliqués, sans ignore_conflicts :
+    # un rejeu concurrent des mêmes identifiants échoue ici et n'applique rien
+    ProgressSyncEvent.objects.bulk_create([
+        ProgressSyncEvent(user=user, event_id=events[index]['event_id']) for index in pending
+    ])
+
+    progress_rows = {
+        progress.lesson_id: progress
+        for progress in LessonProgress.objects.select_for_update().filter(
+            user=user, lesson_id__in=lessons.keys()
+        )
+    }
+    new_rows = {}
+    changed = set()
+    activities = []
+    touched_courses = set()
+    recount_courses = set()
+    # Écarts des classements par cours : (leçons terminées, temps passé)
+    scores = defaultdict(lambda: [0, 0])
+
+    for index in pending:
+        event = events[index]
+        lesson = lessons[event['lesson_id']]
+        progress = progress_rows.get(lesson.id)
+        if progress is None:
+            progress = LessonProgress(user=user, lesson=lesson)
+            progress_rows[lesson.id] = new_rows[lesson.id] = progress
+
+        value = event.get('value') or 0
+        if event['type'] == EVENT_COMPLETE:
+            if not progress.completed:
+                progress.completed = True
+                progress.completed_at = now
+                progress.course_version_id = enrollments[lesson.course_id].course_version_id
+                recount_courses.add(lesson.course_id)
+                scores[lesson.course_id][0] += 1
+                activities.append(UserActivity(
+                    user=user,
+                    activity_type='lesson_completed',
+                    description=f"A terminé la leçon '{lesson.title}'",
+                    related_course=lesson.course,
+                    related_lesson=lesson
+                ))
+        elif event['type'] == EVENT_POSITION:
+            progress.last_position = value
+            progress.position_updated_at = now
+        elif event['type'] == EVENT_TIME:
+            value = min(value, gamification.MAX_TIME_INCREMENT)
+            progress.time_spent += value
+            scores[lesson.course_id][1] += value
+
+        progress.last_accessed = now
+        changed.add(lesson.id)
+        touched_courses.add(lesson.course_id)
+        results[index] = {'status': 'applied'}
+
+    LessonProgress.objects.bulk_create(new_rows.values())
+    LessonProgress.objects.bulk_update(
+        [progress_rows[lesson_id] for lesson_id in changed if lesson_id not in new_rows],
+        [
+            'completed', 'completed_at', 'course_version', 'last_position', 'position_updated_at',
+            'time_spent', 'last_accessed'
+        ]
+    )
+
+    # Une seule mise à jour par inscription, quel que soit le nombre d'événements
+    touched = [enrollments[course_id] for course_id in touched_courses]
+    activities += complete_enrollments(
+        user, [enrollments[course_id] for course_id in recount_courses], now
+    )
+    for enrollment in touched:
+        enrollment.last_activity = now
+    Enrollment.objects.bulk_update(
+        touched,
+        ['progress', 'completed', 'completion_date', 'certificate_issued', 'last_activity', 'course_version']
+    )
+    UserActivity.objects.bulk_create(activities)
+
+    for enrollment in touched:
+        gamification.record_progress(user.id, enrollment.course, *scores[enrollment.course_id])
+
+    ordered_results = [
+        {'event_id': event['event_id'], **result}
+        for event, result in zip(events, results)
+    ]
+    courses = [
+        {
+            'course_id': enrollment.course_id,
+            'progress': enrollment.progress,
+            'completed': enrollment.completed
+        }
+        for enrollment in touched
+    ]
+    return ordered_results, courses
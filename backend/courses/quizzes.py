@@ -0,0 +1,144 @@
+"""
+Banques de questions des quiz.
+
+Un quiz en mode banque (questions_per_attempt renseigné) ne sert pas toutes
+ses questions : chaque tentative en tire questions_per_attempt au hasard,
+éventuellement stratifiées par étiquette ou par difficulté (chaque strate
+reçoit une part proportionnelle à sa taille). Le tirage se fait sur des
+tableaux d'identifiants mis en cache (une requête à la première lecture ou
+après modification d'une question), sans charger les questions.
+
+Le tirage est remis au client dans un jeton signé, renvoyé avec les
+réponses : la correction ne lit que les questions tirées, et la tentative
+conserve leurs identifiants sous forme compacte (entiers 32 bits). Le jeton
+porte aussi la dernière tentative connue au moment du tirage : il ne sert
+qu'à une soumission, la suivante exige un nouveau tirage.
+"""
+import base64
+import random
+import sys
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .models import Question, QuizAttempt
+
+CACHE_TIMEOUT = getattr(settings, 'QUIZ_BANK_CACHE_TIMEOUT', 60 * 60)
+SAMPLE_TTL = getattr(settings, 'QUIZ_SAMPLE_TTL', 6 * 60 * 60)
+SIGNING_SALT = 'courses.quizzes.sample'
+
+
+def pack_ids(ids):
+    """Identifiants en entiers 32 bits non signés little-endian"""
+    values = array('I', ids)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_ids(data):
+    values = array('I')
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+def _bank_key(quiz_id):
+    return f"quiz-bank:{quiz_id}"
+
+
+def question_bank(quiz_id):
+    """
+    Banque du quiz dans l'ordre d'affichage : {'ids': identifiants,
+    'difficulty': difficultés, 'tag': étiquettes}
+    """
+    bank = cache.get(_bank_key(quiz_id))
+    if bank is None:
+        rows = list(Question.objects.filter(quiz_id=quiz_id).order_by('order', 'id').values_list(
+            'id', 'difficulty', 'tag'
+        ))
+        bank = {
+            'ids': pack_ids(row[0] for row in rows),
+            'difficulty': bytes(row[1] for row in rows),
+            'tag': [row[2] for row in rows],
+        }
+        cache.set(_bank_key(quiz_id), bank, CACHE_TIMEOUT)
+    return {
+        'ids': unpack_ids(bank['ids']),
+        'difficulty': list(bank['difficulty']),
+        'tag': bank['tag'],
+    }
+
+
+def invalidate_bank(quiz_id):
+    cache.delete(_bank_key(quiz_id))
+
+
+def _quotas(sizes, count, rng):
+    """Répartit count entre des strates proportionnellement à leur taille (plus forts restes)"""
+    total = sum(sizes.values())
+    shares = {key: count * size / total for key, size in sizes.items()}
+    quotas = {key: int(share) for key, share in shares.items()}
+    # Restes égaux départagés au hasard : aucune strate n'est favorisée d'une tentative à l'autre
+    remainders = sorted(sizes, key=lambda key: (shares[key] - quotas[key], rng.random()), reverse=True)
+    for key in remainders[:count - sum(quotas.values())]:
+        quotas[key] += 1
+    return quotas
+
+
+def sample_questions(quiz, rng=random):
+    """Identifiants des questions d'une tentative, dans l'ordre d'affichage de la banque"""
+    bank = question_bank(quiz.id)
+    ids = bank['ids']
+    count = quiz.questions_per_attempt
+    if not count or count >= len(ids):
+        return ids
+
+    if quiz.stratify_by:
+        strata = defaultdict(list)
+        for position, value in enumerate(bank[quiz.stratify_by]):
+            strata[value].append(position)
+        quotas = _quotas({key: len(positions) for key, positions in strata.items()}, count, rng)
+        positions = [
+            position
+            for key, positions in strata.items()
+            for position in rng.sample(positions, quotas[key])
+        ]
+    else:
+        positions = rng.sample(range(len(ids)), count)
+    return [ids[position] for position in sorted(positions)]
+
+
+def latest_attempt_id(user_id, quiz_id):
+    """Identifiant de la dernière tentative de l'utilisateur (0 si aucune)"""
+    return QuizAttempt.objects.filter(user_id=user_id, quiz_id=quiz_id).order_by(
+        '-created_at', '-id'
+    ).values_list('id', flat=True).first() or 0
+
+
+def sample_token(user_id, quiz_id, question_ids, previous_attempt_id):
+    """Jeton signé du tirage, renvoyé avec les réponses (lié à la dernière tentative connue)"""
+    packed = base64.urlsafe_b64encode(pack_ids(question_ids)).decode()
+    return signing.dumps([user_id, quiz_id, previous_attempt_id, packed], salt=SIGNING_SALT, compress=True)
+
+
+def read_sample(token, user_id, quiz_id):
+    """
+    (dernière tentative connue au tirage, questions du tirage), None si le
+    jeton est absent, invalide, expiré ou d'un autre quiz
+    """
+    if not token:
+        return None
+    try:
+        token_user, token_quiz, previous_attempt_id, packed = signing.loads(
+            token, salt=SIGNING_SALT, max_age=SAMPLE_TTL
+        )
+    except (signing.BadSignature, ValueError):
+        return None
+    if token_user != user_id or token_quiz != quiz_id:
+        return None
+    return previous_attempt_id, unpack_ids(base64.urlsafe_b64decode(packed))
@@ -0,0 +1,186 @@
+"""
+File de révision par répétition espacée.
+
+Chaque question ratée à un quiz devient une ReviewItem de l'utilisateur,
+planifiée selon l'algorithme SM-2 : facteur de facilité, intervalle en jours
+et date d'échéance (due_on). Une réponse réussie allonge l'intervalle, un
+échec le ramène à un jour.
+
+La file du jour est lue par un seul parcours d'intervalle sur l'index
+(user, due_on), quel que soit le nombre de questions planifiées ; une
+séance de révision est appliquée en bloc (une lecture, une mise à jour
+groupée).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.utils import timezone
+
+from .models import Answer, QuizAnswer, ReviewItem
+
+DEFAULT_BATCH_SIZE = 20
+MAX_BATCH_SIZE = 100
+
+# Qualité de réponse SM-2 (0 à 5) : échec en dessous de PASSING_QUALITY
+PASSING_QUALITY = 3
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+MIN_EASE_FACTOR = 1.3
+
+
+def grade(item, quality, today):
+    """Applique une révision de qualité 0 à 5 à l'élément (SM-2)"""
+    if quality >= PASSING_QUALITY:
+        if item.repetitions == 0:
+            item.interval = 1
+        elif item.repetitions == 1:
+            item.interval = 6
+        else:
+            item.interval = round(item.interval * item.ease_factor)
+        item.repetitions += 1
+    else:
+        item.repetitions = 0
+        item.interval = 1
+        item.lapses += 1
+    item.ease_factor = max(
+        MIN_EASE_FACTOR,
+        item.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    )
+    item.due_on = today + timedelta(days=item.interval)
+
+
+def schedule_mistakes(user, question_ids):
+    """Planifie (ou replanifie comme un échec) les questions ratées à un quiz"""
+    question_ids = set(question_ids)
+    if not question_ids:
+        return
+    now = timezone.now()
+    today = timezone.localdate()
+    with transaction.atomic():
+        existing = list(ReviewItem.objects.select_for_update().filter(user=user, question_id__in=question_ids))
+        new_items = [
+            ReviewItem(user=user, question_id=question_id)
+            for question_id in question_ids - {item.question_id for item in existing}
+        ]
+        for item in existing + new_items:
+            grade(item, WRONG_QUALITY, today)
+            item.last_reviewed_at = now
+        ReviewItem.objects.bulk_update(
+            existing, ['ease_factor', 'interval', 'repetitions', 'lapses', 'due_on', 'last_reviewed_at']
+        )
+        ReviewItem.objects.bulk_create(new_items, ignore_conflicts=True)
+
+
+def due_items(user, limit=DEFAULT_BATCH_SIZE, today=None):
+    """Questions à revoir aujourd'hui (les plus en retard d'abord) et nombre total à revoir"""
+    today = today or timezone.localdate()
+    due = ReviewItem.objects.filter(user=user, due_on__lte=today)
+    items = due.order_by('due_on', 'id').select_related('question').prefetch_related(
+        Prefetch('question__answers', queryset=Answer.objects.only('id', 'question_id', 'text').order_by('id'))
+    )[:limit]
+    return [
+        {
+            'question_id': item.question_id,
+            'quiz_id': item.question.quiz_id,
+            'text': item.question.text,
+            # Structure seulement : la correction se fait à la soumission
+            'answers': [{'id': answer.id, 'text': answer.text} for answer in item.question.answers.all()],
+            'due_on': item.due_on,
+            'repetitions': item.repetitions,
+            'lapses': item.lapses,
+        }
+        for item in items
+    ], due.count()
+
+
+def submit_reviews(user, reviews):
+    """
+    Applique une séance de révision : liste de {question_id, answer_id,
+    quality (optionnelle)}. La réponse détermine la réussite ; la qualité
+    auto-évaluée (0 à 5) affine l'intervalle dans la plage correspondante.
+    Une question n'est révisée qu'une fois par séance, et seulement si elle
+    est à revoir aujourd'hui. Retourne les résultats dans l'ordre des révisions.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    answers = Answer.objects.filter(
+        id__in={review['answer_id'] for review in reviews}
+    ).select_related('question').in_bulk()
+
+    with transaction.atomic():
+        items = {
+            item.question_id: item
+            for item in ReviewItem.objects.select_for_update().filter(
+                user=user, question_id__in={review['question_id'] for review in reviews}
+            )
+        }
+        results, graded = [], {}
+        for review in reviews:
+            item = items.get(review['question_id'])
+            answer = answers.get(review['answer_id'])
+            if item is None or answer is None or answer.question_id != item.question_id:
+                results.append({
+                    'question_id': review['question_id'],
+                    'status': 'error',
+                    'detail': "Question absente de la file de révision ou réponse invalide."
+                })
+                continue
+            if item.pk in graded:
+                results.append({'question_id': item.question_id, 'status': 'duplicate'})
+                continue
+            if item.due_on > today:
+                # Réviser avant l'échéance allongerait l'intervalle sans révision espacée
+                results.append({'question_id': item.question_id, 'status': 'not_due', 'due_on': item.due_on})
+                continue
+
+            quality = review.get('quality')
+            if answer.is_correct:
+                quality = CORRECT_QUALITY if quality is None else min(max(quality, PASSING_QUALITY), 5)
+            else:
+                quality = WRONG_QUALITY if quality is None else min(max(quality, 0), PASSING_QUALITY - 1)
+            grade(item, quality, today)
+            item.last_reviewed_at = now
+            graded[item.pk] = item
+            results.append({
+                'question_id': item.question_id,
+                'status': 'reviewed',
+                'is_correct': answer.is_correct,
+                'explanation': answer.question.explanation,
+                'interval': item.interval,
+                'due_on': item.due_on,
+            })
+
+        ReviewItem.objects.bulk_update(
+            graded.values(), ['ease_factor', 'interval', 'repetitions', 'lapses', 'due_on', 'last_reviewed_at']
+        )
+    return results
+
+
+def build_queue(batch_size=5000):
+    """
+    Planifie toutes les questions ratées de l'historique QuizAnswer qui ne
+    sont pas encore dans une file : un échec SM-2 par mauvaise réponse, à
+    partir du jour de la dernière. Retourne le nombre d'éléments créés.
+    """
+    rows = QuizAnswer.objects.filter(is_correct=False).values(
+        'attempt__user_id', 'question_id'
+    ).annotate(
+        mistakes=Count('id'),
+        last_mistake=Max('attempt__created_at')
+    ).order_by()
+
+    before = ReviewItem.objects.count()
+    items = []
+    for row in rows.iterator(chunk_size=batch_size):
+        item = ReviewItem(user_id=row['attempt__user_id'], question_id=row['question_id'])
+        day = timezone.localdate(row['last_mistake'])
+        for _ in range(row['mistakes']):
+            grade(item, WRONG_QUALITY, day)
+        item.last_reviewed_at = row['last_mistake']
+        items.append(item)
+        if len(items) >= batch_size:
+            ReviewItem.objects.bulk_create(items, ignore_conflicts=True)
+            items = []
+    ReviewItem.objects.bulk_create(items, ignore_conflicts=True)
+    return ReviewItem.objects.count() - before
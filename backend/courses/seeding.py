@@ -0,0 +1,189 @@
+"""
+Insertion en masse (bulk_create) des données produites par courses.synthetic.
+
+Chaque niveau de l'arborescence (cours, sections, leçons, quiz, questions,
+réponses) est inséré en une série de requêtes par lot, les clés primaires
+retournées servant à rattacher le niveau suivant.
+"""
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.utils.text import slugify
+
+from users.models import SETTINGS_MODELS
+from .models import (
+    Course, CourseSection, Lesson, Quiz, Question, Answer,
+    Enrollment, LessonProgress
+)
+from . import synthetic
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class BulkSeeder:
+    """Insère des lignes par lots et comptabilise le débit obtenu"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.counts = Counter()
+        self.started = time.perf_counter()
+
+    def _insert(self, model, objs):
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.counts[model._meta.label] += len(created)
+        return created
+
+    @property
+    def total_rows(self):
+        return sum(self.counts.values())
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return self.total_rows / elapsed if elapsed > 0 else 0.0
+
+    def insert_courses(self, plans, categories, created_by):
+        """
+        Insère une tranche de cours et retourne {index du cours: (id, [ids des leçons])}
+        """
+        courses = self._insert(Course, [
+            Course(
+                title=plan['title'],
+                slug=slugify(plan['title']),
+                subtitle=plan['subtitle'],
+                description=plan['description'],
+                category=categories[plan['category_index'] % len(categories)],
+                created_by=created_by,
+                level=plan['level'],
+                total_hours=plan['total_hours'],
+                status='published',
+            )
+            for plan in plans
+        ])
+
+        section_plans = [
+            (course, section_plan)
+            for course, plan in zip(courses, plans)
+            for section_plan in plan['sections']
+        ]
+        sections = self._insert(CourseSection, [
+            CourseSection(
+                course=course,
+                title=section_plan['title'],
+                description=section_plan['description'],
+                order=section_plan['order'],
+            )
+            for course, section_plan in section_plans
+        ])
+
+        lesson_plans = [
+            (section, lesson_plan)
+            for section, (course, section_plan) in zip(sections, section_plans)
+            for lesson_plan in section_plan['lessons']
+        ]
+        lessons = self._insert(Lesson, [
+            Lesson(
+                course_id=section.course_id,
+                section=section,
+                title=lesson_plan['title'],
+                description=lesson_plan['description'],
+                content_type=lesson_plan['content_type'],
+                content=lesson_plan['content'],
+                duration=lesson_plan['duration'],
+                order=lesson_plan['order'],
+            )
+            for section, lesson_plan in lesson_plans
+        ])
+
+        self.insert_quizzes([
+            (lesson, lesson_plan['quiz'])
+            for lesson, (section, lesson_plan) in zip(lessons, lesson_plans)
+            if lesson_plan['quiz']
+        ])
+
+        course_map = {plan['index']: (course.id, []) for course, plan in zip(courses, plans)}
+        index_by_id = {course.id: plan['index'] for course, plan in zip(courses, plans)}
+        for lesson in lessons:
+            course_map[index_by_id[lesson.course_id]][1].append(lesson.id)
+        return course_map
+
+    def insert_quizzes(self, pairs):
+        """Insère des quiz à partir de couples (leçon, plan de quiz)"""
+        if not pairs:
+            return []
+        quizzes = self._insert(Quiz, [
+            Quiz(
+                lesson=lesson,
+                title=quiz_plan['title'],
+                description=quiz_plan['description'],
+                pass_percentage=quiz_plan['pass_percentage'],
+            )
+            for lesson, quiz_plan in pairs
+        ])
+
+        question_plans = [
+            (quiz, question_plan)
+            for quiz, (lesson, quiz_plan) in zip(quizzes, pairs)
+            for question_plan in quiz_plan['questions']
+        ]
+        questions = self._insert(Question, [
+            Question(
+                quiz=quiz,
+                text=question_plan['text'],
+                explanation=question_plan['explanation'],
+                order=question_plan['order'],
+            )
+            for quiz, question_plan in question_plans
+        ])
+
+        self._insert(Answer, [
+            Answer(question=question, text=text, is_correct=is_correct)
+            for question, (quiz, question_plan) in zip(questions, question_plans)
+            for text, is_correct in question_plan['answers']
+        ])
+        return quizzes
+
+    def insert_users(self, seed, start, stop, password_hash):
+        """Insère les utilisateurs [start, stop), leurs profils et réglages, retourne leurs ids"""
+        users = self._insert(User, [
+            User(
+                username=f"load-{seed}-{index}",
+                email=f"load-{seed}-{index}@etu.univh2c.ma",
+                first_name=f"load-{seed}-{index}",
+                password=password_hash,
+            )
+            for index in range(start, stop)
+        ])
+        # bulk_create ne déclenche pas post_save : profils et réglages sont créés ici
+        for model in SETTINGS_MODELS:
+            self._insert(model, [model(user=user) for user in users])
+        return [user.id for user in users]
+
+    def insert_enrollments(self, seed, first_index, user_ids, course_map, per_user):
+        """Inscrit chaque utilisateur à quelques cours avec une progression partielle"""
+        course_indexes = sorted(course_map)
+        enrollments = []
+        progress_rows = []
+        for offset, user_id in enumerate(user_ids):
+            picks = synthetic.build_enrollments(
+                seed, first_index + offset, len(course_indexes), per_user
+            )
+            for position, ratio in picks:
+                course_id, lesson_ids = course_map[course_indexes[position]]
+                done = int(len(lesson_ids) * ratio)
+                progress = (done / len(lesson_ids) * 100) if lesson_ids else 0.0
+                enrollments.append(Enrollment(
+                    user_id=user_id,
+                    course_id=course_id,
+                    progress=progress,
+                    completed=progress >= 100,
+                ))
+                progress_rows.extend(
+                    LessonProgress(user_id=user_id, lesson_id=lesson_id, completed=True)
+                    for lesson_id in lesson_ids[:done]
+                )
+        self._insert(Enrollment, enrollments)
+        self._insert(LessonProgress, progress_rows)
@@ -4,9 +4,12 @@ from .models import (
     Certificate, Skill, LessonProgress, 
     UserActivity, CourseSkill, Quiz, Question, 
     Answer, QuizAttempt, QuizAnswer, CourseSection,
-    CourseReview, CourseProgress, TimeSpent
+    CourseReview, CourseProgress, TimeSpent,
+    CourseAnalytics, LessonAnalytics, QuizAnalytics
 )
 from django.contrib.auth import get_user_model
+from users.serializers import RenditionsField
+from . import media
 
 User = get_user_model()
 
@@ -32,9 +35,18 @@ class SkillSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 class LessonSerializer(serializers.ModelSerializer):
+    attachment_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = Lesson
-        fields = ['id', 'title', 'description', 'video_url', 'duration', 'order']
+        fields = ['id', 'title', 'description', 'video_url', 'duration', 'order', 'attachment_url']
+    
+    def get_attachment_url(self, obj):
+        # URL signée uniquement quand la vue a vérifié l'accès au cours
+        request = self.context.get('request')
+        if not self.context.get('sign_attachment') or request is None:
+            return None
+        return media.attachment_url(request, obj, request.user)
 
 class CourseSectionSerializer(serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
@@ -51,11 +63,14 @@ class CourseListSerializer(serializers.ModelSerializer):
     rating = serializers.SerializerMethodField()
     enrollment_count = serializers.IntegerField(read_only=True)
     is_enrolled = serializers.SerializerMethodField()
+    image_renditions = RenditionsField('image')
+    thumbnail_renditions = RenditionsField('thumbnail')
     
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'subtitle', 'slug', 'description', 'image', 'thumbnail', 
+            'id', 'title', 'subtitle', 'slug', 'description', 'image', 'thumbnail',
+            'image_renditions', 'thumbnail_renditions',
             'category', 'created_at', 'total_hours', 'level', 'lesson_count', 'skills',
             'rating', 'enrollment_count', 'price', 'discount_price', 'language', 'featured',
             'is_enrolled', 'status'
@@ -86,11 +101,14 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     reviews = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     progress = serializers.SerializerMethodField()
+    image_renditions = RenditionsField('image')
+    thumbnail_renditions = RenditionsField('thumbnail')
     
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'subtitle', 'slug', 'description', 'image', 'thumbnail', 
+            'id', 'title', 'subtitle', 'slug', 'description', 'image', 'thumbnail',
+            'image_renditions', 'thumbnail_renditions',
             'category', 'created_at', 'updated_at', 'total_hours', 'level', 'sections', 
             'skills', 'instructors', 'rating', 'enrollment_count', 'language', 'price', 
             'discount_price', 'reviews', 'objectives', 'prerequisites', 'target_audience',
@@ -189,14 +207,14 @@ class QuestionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Question
-        fields = ['id', 'text', 'explanation', 'order', 'answers']
+        fields = ['id', 'text', 'explanation', 'order', 'tag', 'difficulty', 'answers']
 
 class QuizSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'description', 'pass_percentage', 'questions']
+        fields = ['id', 'title', 'description', 'pass_percentage', 'questions_per_attempt', 'stratify_by', 'questions']
 
 class QuizAnswerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -214,16 +232,43 @@ class QuizSubmissionSerializer(serializers.Serializer):
     answers = serializers.DictField(
         child=serializers.IntegerField(),
         help_text="Dict mapping question IDs to answer IDs"
-    ) 
+    )
+    sample_token = serializers.CharField(
+        required=False, help_text="Jeton du tirage de questions (quiz en mode banque)"
+    )
+
+class ProgressEventSerializer(serializers.Serializer):
+    event_id = serializers.CharField(max_length=64, help_text="Identifiant unique généré par le client")
+    type = serializers.ChoiceField(choices=['complete', 'position', 'time'])
+    lesson_id = serializers.IntegerField()
+    value = serializers.IntegerField(
+        required=False, min_value=0,
+        help_text="Position (en secondes) ou temps passé à ajouter (en secondes)"
+    )
+
+class ProgressSyncSerializer(serializers.Serializer):
+    events = ProgressEventSerializer(many=True, max_length=500)
+
+class ReviewSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    answer_id = serializers.IntegerField()
+    quality = serializers.IntegerField(
+        required=False, min_value=0, max_value=5,
+        help_text="Auto-évaluation SM-2 (0 à 5), bornée selon la justesse de la réponse"
+    )
+
+class ReviewSessionSerializer(serializers.Serializer):
+    reviews = ReviewSerializer(many=True, max_length=200)
 
 class CourseSerializer(serializers.ModelSerializer):
     sections = CourseSectionSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
+    thumbnail_renditions = RenditionsField('thumbnail')
     
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'slug', 'description', 'thumbnail',
+            'id', 'title', 'slug', 'description', 'thumbnail', 'thumbnail_renditions',
             'category', 'level', 'language', 'is_active',
             'created_at', 'updated_at', 'sections'
         ]
@@ -241,4 +286,37 @@ class CourseProgressSerializer(serializers.ModelSerializer):
 class TimeSpentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TimeSpent
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__' 
+
+class CourseAnalyticsSerializer(serializers.ModelSerializer):
+    course_id = serializers.IntegerField(read_only=True)
+    course_title = serializers.CharField(source='course.title', read_only=True)
+    
+    class Meta:
+        model = CourseAnalytics
+        fields = [
+            'course_id', 'course_title', 'enrolled_count', 'started_count',
+            'halfway_count', 'completed_count', 'certificate_count', 'refreshed_at'
+        ]
+
+class LessonAnalyticsSerializer(serializers.ModelSerializer):
+    lesson_id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(source='lesson.title', read_only=True)
+    
+    class Meta:
+        model = LessonAnalytics
+        fields = [
+            'lesson_id', 'title', 'position', 'started_count', 'completed_count',
+            'drop_off', 'avg_time_spent'
+        ]
+
+class QuizAnalyticsSerializer(serializers.ModelSerializer):
+    quiz_id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(source='quiz.title', read_only=True)
+    
+    class Meta:
+        model = QuizAnalytics
+        fields = [
+            'quiz_id', 'title', 'attempt_count', 'student_count', 'passed_count',
+            'pass_rate', 'avg_score'
+        ]
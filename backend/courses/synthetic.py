@@ -0,0 +1,105 @@
+"""
+Génération déterministe de données synthétiques pour les tests de charge.
+
+Ce module ne dépend pas de l'ORM : les fonctions produisent de simples
+dictionnaires afin de pouvoir être exécutées dans un pool de processus.
+La même graine (seed) produit toujours exactement les mêmes données.
+"""
+import random
+
+LEVELS = ['beginner', 'intermediate', 'advanced']
+CONTENT_TYPES = ['video', 'text', 'pdf', 'audio', 'exercise']
+TOPICS = [
+    'Python', 'Django', 'React', 'JavaScript', 'SQL', 'Java', 'UML',
+    'Tailwind', 'PHP', 'Data Science', 'Marketing', 'Design',
+]
+LESSONS_PER_SECTION = 5
+QUESTIONS_PER_QUIZ = 4
+ANSWERS_PER_QUESTION = 4
+
+
+def course_rng(seed, course_index):
+    """Générateur indépendant par cours : le résultat ne dépend pas du découpage en lots"""
+    return random.Random(f"{seed}:course:{course_index}")
+
+
+def build_quiz(rng, lesson_title):
+    """Construit un quiz générique (questions et réponses) pour une leçon"""
+    questions = []
+    for q in range(QUESTIONS_PER_QUIZ):
+        correct = rng.randrange(ANSWERS_PER_QUESTION)
+        questions.append({
+            'text': f"Question {q + 1} sur « {lesson_title} »",
+            'explanation': f"Relisez la leçon « {lesson_title} » pour la question {q + 1}.",
+            'order': q,
+            'answers': [
+                (f"Réponse {a + 1}", a == correct)
+                for a in range(ANSWERS_PER_QUESTION)
+            ],
+        })
+    return {
+        'title': f"Quiz: {lesson_title}",
+        'description': "Test your knowledge from this lesson",
+        'pass_percentage': 70,
+        'questions': questions,
+    }
+
+
+def build_course(seed, course_index, lessons_per_course, quiz_ratio=0.5):
+    """Construit l'arborescence complète d'un cours (sections, leçons, quiz)"""
+    rng = course_rng(seed, course_index)
+    topic = rng.choice(TOPICS)
+    title = f"{topic} {course_index + 1} (seed {seed})"
+
+    sections = []
+    for order, start in enumerate(range(0, lessons_per_course, LESSONS_PER_SECTION), start=1):
+        lessons = []
+        for position in range(start, min(start + LESSONS_PER_SECTION, lessons_per_course)):
+            lesson_title = f"{topic} - leçon {position + 1}"
+            content_type = rng.choice(CONTENT_TYPES)
+            lessons.append({
+                'title': lesson_title,
+                'description': f"Leçon {position + 1} du cours {title}",
+                'content_type': content_type,
+                'content': f"<p>Contenu synthétique de la leçon {position + 1}.</p>",
+                'duration': f"{rng.randint(5, 45)} min",
+                'order': position + 1,
+                'quiz': (
+                    build_quiz(rng, lesson_title)
+                    if content_type in ('text', 'video') and rng.random() < quiz_ratio
+                    else None
+                ),
+            })
+        sections.append({
+            'title': f"Module {order}",
+            'description': f"Module {order} du cours {title}",
+            'order': order,
+            'lessons': lessons,
+        })
+
+    return {
+        'index': course_index,
+        'title': title,
+        'subtitle': f"Cours synthétique de {topic}",
+        'description': f"Cours généré automatiquement pour les tests de charge ({topic}).",
+        'level': rng.choice(LEVELS),
+        'category_index': rng.randrange(1 << 16),
+        'total_hours': round(lessons_per_course * rng.uniform(0.1, 0.5), 1),
+        'sections': sections,
+    }
+
+
+def build_courses(args):
+    """Point d'entrée des workers : construit une tranche [start, stop) de cours"""
+    seed, start, stop, lessons_per_course, quiz_ratio = args
+    return [
+        build_course(seed, index, lessons_per_course, quiz_ratio)
+        for index in range(start, stop)
+    ]
+
+
+def build_enrollments(seed, user_index, course_count, per_user):
+    """Choisit de manière déterministe les cours auxquels un utilisateur est inscrit"""
+    rng = random.Random(f"{seed}:user:{user_index}")
+    picked = rng.sample(range(course_count), min(per_user, course_count))
+    return [(course_index, rng.random()) for course_index in picked]
@@ -1,3 +1,1103 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import random
+import statistics
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from users.models import SETTINGS_MODELS, Profile
+from users.tokens import CachedRefreshToken
+
+from . import analytics, async_views, bundles, content, enrollment, events, gradebook, gamification, item_analysis, progress, quizzes, reviews, synthetic, versions
+from .gamification import Leaderboard, RankedList, advance_streak, rebuild_streaks, streak_status
+from .models import (
+    Answer, AnswerStatistics, Category, Certificate, Course, CourseSection, CourseSkill, Enrollment,
+    LearningStreak, Lesson, LessonProgress, Question, QuestionStatistics, Quiz, QuizAnswer, QuizAttempt,
+    ReviewItem, Skill, UserActivity
+)
+from .async_views import CourseProgressView, DashboardStatsView, EventStreamView, UserActivitiesView
+from .views import LessonDetailView, QuizDetailView, SubmitQuizView
+
+User = get_user_model()
+
+
+class AdminChangelistQueryCountTests(TestCase):
+    """Le nombre de requêtes des listes de l'admin ne dépend pas du nombre de lignes affichées"""
+
+    # Requêtes par liste : session et utilisateur, statistiques de la table, comptage,
+    # lignes (objets liés par jointure), puis le filtre latéral par cours ou catégorie
+    EXPECTED_QUERIES = {
+        Course: 6,
+        Lesson: 6,
+        Enrollment: 5,
+        Certificate: 5,
+        LessonProgress: 5,
+        UserActivity: 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.category = Category.objects.create(name='Data Science')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        """Ajoute count cours, chacun avec une leçon, un étudiant et ses lignes de suivi"""
+        start = Course.objects.count()
+        for index in range(start, start + count):
+            student = User.objects.create_user(f'student{index}', f'student{index}@example.com', 'password')
+            course = Course.objects.create(
+                title=f'Cours {index}', description='Description', category=self.category, created_by=self.admin
+            )
+            section = CourseSection.objects.create(course=course, title='Introduction')
+            lesson = Lesson.objects.create(course=course, section=section, title=f'Leçon {index}')
+            Enrollment.objects.create(user=student, course=course)
+            LessonProgress.objects.create(user=student, lesson=lesson, completed=True)
+            Certificate.objects.create(user=student, course=course)
+            UserActivity.objects.create(
+                user=student, activity_type='lesson_completed', description=f'Leçon {index} terminée',
+                related_course=course, related_lesson=lesson
+            )
+
+    def assert_changelist_queries(self):
+        for model, expected in self.EXPECTED_QUERIES.items():
+            url = reverse(f'admin:courses_{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__), self.assertNumQueries(expected):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_rows(2)
+        self.assert_changelist_queries()
+        self.add_rows(20)
+        self.assert_changelist_queries()
+
+    def test_search_matches_username_prefix(self):
+        self.add_rows(3)
+        url = reverse('admin:courses_lessonprogress_changelist')
+        response = self.client.get(url, {'q': 'STUDENT1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(url, {'q': 'Leçon'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+
+class GamificationTests(SimpleTestCase):
+    """Séries (bitmap des jours actifs) et classements incrémentaux"""
+
+    def test_streak_counts_consecutive_days(self):
+        streak = LearningStreak(current_streak=0, longest_streak=0, activity_days=0)
+        start = date(2024, 1, 1)
+        for offset in (0, 1, 2, 4, 5):
+            self.assertTrue(advance_streak(streak, start + timedelta(days=offset)))
+        self.assertFalse(advance_streak(streak, start + timedelta(days=5)))
+        self.assertEqual((streak.current_streak, streak.longest_streak), (2, 3))
+        self.assertEqual(streak.activity_days, 0b111011)
+
+        status = streak_status(streak, today=start + timedelta(days=6))
+        self.assertEqual(status['current_streak'], 2)
+        self.assertEqual(len(status['active_days']), 5)
+        self.assertEqual(streak_status(streak, today=start + timedelta(days=7))['current_streak'], 0)
+
+    def test_backfilled_day_recomputes_streaks(self):
+        streak = LearningStreak(current_streak=0, longest_streak=0, activity_days=0)
+        start = date(2024, 1, 1)
+        for offset in (0, 1, 3, 4):
+            advance_streak(streak, start + timedelta(days=offset))
+        self.assertEqual((streak.current_streak, streak.longest_streak), (2, 2))
+        self.assertTrue(advance_streak(streak, start + timedelta(days=2)))  # Rejeu hors ligne
+        self.assertEqual((streak.current_streak, streak.longest_streak), (5, 5))
+
+    def test_leaderboard_ranks_match_sorted_scores(self):
+        RankedList.LOAD = 4
+        self.addCleanup(setattr, RankedList, 'LOAD', 500)
+        board = Leaderboard([(user_id, user_id % 7, user_id * 10) for user_id in range(1, 60)])
+        for user_id in range(1, 60, 3):
+            board.increment(user_id, (2, 5))
+
+        scores = sorted(((values[0], user_id) for user_id, values in board.scores.items()), reverse=True)
+        for user_id, values in board.scores.items():
+            expected = 1 + sum(1 for value, _ in scores if value > values[0])
+            self.assertEqual(board.rank('completions', user_id), (expected, values[0]))
+        top = board.top('completions', 10)
+        self.assertEqual([value for _, _, value in top], [value for value, _ in scores[:10]])
+        self.assertEqual(top[0][0], 1)
+
+
+class CourseVersionTests(TestCase):
+    """Publication des versions, dédoublonnage par empreinte et progression selon la version suivie"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', 'author@example.com', 'password')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        category = Category.objects.create(name='Data Science')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=category, created_by=cls.author
+        )
+        cls.first = Lesson.objects.create(course=cls.course, title='Introduction', order=1)
+        quiz = Quiz.objects.create(lesson=cls.first, title='Quiz')
+        question = Question.objects.create(quiz=quiz, text='Question secrète ?')
+        Answer.objects.create(question=question, text='Réponse secrète', is_correct=True)
+
+    def setUp(self):
+        # Les identifiants de version se répètent d'un test à l'autre : pas de document en cache
+        cache.clear()
+
+    def test_publish_creates_a_version_only_when_content_changes(self):
+        version, created = versions.publish(self.course.id)
+        self.assertTrue(created)
+        self.assertEqual(version.number, 1)
+        self.assertEqual(version.lesson_ids, [self.first.id])
+
+        self.assertEqual(versions.publish(self.course.id), (version, False))
+
+        Lesson.objects.create(course=self.course, title='Suite', order=2)
+        second, created = versions.publish(self.course.id)
+        self.assertTrue(created)
+        self.assertEqual(second.number, 2)
+        self.assertNotEqual(second.checksum, version.checksum)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.published_version, second)
+
+    def test_progress_follows_the_pinned_version(self):
+        version, _ = versions.publish(self.course.id)
+        enrollment = Enrollment.objects.create(user=self.student, course=self.course, course_version=version)
+        LessonProgress.objects.create(user=self.student, lesson=self.first, completed=True)
+        Lesson.objects.create(course=self.course, title='Suite', order=2)
+        versions.publish(self.course.id)
+
+        self.assertEqual(versions.progress_counts(enrollment), (1, 1))
+        enrollment.course_version = None
+        self.assertEqual(versions.progress_counts(enrollment), (1, 2))
+
+    def test_deleted_lessons_stop_counting_and_completion_follows_published_version(self):
+        second = Lesson.objects.create(course=self.course, title='Suite', order=2)
+        version, _ = versions.publish(self.course.id)
+        enrollment = Enrollment.objects.create(user=self.student, course=self.course)
+        self.assertEqual(enrollment.course_version, version)
+        second.delete()
+        LessonProgress.objects.create(user=self.student, lesson=self.first, completed=True)
+        self.assertEqual(versions.progress_counts(enrollment), (1, 1))
+
+        third = Lesson.objects.create(course=self.course, title='Nouvelle', order=3)
+        latest, _ = versions.publish(self.course.id)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.post(reverse('complete-lesson'), {'lesson_id': third.id}, format='json')
+        self.assertEqual(response.json()['course_progress'], 100)
+        enrollment.refresh_from_db()
+        self.assertEqual(enrollment.course_version, latest)
+        self.assertEqual(LessonProgress.objects.get(user=self.student, lesson=third).course_version, latest)
+
+    def test_document_is_public_only_for_published_courses_and_hides_questions(self):
+        version, _ = versions.publish(self.course.id)
+        url = reverse('course-version', kwargs={'course_id': self.course.id, 'number': version.number})
+        self.assertEqual(self.client.get(url).status_code, 404)  # Brouillon
+
+        Course.objects.filter(pk=self.course.pk).update(status='published')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('secrète', response.content.decode())
+        self.assertEqual(response.json()['unsectioned_lessons'][0]['quiz']['question_count'], 1)
+
+        course = Course.objects.get(pk=self.course.pk)
+        course.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CourseBundleTests(TestCase):
+    """Export puis import d'un cours complet"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', 'author@example.com', 'password')
+        cls.category = Category.objects.create(name='Data Science')
+        course = Course.objects.create(
+            title='Python', slug='python', description='Description', category=cls.category,
+            created_by=cls.author, status='published', featured=True, price=49
+        )
+        CourseSkill.objects.create(course=course, skill=Skill.objects.create(name='Pandas'))
+        section = CourseSection.objects.create(course=course, title='Bases', order=1)
+        lesson = Lesson.objects.create(course=course, section=section, title='Introduction', content='Texte')
+        quiz = Quiz.objects.create(lesson=lesson, title='Quiz', questions_per_attempt=1, stratify_by='tag')
+        question = Question.objects.create(quiz=quiz, text='2 + 2 ?', tag='calcul', difficulty=1)
+        Answer.objects.create(question=question, text='4', is_correct=True)
+        Answer.objects.create(question=question, text='5', is_correct=False)
+        cls.course = course
+
+    def export(self):
+        output = io.BytesIO()
+        manifest = bundles.export_bundle([self.course.pk], output)
+        output.seek(0)
+        return output, manifest
+
+    def test_round_trip_recreates_the_course_as_a_draft(self):
+        archive, manifest = self.export()
+        self.assertEqual(manifest['counts']['answer'], 2)
+        self.course.delete()
+
+        course_ids, counts = bundles.import_bundle(archive, self.author)
+        course = Course.objects.get(pk__in=course_ids)
+        self.assertEqual(
+            {name: count for name, count in counts.items() if name not in bundles.REUSED},
+            {name: count for name, count in manifest['counts'].items() if name not in bundles.REUSED}
+        )
+        self.assertEqual((course.slug, course.category_id, course.created_by), ('python', self.category.pk, self.author))
+        self.assertEqual((course.status, course.is_active, course.featured, course.price), ('draft', True, False, 0))
+        self.assertEqual(list(course.skills.values_list('skill__name', flat=True)), ['Pandas'])
+
+        lesson = course.lessons.select_related('section', 'quiz').get()
+        self.assertEqual((lesson.section.title, lesson.content), ('Bases', 'Texte'))
+        self.assertEqual(lesson.content_version, lesson.compute_content_version())
+        self.assertEqual((lesson.quiz.questions_per_attempt, lesson.quiz.stratify_by), (1, 'tag'))
+        question = lesson.quiz.questions.get()
+        self.assertEqual((question.tag, question.difficulty), ('calcul', 1))
+        self.assertEqual(sorted(question.answers.values_list('text', 'is_correct')), [('4', True), ('5', False)])
+
+    def test_import_rejects_existing_slugs_and_oversized_archives(self):
+        archive, _ = self.export()
+        with self.assertRaisesMessage(bundles.BundleError, 'python'):
+            bundles.import_bundle(archive, self.author)
+        archive.seek(0)
+        with mock.patch.object(bundles, 'MAX_ENTRIES', 2), self.assertRaises(bundles.BundleError):
+            bundles.import_bundle(archive, self.author)
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_import_is_reserved_to_instructors(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('student', 'student@example.com', 'password'))
+        archive, _ = self.export()
+        response = client.post(reverse('course-import-bundle'), {'bundle': archive}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+
+class ReviewSchedulingTests(TestCase):
+    """Planification SM-2 et application d'une séance de révision"""
+
+    def test_grade_follows_sm2(self):
+        today = date(2024, 1, 1)
+        item = ReviewItem(ease_factor=2.5, interval=0, repetitions=0, lapses=0)
+        intervals = []
+        for quality in (5, 4, 4):
+            reviews.grade(item, quality, today)
+            intervals.append(item.interval)
+        self.assertEqual(intervals, [1, 6, 16])  # 6 × 2.6 arrondi
+        self.assertAlmostEqual(item.ease_factor, 2.6)
+        self.assertEqual(item.due_on, today + timedelta(days=16))
+
+        reviews.grade(item, 1, today)
+        self.assertEqual((item.interval, item.repetitions, item.lapses), (1, 0, 1))
+        self.assertAlmostEqual(item.ease_factor, 2.06)
+        for _ in range(10):
+            reviews.grade(item, 0, today)
+        self.assertEqual(item.ease_factor, reviews.MIN_EASE_FACTOR)
+
+    def test_submit_ignores_items_not_due_and_duplicates(self):
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'), created_by=user
+        )
+        quiz = Quiz.objects.create(lesson=Lesson.objects.create(course=course, title='Leçon'), title='Quiz')
+        due, later = (Question.objects.create(quiz=quiz, text=text) for text in ('Due', 'Plus tard'))
+        right = Answer.objects.create(question=due, text='Oui', is_correct=True)
+        other = Answer.objects.create(question=later, text='Oui', is_correct=True)
+        reviews.schedule_mistakes(user, [due.id, later.id])
+        ReviewItem.objects.filter(question=later).update(due_on=timezone.localdate() + timedelta(days=3))
+        ReviewItem.objects.filter(question=due).update(due_on=timezone.localdate())
+
+        results = reviews.submit_reviews(user, [
+            {'question_id': due.id, 'answer_id': right.id},
+            {'question_id': due.id, 'answer_id': right.id},
+            {'question_id': later.id, 'answer_id': other.id},
+        ])
+        self.assertEqual([result['status'] for result in results], ['reviewed', 'duplicate', 'not_due'])
+        item = ReviewItem.objects.get(question=due)
+        self.assertEqual((item.repetitions, item.interval), (1, 1))
+        self.assertEqual(ReviewItem.objects.get(question=later).repetitions, 0)
+
+
+class QuizBankTests(TestCase):
+    """Tirage stratifié des questions d'un quiz en mode banque et jeton de tirage"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.student
+        )
+        cls.lesson = Lesson.objects.create(course=course, title='Leçon')
+        cls.quiz = Quiz.objects.create(lesson=cls.lesson, title='Quiz', questions_per_attempt=3, stratify_by='tag')
+        cls.questions = [
+            Question.objects.create(quiz=cls.quiz, text=f'Question {order}', order=order, tag=tag)
+            for order, tag in enumerate(['x', 'y', 'x', 'x', 'y', 'x'])
+        ]
+        cls.right = {
+            question.id: Answer.objects.create(question=question, text='Oui', is_correct=True).id
+            for question in cls.questions
+        }
+        Enrollment.objects.create(user=cls.student, course=course)
+
+    def test_quotas_split_by_largest_remainder(self):
+        rng = random.Random(0)
+        self.assertEqual(quizzes._quotas({'a': 6, 'b': 3, 'c': 1}, 4, rng), {'a': 2, 'b': 1, 'c': 1})
+        self.assertEqual(quizzes._quotas({'a': 4, 'b': 2}, 3, rng), {'a': 2, 'b': 1})
+        for seed in range(20):
+            quotas = quizzes._quotas({'a': 5, 'b': 3, 'c': 2}, 5, random.Random(seed))
+            self.assertEqual(sum(quotas.values()), 5)
+            self.assertEqual(quotas['c'], 1)
+            self.assertIn((quotas['a'], quotas['b']), [(3, 1), (2, 2)])  # Restes égaux (0,5)
+
+    def test_sample_keeps_strata_and_bank_order(self):
+        bank = [question.id for question in self.questions]
+        tags = {question.id: question.tag for question in self.questions}
+        for seed in range(20):
+            sample = quizzes.sample_questions(self.quiz, random.Random(seed))
+            self.assertEqual(len(sample), 3)
+            self.assertEqual(sample, [question_id for question_id in bank if question_id in sample])
+            self.assertEqual(sorted(tags[question_id] for question_id in sample), ['x', 'x', 'y'])
+
+        self.quiz.questions_per_attempt = None
+        self.assertEqual(quizzes.sample_questions(self.quiz), bank)
+
+    def test_sample_token_serves_a_single_attempt(self):
+        factory = APIRequestFactory()
+
+        def detail():
+            request = factory.get('/')
+            force_authenticate(request, user=self.student)
+            return QuizDetailView.as_view()(request, lesson_id=self.lesson.id).data
+
+        def submit(data):
+            answers = {str(question['id']): self.right[question['id']] for question in data['questions']}
+            request = factory.post('/', {'answers': answers, 'sample_token': data['sample_token']}, format='json')
+            force_authenticate(request, user=self.student)
+            return SubmitQuizView.as_view()(request, lesson_id=self.lesson.id)
+
+        data = detail()
+        self.assertEqual(len(data['questions']), 3)
+        self.assertEqual(submit(data).status_code, 200)
+        self.assertEqual(submit(data).status_code, 400)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.student).count(), 1)
+        self.assertEqual(submit(detail()).status_code, 200)
+
+
+class ItemAnalysisTests(TestCase):
+    """Sommes incrémentales des statistiques d'item et indicateurs qui en sont dérivés"""
+
+    # Réussite par question de chaque tentative (None : question sans réponse)
+    ATTEMPTS = [
+        (1, 1, 1), (1, 0, 1), (0, 0, 1), (1, 1, 0), (0, 0, 0), (1, 0, 0), (1, None, None),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'), created_by=user
+        )
+        cls.quiz = Quiz.objects.create(lesson=Lesson.objects.create(course=course, title='Leçon'), title='Quiz')
+        cls.questions = [Question.objects.create(quiz=cls.quiz, text=f'Question {order}') for order in range(3)]
+        cls.choices = [
+            {
+                True: Answer.objects.create(question=question, text='Juste', is_correct=True),
+                False: Answer.objects.create(question=question, text='Faux', is_correct=False),
+            }
+            for question in cls.questions
+        ]
+        for hits in cls.ATTEMPTS:
+            attempt = QuizAttempt.objects.create(user=user, quiz=cls.quiz, score=0)
+            item_analysis.record_attempt(QuizAnswer.objects.bulk_create([
+                QuizAnswer(attempt=attempt, question=question, answer=choices[bool(hit)], is_correct=bool(hit))
+                for question, choices, hit in zip(cls.questions, cls.choices, hits)
+                if hit is not None
+            ]))
+
+    def sums(self):
+        return (
+            {stats.pk: [getattr(stats, column) for column in item_analysis.QUESTION_SUMS]
+             for stats in QuestionStatistics.objects.filter(responses__gt=0)},
+            {stats.pk: [getattr(stats, column) for column in item_analysis.ANSWER_SUMS]
+             for stats in AnswerStatistics.objects.filter(selections__gt=0)},
+        )
+
+    def test_incremental_sums_match_rebuild(self):
+        incremental = self.sums()
+        self.assertEqual(item_analysis.rebuild(), 3)
+        rebuilt = self.sums()
+        for recorded, recomputed in zip(incremental, rebuilt):
+            self.assertEqual(recorded.keys(), recomputed.keys())
+            for pk, values in recorded.items():
+                for value, expected in zip(values, recomputed[pk]):
+                    self.assertAlmostEqual(value, expected)
+
+    def test_discrimination_matches_pearson_correlation(self):
+        paired = [hits for hits in self.ATTEMPTS if None not in hits]
+        for index, question in enumerate(self.questions):
+            hits = [attempt[index] for attempt in paired]
+            rests = [(sum(attempt) - attempt[index]) / (len(attempt) - 1) for attempt in paired]
+            report = item_analysis.question_report(Question.objects.select_related('statistics').get(pk=question.pk))
+            self.assertEqual(report['responses'], 7 if index == 0 else 6)
+            self.assertAlmostEqual(report['discrimination'], statistics.correlation(hits, rests), places=4)
+            wrong = next(answer for answer in report['answers'] if not answer['is_correct'])
+            self.assertAlmostEqual(
+                wrong['discrimination'], statistics.correlation([1 - hit for hit in hits], rests), places=4
+            )
+
+
+class LearningStreakTests(TestCase):
+    """Séries alimentées par toutes les écritures de progression, et leur reconstruction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.student
+        )
+        cls.lesson = Lesson.objects.create(course=course, title='Leçon')
+        Enrollment.objects.create(user=cls.student, course=course)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_progress_put_counts_for_streak_and_caps_time(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        url = reverse('lesson-progress', kwargs={'lesson_id': self.lesson.id})
+        with mock.patch.object(gamification.leaderboards, 'record') as record:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.put(url, {'completed': True, 'time_spent': 10 ** 6}, format='json')
+        self.assertEqual(response.json()['time_spent'], gamification.MAX_TIME_INCREMENT)
+        self.assertEqual(record.call_args.args[2], (1, gamification.MAX_TIME_INCREMENT))
+        self.assertEqual(LearningStreak.objects.get(user=self.student).current_streak, 1)
+        self.assertEqual(client.put(url, {'time_spent': 'x'}, format='json').status_code, 400)
+
+    def test_rebuild_merges_history_and_keeps_longest_streaks(self):
+        today = timezone.localdate()
+        idle = User.objects.create_user('idle', 'idle@example.com', 'password')
+        LearningStreak.objects.create(
+            user=idle, last_active_on=today - timedelta(days=200), activity_days=1, current_streak=12,
+            longest_streak=12
+        )
+        LearningStreak.objects.create(
+            user=self.student, last_active_on=today - timedelta(days=1), activity_days=0b1,
+            current_streak=1, longest_streak=7
+        )
+        LessonProgress.objects.create(user=self.student, lesson=self.lesson, completed=True, completed_at=timezone.now())
+
+        self.assertEqual(rebuild_streaks(today), 1)
+        streak = LearningStreak.objects.get(user=self.student)
+        self.assertEqual((streak.last_active_on, streak.current_streak, streak.longest_streak), (today, 2, 7))
+        self.assertEqual(LearningStreak.objects.get(user=idle).longest_streak, 12)
+
+
+class ProgressWriteTests(TestCase):
+    """Écritures de progression : positions regroupées"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.student
+        )
+        cls.lesson = Lesson.objects.create(course=course, title='Leçon')
+        cls.enrollment = Enrollment.objects.create(user=cls.student, course=course)
+
+    def setUp(self):
+        cache.clear()
+        # Les positions regroupées sont écrites par flush(), sans le thread du processus
+        patcher = mock.patch.object(progress.PendingPositions, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pending = progress.PendingPositions()
+        patcher = mock.patch.object(progress, 'pending_positions', self.pending)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def position(self):
+        return LessonProgress.objects.get(user=self.student, lesson=self.lesson).last_position
+
+    def test_coalesced_position_survives_other_writes(self):
+        self.assertEqual(progress.sync_position(self.student, self.lesson.id, 10), (True, False))
+        self.assertEqual(progress.sync_position(self.student, self.lesson.id, 20), (False, True))
+        self.assertEqual(progress.pending_position(self.student.id, self.lesson.id), 20)
+        # Une écriture qui ne touche pas la position (temps passé) met à jour last_accessed
+        progress_row = LessonProgress.objects.get(user=self.student, lesson=self.lesson)
+        progress_row.time_spent = 30
+        progress_row.save()
+
+        self.assertEqual(self.pending.flush(), 1)
+        self.assertEqual(self.position(), 20)
+
+    def test_coalesced_position_does_not_overwrite_a_newer_one(self):
+        progress.sync_position(self.student, self.lesson.id, 10)
+        progress.sync_position(self.student, self.lesson.id, 20)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        client.put(reverse('lesson-progress', kwargs={'lesson_id': self.lesson.id}), {'last_position': 5}, format='json')
+
+        self.pending.flush()
+        self.assertEqual(self.position(), 5)
+
+    def test_endpoint_writes_once_per_window_unless_flushed(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        url = reverse('lesson-position', kwargs={'lesson_id': self.lesson.id})
+
+        first = client.post(url, {'last_position': 10}, format='json').json()
+        second = client.post(url, {'last_position': 20}, format='json').json()
+        self.assertEqual((first['saved'], second['saved'], second['coalesced']), (True, False, True))
+        self.assertEqual(self.position(), 10)
+
+        flushed = client.post(url, {'last_position': 30, 'flush': True}, format='json').json()
+        self.assertEqual((flushed['saved'], flushed['coalesced']), (True, False))
+        self.assertEqual(self.position(), 30)
+        # La position en attente, plus ancienne, est abandonnée
+        self.assertEqual(self.pending.flush(), 0)
+        self.assertEqual(client.post(url, {'last_position': -1}, format='json').status_code, 400)
+
+    def test_endpoint_requires_an_enrollment(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('visitor', 'visitor@example.com', 'password'))
+        response = client.post(
+            reverse('lesson-position', kwargs={'lesson_id': self.lesson.id}), {'last_position': 10}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class EventStreamTests(TestCase):
+    """Journal d'activité lu comme file d'événements"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.student
+        )
+        cls.lesson = Lesson.objects.create(course=course, title='Leçon')
+        Enrollment.objects.create(user=cls.student, course=course)
+
+    def activity(self, **kwargs):
+        return UserActivity.objects.create(
+            user=self.student, activity_type='course_enrolled', description='Inscription', **kwargs
+        )
+
+    def test_first_completion_records_an_activity(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        with mock.patch.object(gamification, 'record_progress'):
+            client.post(reverse('complete-lesson'), {'lesson_id': self.lesson.id}, format='json')
+        self.assertTrue(
+            UserActivity.objects.filter(user=self.student, activity_type='lesson_completed').exists()
+        )
+
+    def test_ticket_authentication_checks_the_account(self):
+        with mock.patch.object(events, 'reverse', return_value='/events/'):
+            url = events.stream_ticket(None, self.student, timezone.now().timestamp())
+
+        def authenticate(query):
+            return async_to_sync(EventStreamView().authenticate)(RequestFactory().get(query))
+
+        self.assertEqual(authenticate(url), self.student)
+        self.assertIsNone(authenticate('/events/?ticket=forged'))
+        profile = Profile.objects.filter(user=self.student)
+        profile.update(password_changed_at=timezone.now() + timedelta(seconds=1))
+        with self.assertRaises(AuthenticationFailed):
+            authenticate(url)
+        profile.update(password_changed_at=None)
+        User.objects.filter(pk=self.student.pk).update(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            authenticate(url)
+
+    def test_poll_delivers_ids_committed_out_of_order(self):
+        hub = events.EventHub()
+        self.assertEqual(hub.poll({self.student.id}), [])
+        start = hub.cursor
+        later = self.activity(id=start + 500)
+        self.assertEqual([event_id for _, event_id, _ in hub.poll({self.student.id})], [later.id])
+
+        # Transaction validée après coup, bien au-delà d'une marge fixe
+        earlier = self.activity(id=start + 3)
+        self.assertEqual([event_id for _, event_id, _ in hub.poll({self.student.id})], [earlier.id])
+        self.assertEqual(hub.poll({self.student.id}), [])
+        self.assertNotIn(earlier.id, hub.gaps)
+
+    def test_reconnection_replays_missed_events_with_progress(self):
+        first = self.activity()
+        completed = UserActivity.objects.create(
+            user=self.student, activity_type='lesson_completed', description='Leçon terminée',
+            related_course=self.lesson.course, related_lesson=self.lesson
+        )
+        replay = events.missed_events(self.student.id, first.id)
+        self.assertEqual([event_id for event_id, _ in replay], [completed.id, completed.id])
+        self.assertEqual(
+            [text.split('\n')[1] for _, text in replay], ['event: activity', 'event: progress']
+        )
+        with mock.patch.object(events, 'BACKLOG_SIZE', 1):
+            self.assertIsNone(events.missed_events(self.student.id, 0))
+
+    def test_slow_subscriber_is_asked_to_resync(self):
+        subscriber = events.Subscriber(self.student.id)
+        for event_id in range(events.QUEUE_SIZE + 1):
+            subscriber.push((event_id, 'texte'))
+        self.assertEqual(subscriber.queue.qsize(), 1)
+        self.assertIs(subscriber.queue.get_nowait(), events.RESYNC)
+
+
+class LessonContentTests(TestCase):
+    """Autorisation des leçons : accès et suivi des consultations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.visitor = User.objects.create_user('visitor', 'visitor@example.com', 'password')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.instructor
+        )
+        cls.free = Lesson.objects.create(course=cls.course, title='Introduction', is_free=True, order=1)
+        cls.paid = Lesson.objects.create(course=cls.course, title='Suite', order=2)
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+        # Le suivi est soumis au thread d'arrière-plan : on relève les soumissions
+        patcher = mock.patch.object(content, '_executor')
+        self.executor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, user, lesson):
+        request = APIRequestFactory().get(f'/api/courses/lessons/{lesson.id}/')
+        force_authenticate(request, user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return LessonDetailView.as_view()(request, lesson_id=lesson.id)
+
+    def test_detail_loads_the_lesson_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get(self.student, self.paid)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['title'], response.data['order']), ('Suite', 2))
+        self.executor.submit.assert_called_once_with(
+            content._run, content.record_access, self.student.id, self.paid.id, self.course.id, 'Suite'
+        )
+
+    def test_free_lessons_and_instructors_pass_without_tracking(self):
+        self.assertEqual(self.get(self.visitor, self.free).status_code, 200)
+        self.assertEqual(self.get(self.instructor, self.paid).status_code, 200)
+        self.assertEqual(self.get(self.visitor, self.paid).status_code, 404)
+        self.executor.submit.assert_not_called()
+
+    def access(self, user, lesson):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse('lesson-access', kwargs={'lesson_id': lesson.id}))
+
+    def test_content_url_is_shared_by_students_and_expires_with_the_content(self):
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        Enrollment.objects.create(user=other, course=self.course)
+        url = self.access(self.student, self.paid).json()['content_url']
+        self.assertEqual(self.access(other, self.paid).json()['content_url'], url)
+        self.assertEqual(self.access(self.visitor, self.paid).status_code, 403)
+
+        client = APIClient()
+        response = client.get(url)
+        self.assertEqual((response.status_code, response.json()['title']), (200, 'Suite'))
+        self.assertTrue(response['Cache-Control'].startswith('public'))
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+            self.assertEqual(client.get(url).status_code, 200)
+
+        # Une URL désigne une version : elle la sert tant qu'elle est en cache, sinon 410
+        self.paid.title = 'Suite modifiée'
+        self.paid.save()
+        self.assertEqual(client.get(url).json()['title'], 'Suite')
+        cache.clear()
+        self.assertEqual(client.get(url).status_code, 410)
+        self.assertNotEqual(self.access(self.student, self.paid).json()['content_url'], url)
+
+
+class ScaleSeedingTests(TestCase):
+    """Mode charge de seed_courses : données déterministes insérées par lots"""
+
+    def seed(self, seed):
+        call_command(
+            'seed_courses', courses=3, lessons_per_course=4, users=5, enrollments_per_user=2,
+            seed=seed, batch_size=2, stdout=io.StringIO()
+        )
+
+    def test_users_get_every_settings_row_and_enrollments_match_progress(self):
+        self.seed(7)
+        users = User.objects.filter(username__startswith='load-7-')
+        self.assertEqual(users.count(), 5)
+        for model in SETTINGS_MODELS:
+            self.assertEqual(model.objects.filter(user__in=users).count(), 5, model.__name__)
+        self.assertEqual(Course.objects.filter(status='published').count(), 3)
+        self.assertEqual(Lesson.objects.count(), 12)
+        self.assertEqual(Enrollment.objects.filter(user__in=users).count(), 10)
+        for enrollment in Enrollment.objects.filter(user__in=users):
+            done = LessonProgress.objects.filter(
+                user=enrollment.user, lesson__course=enrollment.course, completed=True
+            ).count()
+            self.assertAlmostEqual(enrollment.progress, done / 4 * 100)
+
+    def test_courses_follow_the_seed_and_a_seed_is_refused_twice(self):
+        self.seed(3)
+        self.assertEqual(
+            list(Course.objects.order_by('id').values_list('title', flat=True)),
+            [synthetic.build_course(3, index, 4)['title'] for index in range(3)]
+        )
+        with self.assertRaises(CommandError):
+            self.seed(3)
+
+
+class BulkEnrollmentTests(TestCase):
+    """Inscription en masse d'une cohorte par lots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        category = Category.objects.create(name='Data')
+        cls.courses = [
+            Course.objects.create(title=title, description='Description', category=category, created_by=cls.instructor)
+            for title in ('Python', 'SQL')
+        ]
+        cls.students = [
+            User.objects.create_user(f'student{index}', f'Student{index}@example.com', 'password')
+            for index in range(5)
+        ]
+        Enrollment.objects.create(user=cls.students[0], course=cls.courses[0])
+
+    def test_emails_are_matched_case_insensitively_and_existing_enrollments_kept(self):
+        lines = io.StringIO(
+            'email,name\n' + ''.join(f'student{index}@EXAMPLE.com,Nom\n' for index in range(5)) + 'nobody@example.com\n'
+        )
+        stats = enrollment.enroll_emails(enrollment.read_emails(lines), self.courses, batch_size=2)
+
+        self.assertEqual((stats['lines'], stats['users'], stats['unknown'], stats['enrolled']), (6, 5, 1, 9))
+        self.assertEqual(Enrollment.objects.count(), 10)
+        self.assertEqual(UserActivity.objects.filter(activity_type='course_enrolled').count(), 9)
+
+        # Une seconde importation n'ajoute rien
+        stats = enrollment.enroll_users([student.id for student in self.students], self.courses)
+        self.assertEqual((stats['users'], stats['enrolled']), (5, 0))
+
+    def test_queries_per_batch_do_not_depend_on_its_size(self):
+        # Par lot : inscriptions existantes, puis une insertion par table dans un savepoint
+        with self.assertNumQueries(5):
+            enrollment.enroll_user_ids([student.id for student in self.students], self.courses)
+
+
+class GradebookExportTests(TestCase):
+    """Export en flux du carnet de notes (CSV, Parquet)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.instructor
+        )
+        cls.lessons = [Lesson.objects.create(course=cls.course, title=f'Leçon {order}', order=order) for order in (1, 2)]
+        cls.quiz = Quiz.objects.create(lesson=cls.lessons[0], title='Quiz')
+        cls.students = [
+            User.objects.create_user(f'student{index}', f'student{index}@example.com', 'password') for index in range(3)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(user=student, course=cls.course, progress=50.0)
+        # Le deuxième étudiant n'a ni progression ni tentative : les flux doivent le sauter sans décalage
+        for student in (cls.students[0], cls.students[2]):
+            LessonProgress.objects.create(user=student, lesson=cls.lessons[1], completed=True, time_spent=40)
+            for score in (40.0, 90.0):
+                QuizAttempt.objects.create(user=student, quiz=cls.quiz, score=score)
+
+    def export(self, user, output='csv'):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse('course-gradebook', kwargs={'course_id': self.course.id}), {'output': output})
+
+    def test_csv_streams_one_row_per_enrolled_student(self):
+        response = self.export(self.instructor)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        lesson_ids = [lesson.id for lesson in self.lessons]
+        self.assertEqual(rows[0], gradebook.FIXED_COLUMNS + [
+            f'lesson_{lesson_ids[0]}_completed', f'lesson_{lesson_ids[1]}_completed', f'quiz_{self.quiz.id}_best_score'
+        ])
+        self.assertEqual([row[1] for row in rows[1:]], ['student0', 'student1', 'student2'])
+        self.assertEqual(rows[1][5:], ['1', '40', 'False', 'True', '90.0'])
+        self.assertEqual(rows[2][5:], ['0', '0', 'False', 'False', ''])
+
+    def test_small_chunks_give_the_same_rows(self):
+        self.assertEqual(
+            list(gradebook.Gradebook(self.course, chunk_size=1).rows()), list(gradebook.Gradebook(self.course).rows())
+        )
+
+    def test_only_instructors_export_in_known_formats(self):
+        self.assertEqual(self.export(self.students[0]).status_code, 403)
+        self.assertEqual(self.export(self.instructor, 'xlsx').status_code, 400)
+
+    @unittest.skipUnless(gradebook.PARQUET_AVAILABLE, "pyarrow n'est pas installé")
+    def test_parquet_export_matches_the_rows(self):
+        import pyarrow.parquet
+
+        response = self.export(self.instructor, 'parquet')
+        self.assertEqual(response.status_code, 200)
+        table = pyarrow.parquet.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column_names, gradebook.Gradebook(self.course).columns)
+        self.assertEqual(table.column('time_spent').to_pylist(), [40, 0, 40])
+
+
+class CourseAnalyticsTests(TestCase):
+    """Statistiques instructeurs lues depuis les agrégats matérialisés"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        category = Category.objects.create(name='Data')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=category, created_by=cls.instructor
+        )
+        cls.other = Course.objects.create(title='SQL', description='Description', category=category, created_by=cls.instructor)
+        cls.lessons = [Lesson.objects.create(course=cls.course, title=f'Leçon {order}', order=order) for order in (1, 2)]
+        cls.quiz = Quiz.objects.create(lesson=cls.lessons[0], title='Quiz')
+        cls.students = [
+            User.objects.create_user(f'student{index}', f'student{index}@example.com', 'password') for index in range(4)
+        ]
+        for student, progress_value in zip(cls.students, (100.0, 50.0, 0.0, 0.0)):
+            Enrollment.objects.create(
+                user=student, course=cls.course, progress=progress_value, completed=progress_value == 100
+            )
+        for student, lesson in ((cls.students[0], cls.lessons[0]), (cls.students[0], cls.lessons[1]),
+                                (cls.students[1], cls.lessons[0])):
+            LessonProgress.objects.create(user=student, lesson=lesson, completed=True, time_spent=60)
+        LessonProgress.objects.create(user=cls.students[2], lesson=cls.lessons[0], time_spent=30)
+        for student, score, passed in ((cls.students[0], 40.0, False), (cls.students[0], 80.0, True),
+                                       (cls.students[1], 30.0, False)):
+            QuizAttempt.objects.create(user=student, quiz=cls.quiz, score=score, passed=passed)
+
+    def get(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse('course-analytics', kwargs={'course_id': self.course.id}))
+
+    def test_funnel_is_computed_on_first_read(self):
+        response = self.get(self.instructor)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [data[key] for key in ('enrolled_count', 'started_count', 'halfway_count', 'completed_count')],
+            [4, 3, 2, 1]
+        )
+        self.assertEqual(
+            [(lesson['started_count'], lesson['completed_count'], lesson['drop_off']) for lesson in data['lessons']],
+            [(3, 2, 2), (1, 1, 1)]
+        )
+        self.assertEqual(data['lessons'][0]['avg_time_spent'], 50)
+        quiz = data['quizzes'][0]
+        self.assertEqual(
+            (quiz['attempt_count'], quiz['student_count'], quiz['passed_count'], quiz['pass_rate']), (3, 2, 1, 50)
+        )
+        self.assertEqual(self.get(self.students[0]).status_code, 403)
+
+    def test_refresh_recomputes_only_courses_with_activity(self):
+        self.assertEqual(analytics.refresh_stale(), 2)
+        self.assertEqual(analytics.refresh_stale(), 0)
+
+        Enrollment.objects.create(user=self.students[3], course=self.other)
+        self.assertEqual(analytics.refresh_stale(), 1)
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        courses = client.get(reverse('instructor-analytics')).json()['courses']
+        self.assertEqual([(course['course_title'], course['enrolled_count']) for course in courses], [('Python', 4), ('SQL', 1)])
+
+
+class ProgressSyncTests(TestCase):
+    """Synchronisation par lot des clients hors ligne : rejouer un lot n'applique rien deux fois"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        category = Category.objects.create(name='Data')
+        cls.course = Course.objects.create(title='Python', description='Description', category=category, created_by=cls.student)
+        cls.other = Course.objects.create(title='SQL', description='Description', category=category, created_by=cls.student)
+        cls.lessons = [Lesson.objects.create(course=cls.course, title=f'Leçon {order}', order=order) for order in (1, 2)]
+        cls.foreign = Lesson.objects.create(course=cls.other, title='Autre')
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def sync(self, events):
+        return self.client.post(reverse('progress-sync'), {'events': events}, format='json')
+
+    def test_replayed_events_are_applied_once(self):
+        events = [
+            {'event_id': 'a', 'type': 'time', 'lesson_id': self.lessons[0].id, 'value': 120},
+            {'event_id': 'b', 'type': 'position', 'lesson_id': self.lessons[0].id, 'value': 95},
+            {'event_id': 'c', 'type': 'complete', 'lesson_id': self.lessons[0].id},
+            {'event_id': 'a', 'type': 'time', 'lesson_id': self.lessons[0].id, 'value': 120},
+            {'event_id': 'd', 'type': 'complete', 'lesson_id': self.foreign.id},
+        ]
+        response = self.sync(events)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.json()['results']],
+            ['applied', 'applied', 'applied', 'duplicate', 'error']
+        )
+        self.assertEqual(response.json()['courses'], [{'course_id': self.course.id, 'progress': 50.0, 'completed': False}])
+
+        replay = self.sync(events[:3]).json()
+        self.assertEqual([result['status'] for result in replay['results']], ['duplicate'] * 3)
+        progress_row = LessonProgress.objects.get(user=self.student, lesson=self.lessons[0])
+        self.assertEqual((progress_row.time_spent, progress_row.last_position, progress_row.completed), (120, 95, True))
+        self.assertEqual(UserActivity.objects.filter(user=self.student, activity_type='lesson_completed').count(), 1)
+
+    def test_completing_every_lesson_completes_the_course(self):
+        events = [
+            {'event_id': f'complete-{lesson.id}', 'type': 'complete', 'lesson_id': lesson.id} for lesson in self.lessons
+        ]
+        self.assertEqual(self.sync(events).json()['courses'][0], {'course_id': self.course.id, 'progress': 100.0, 'completed': True})
+        self.assertTrue(Certificate.objects.filter(user=self.student, course=self.course).exists())
+
+
+class LessonMediaTests(TestCase):
+    """Pièces jointes servies par URL signée, requêtes Range comprises"""
+
+    BODY = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=Category.objects.create(name='Data'),
+            created_by=cls.instructor
+        )
+        Enrollment.objects.create(user=cls.student, course=cls.course)
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media_root = override_settings(MEDIA_ROOT=root.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.lesson = Lesson.objects.create(course=self.course, title='Vidéo')
+        self.lesson.attachment.save('cours.mp4', ContentFile(self.BODY))
+
+    def media_url(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse('lesson-attachment', kwargs={'lesson_id': self.lesson.id}))
+
+    def fetch(self, url, **headers):
+        response = APIClient().get(url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_signed_url_serves_ranges_without_queries(self):
+        url = self.media_url(self.student).json()['url']
+        self.assertEqual(self.media_url(User.objects.create_user('visitor', 'v@example.com', 'password')).status_code, 403)
+
+        with self.assertNumQueries(0):
+            response, body = self.fetch(url)
+        self.assertEqual((response.status_code, body, response['Accept-Ranges']), (200, self.BODY, 'bytes'))
+        etag = response['ETag']
+
+        response, body = self.fetch(url, Range='bytes=10-19')
+        self.assertEqual((response.status_code, body, response['Content-Range']), (206, self.BODY[10:20], 'bytes 10-19/1024'))
+        response, body = self.fetch(url, Range='bytes=-24')
+        self.assertEqual((response.status_code, body), (206, self.BODY[-24:]))
+        response, body = self.fetch(url, Range='bytes=1000-', **{'If-Range': etag})
+        self.assertEqual((response.status_code, body), (206, self.BODY[1000:]))
+
+        self.assertEqual(self.fetch(url, Range='bytes=10-19', **{'If-Range': '"other"'})[0].status_code, 200)
+        response, _ = self.fetch(url, Range='bytes=2048-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_tampered_token_is_refused(self):
+        url = self.media_url(self.instructor).json()['url']
+        token = url.split('/media/')[1].split('/')[0]
+        self.assertEqual(self.fetch(url.replace(token, token[:-1] + ('A' if token[-1] != 'A' else 'B')))[0].status_code, 404)
+
+
+class AsyncViewTests(TestCase):
+    """Les vues asynchrones (ASGI) répondent comme les vues synchrones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        category = Category.objects.create(name='Data')
+        cls.course = Course.objects.create(
+            title='Python', description='Description', category=category, created_by=cls.student, status='published'
+        )
+        Course.objects.create(title='SQL', description='Description', category=category, created_by=cls.student, status='published')
+        section = CourseSection.objects.create(course=cls.course, title='Bases', order=1)
+        lessons = [Lesson.objects.create(course=cls.course, section=section, title=f'Leçon {order}', order=order) for order in (1, 2)]
+        Quiz.objects.create(lesson=lessons[1], title='Quiz')
+        Enrollment.objects.create(user=cls.student, course=cls.course, progress=50.0)
+        LessonProgress.objects.create(user=cls.student, lesson=lessons[0], completed=True, time_spent=7200)
+        for lesson in lessons:
+            UserActivity.objects.create(
+                user=cls.student, activity_type='lesson_started', description=lesson.title,
+                related_course=cls.course, related_lesson=lesson
+            )
+
+    def setUp(self):
+        # Les groupes de requêtes passent par la connexion du test (transaction non validée)
+        async def gather(*funcs):
+            return [await sync_to_async(func)() for func in funcs]
+        patcher = mock.patch.object(async_views, 'gather', gather)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token = str(CachedRefreshToken.for_user(self.student).access_token)
+
+    def compare(self, view, url, **kwargs):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        expected = client.get(url)
+        request = RequestFactory().get(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = async_to_sync(view.as_view())(request, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+
+    def test_async_views_match_the_sync_views(self):
+        self.compare(DashboardStatsView, reverse('dashboard-stats'))
+        self.compare(UserActivitiesView, reverse('user-activities') + '?page_size=1&page=2')
+        data = json.loads(self.compare(
+            CourseProgressView, reverse('course-progress', kwargs={'course_id': self.course.id}), course_id=self.course.id
+        ).content)
+        self.assertEqual([lesson['has_quiz'] for lesson in data['sections'][0]['lessons']], [False, True])
+        self.compare(CourseProgressView, reverse('course-progress', kwargs={'course_id': 0}), course_id=0)
+
+    def test_requests_without_a_valid_token_are_refused(self):
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer invalid'}):
+            response = async_to_sync(DashboardStatsView.as_view())(RequestFactory().get('/dashboard/', **headers))
+            self.assertEqual(response.status_code, 401)
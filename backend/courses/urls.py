@@ -1,12 +1,26 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CourseViewSet, CategoryViewSet,
     CourseSectionViewSet, LessonViewSet,
     CompleteLesson, CourseProgressView,
-    LessonProgressView
+    LessonProgressView, GradebookExportView,
+    CourseAnalyticsView, InstructorAnalyticsView,
+    LessonPositionSyncView, ProgressSyncView,
+    LessonAttachmentView, LessonMediaView,
+    LessonAccessView, LessonContentView,
+    DashboardStatsView, UserActivitiesView,
+    EventTicketView, CourseVersionView,
+    LearningStreakView, LeaderboardView,
+    ReviewQueueView, ReviewSubmitView,
+    ItemStatisticsView
 )
 
+if settings.ASYNC_VIEWS:
+    # Sous ASGI, ces lectures sont servies par leurs variantes asynchrones
+    from .async_views import DashboardStatsView, UserActivitiesView, CourseProgressView, EventStreamView
+
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'courses', CourseViewSet)
@@ -16,6 +30,31 @@ router.register(r'lessons', LessonViewSet, basename='lesson')
 urlpatterns = [
     path('', include(router.urls)),
     path('complete_lesson/', CompleteLesson.as_view(), name='complete-lesson'),
+    path('dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('activities/', UserActivitiesView.as_view(), name='user-activities'),
+    path('progress/sync/', ProgressSyncView.as_view(), name='progress-sync'),
     path('courses/<int:course_id>/progress/', CourseProgressView.as_view(), name='course-progress'),
     path('lessons/<int:lesson_id>/progress/', LessonProgressView.as_view(), name='lesson-progress'),
-] 
\ No newline at end of file
+    path('lessons/<int:lesson_id>/position/', LessonPositionSyncView.as_view(), name='lesson-position'),
+    path('lessons/<int:lesson_id>/access/', LessonAccessView.as_view(), name='lesson-access'),
+    path('lessons/content/<str:token>/', LessonContentView.as_view(), name='lesson-content'),
+    path('lessons/<int:lesson_id>/attachment/', LessonAttachmentView.as_view(), name='lesson-attachment'),
+    path('media/<str:token>/<str:filename>', LessonMediaView.as_view(), name='lesson-media'),
+    path('courses/<int:course_id>/version/', CourseVersionView.as_view(), name='course-version-current'),
+    path('courses/<int:course_id>/versions/<int:number>/', CourseVersionView.as_view(), name='course-version'),
+    path('courses/<int:course_id>/gradebook/', GradebookExportView.as_view(), name='course-gradebook'),
+    path('courses/<int:course_id>/analytics/', CourseAnalyticsView.as_view(), name='course-analytics'),
+    path('courses/<int:course_id>/item-statistics/', ItemStatisticsView.as_view(), name='course-item-statistics'),
+    path('instructor/analytics/', InstructorAnalyticsView.as_view(), name='instructor-analytics'),
+    path('streak/', LearningStreakView.as_view(), name='learning-streak'),
+    path('leaderboards/<str:scope>/<int:scope_id>/', LeaderboardView.as_view(), name='leaderboard'),
+    path('reviews/', ReviewQueueView.as_view(), name='review-queue'),
+    path('reviews/submit/', ReviewSubmitView.as_view(), name='review-submit'),
+]
+
+if settings.ASYNC_VIEWS:
+    # Flux d'événements : une connexion ouverte par client, seulement sous ASGI
+    urlpatterns += [
+        path('events/', EventStreamView.as_view(), name='event-stream'),
+        path('events/ticket/', EventTicketView.as_view(), name='event-ticket'),
+    ]
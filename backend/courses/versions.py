@@ -0,0 +1,236 @@
+"""
+Versions publiées des cours.
+
+À la publication (Course.status passe à 'published', ou republication
+explicite), l'arborescence du cours (sections, leçons, quiz sans leurs
+questions, compétences) est compilée en un document JSON unique enregistré dans une
+CourseVersion immuable et numérotée. Les étudiants lisent ce document en une
+lecture de cache (repli : une lecture par clé primaire) au lieu de refaire
+les jointures à chaque affichage ; les modifications en cours d'édition ne
+sont visibles qu'à la publication suivante. Le document est public tant que
+le cours est publié et actif ; les questions des quiz restent réservées aux
+inscrits (QuizDetailView).
+
+Chaque inscription référence la version suivie : sa progression est calculée
+sur les leçons de cette version, de sorte qu'ajouter une leçon ne modifie
+pas en silence le pourcentage des étudiants déjà inscrits. Une leçon
+supprimée n'est plus comptée (sa progression a disparu avec elle), et
+l'inscription passe à la version publiée quand l'étudiant termine sa
+leçon suivante (follow_published).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Prefetch
+
+from .models import Course, CourseSkill, CourseVersion, Lesson, LessonProgress, Quiz
+
+# Les versions sont immuables : leur document peut rester longtemps en cache
+CACHE_TIMEOUT = getattr(settings, 'COURSE_VERSION_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+# Le pointeur vers la version publiée (et l'état publié) change : durée courte
+POINTER_TIMEOUT = getattr(settings, 'COURSE_VERSION_POINTER_TIMEOUT', 60)
+
+COURSE_FIELDS = (
+    'id', 'title', 'subtitle', 'slug', 'description', 'level', 'language', 'total_hours',
+    'prerequisites', 'objectives', 'target_audience', 'syllabus', 'certificate_available',
+)
+LESSON_FIELDS = (
+    'id', 'title', 'description', 'content_type', 'duration', 'video_duration', 'order', 'is_free',
+    'content_version',
+)
+
+
+def _document_key(course_id, number):
+    return f"course-version:{course_id}:{number}"
+
+
+def _current_key(course_id):
+    return f"course-version-current:{course_id}"
+
+
+def _lessons_key(version_id):
+    return f"course-version-lessons:{version_id}"
+
+
+def _quiz(quiz):
+    # Le document est public : les questions sont servies aux inscrits par QuizDetailView
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'description': quiz.description,
+        'pass_percentage': quiz.pass_percentage,
+        'questions_per_attempt': quiz.questions_per_attempt,
+        'question_count': quiz.question_count,
+    }
+
+
+def compile_course(course):
+    """Document de l'arborescence actuelle du cours, et identifiants de ses leçons"""
+    quizzes = Quiz.objects.annotate(question_count=Count('questions'))
+    lessons = list(
+        Lesson.objects.filter(course=course).select_related('section').prefetch_related(
+            Prefetch('quiz', queryset=quizzes)
+        ).order_by('section__order', 'section_id', 'order', 'id')
+    )
+
+    sections, unsectioned = {}, []
+    for section in course.sections.order_by('order', 'id'):
+        sections[section.id] = {
+            'id': section.id,
+            'title': section.title,
+            'description': section.description,
+            'order': section.order,
+            'lessons': [],
+        }
+    for lesson in lessons:
+        data = {field: getattr(lesson, field) for field in LESSON_FIELDS}
+        data['content_version'] = lesson.content_version or lesson.compute_content_version()
+        data['quiz'] = _quiz(lesson.quiz) if hasattr(lesson, 'quiz') else None
+        (sections[lesson.section_id]['lessons'] if lesson.section_id in sections else unsectioned).append(data)
+
+    skills = CourseSkill.objects.filter(course=course).select_related('skill').order_by('skill__name')
+    document = {
+        'course': {field: getattr(course, field) for field in COURSE_FIELDS},
+        'category': {'id': course.category_id, 'name': course.category.name, 'slug': course.category.slug},
+        'sections': list(sections.values()),
+        'unsectioned_lessons': unsectioned,
+        'skills': [{'id': course_skill.skill_id, 'name': course_skill.skill.name} for course_skill in skills],
+        'lesson_count': len(lessons),
+    }
+    return document, [lesson.id for lesson in lessons]
+
+
+def _encode(document):
+    return json.dumps(document, cls=DjangoJSONEncoder, sort_keys=True).encode()
+
+
+def publish(course_id, user=None):
+    """
+    Compile le cours et enregistre une nouvelle version si son contenu a
+    changé depuis la dernière. Retourne (version, créée).
+    """
+    with transaction.atomic():
+        course = Course.objects.select_for_update().select_related('category', 'published_version').get(pk=course_id)
+        document, lesson_ids = compile_course(course)
+        checksum = hashlib.sha256(_encode(document)).hexdigest()
+        current = course.published_version
+        if current is not None and current.checksum == checksum:
+            return current, False
+
+        latest = course.versions.order_by('-number').values_list('number', flat=True).first() or 0
+        document['version'] = latest + 1
+        version = CourseVersion.objects.create(
+            course=course,
+            number=latest + 1,
+            document=document,
+            lesson_ids=lesson_ids,
+            checksum=checksum,
+            published_by=user if user is not None and user.is_authenticated else None,
+        )
+        Course.objects.filter(pk=course.pk).update(published_version=version)
+
+        def update_cache():
+            cache.set(_document_key(course.pk, version.number), _encode(version.document), CACHE_TIMEOUT)
+            cache.set(_current_key(course.pk), version.number, POINTER_TIMEOUT)
+        transaction.on_commit(update_cache)
+    return version, True
+
+
+def status_changed(course_id, status):
+    """Publie le cours, ou le retire de la lecture publique"""
+    if status == 'published':
+        publish(course_id)
+    else:
+        forget_current(course_id)
+
+
+def forget_current(course_id):
+    """Oublie le pointeur en cache : l'état du cours sera relu à la prochaine lecture"""
+    cache.delete(_current_key(course_id))
+
+
+def current_number(course_id):
+    """Numéro de la version publiée du cours, None s'il n'est pas publié et actif"""
+    number = cache.get(_current_key(course_id))
+    if number is None:
+        course = Course.objects.filter(pk=course_id, is_active=True).values(
+            'status', 'published_version__number'
+        ).first()
+        if course is None or course['status'] != 'published':
+            return None
+        number = course['published_version__number']
+        if number is None:
+            # Cours publié avant le versionnage ou inséré en masse : compilé au premier accès
+            number = publish(course_id)[0].number
+        cache.set(_current_key(course_id), number, POINTER_TIMEOUT)
+    return number
+
+
+def document_body(course_id, number):
+    """Document JSON (octets) d'une version, None si elle n'existe pas"""
+    key = _document_key(course_id, number)
+    body = cache.get(key)
+    if body is None:
+        document = CourseVersion.objects.filter(course_id=course_id, number=number).values_list(
+            'document', flat=True
+        ).first()
+        if document is None:
+            return None
+        body = _encode(document)
+        cache.set(key, body, CACHE_TIMEOUT)
+    return body
+
+
+def version_lesson_ids(version_ids):
+    """{version_id: ensemble des leçons comptées} pour des versions (cache, puis une requête)"""
+    version_ids = set(version_ids)
+    cached = cache.get_many([_lessons_key(version_id) for version_id in version_ids])
+    result = {
+        version_id: set(cached[_lessons_key(version_id)])
+        for version_id in version_ids if _lessons_key(version_id) in cached
+    }
+    missing = version_ids - result.keys()
+    if missing:
+        rows = dict(CourseVersion.objects.filter(id__in=missing).values_list('id', 'lesson_ids'))
+        cache.set_many({_lessons_key(version_id): ids for version_id, ids in rows.items()}, CACHE_TIMEOUT)
+        result.update({version_id: set(ids) for version_id, ids in rows.items()})
+    return result
+
+
+def follow_published(enrollments):
+    """
+    Fait suivre à des inscriptions la version publiée de leur cours (appelé
+    quand l'étudiant termine une leçon) ; retourne les inscriptions déplacées,
+    que l'appelant enregistre avec le reste de l'écriture
+    """
+    published = dict(
+        Course.objects.filter(
+            pk__in={enrollment.course_id for enrollment in enrollments}, published_version__isnull=False
+        ).values_list('id', 'published_version_id')
+    )
+    moved = []
+    for enrollment in enrollments:
+        version_id = published.get(enrollment.course_id)
+        if version_id is not None and version_id != enrollment.course_version_id:
+            enrollment.course_version_id = version_id
+            moved.append(enrollment)
+    return moved
+
+
+def progress_counts(enrollment):
+    """(leçons terminées, leçons comptées) pour une inscription, selon la version suivie"""
+    lessons = Lesson.objects.filter(course_id=enrollment.course_id)
+    if enrollment.course_version_id is not None:
+        # Leçons de la version encore existantes : une leçon supprimée n'est plus comptée
+        lessons = lessons.filter(
+            id__in=version_lesson_ids([enrollment.course_version_id]).get(enrollment.course_version_id, set())
+        )
+    total = lessons.count()
+    if total == 0:
+        return 0, 0
+    completed = LessonProgress.objects.filter(user_id=enrollment.user_id, completed=True, lesson__in=lessons).count()
+    return completed, total
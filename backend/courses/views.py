@@ -1,18 +1,22 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import StreamingHttpResponse, FileResponse, HttpResponse, Http404
 from rest_framework.views import APIView
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
-from django.db.models import Count, Sum, Q, Avg, Prefetch
+from rest_framework.parsers import MultiPartParser
+from django.db.models import Count, Sum, Q, Avg, Prefetch, prefetch_related_objects
 from django.utils import timezone
 from django.db import transaction
 from .models import (
     Enrollment, Course, Category, Lesson, 
     Certificate, Skill, LessonProgress, 
     UserActivity, CourseSkill, Quiz, Question,
-    Answer, QuizAttempt, QuizAnswer, CourseSection,
-    CourseReview, CourseProgress, TimeSpent
+    QuizAttempt, QuizAnswer, CourseSection,
+    CourseReview, CourseProgress, TimeSpent,
+    CourseAnalytics, LessonAnalytics, QuizAnalytics,
+    LearningStreak
 )
 from .serializers import (
     CourseListSerializer, CourseDetailSerializer, 
@@ -22,12 +26,26 @@ from .serializers import (
     QuizAttemptSerializer, QuizSubmissionSerializer,
     CourseSectionSerializer, CourseReviewSerializer,
     LessonProgressSerializer, CourseSerializer,
-    CourseProgressSerializer, TimeSpentSerializer
+    CourseProgressSerializer, TimeSpentSerializer,
+    CourseAnalyticsSerializer, LessonAnalyticsSerializer,
+    QuizAnalyticsSerializer, ProgressSyncSerializer,
+    ReviewSessionSerializer
 )
+from .permissions import IsCourseInstructor, IsInstructor, is_course_instructor
+from .analytics import refresh_course
+from .progress import (
+    sync_position, pending_position, recompute_course_progress,
+    apply_progress_events
+)
+from .gradebook import Gradebook, iter_csv, write_parquet, FORMATS, PARQUET_AVAILABLE
+from . import bundles, content, events, gamification, item_analysis, media, quizzes, reviews, versions
+from .versions import follow_published, progress_counts
+from users.authentication import token_auth_time
 import string
 import random
 import uuid
 import logging
+import tempfile
 from datetime import timedelta, datetime
 
 logger = logging.getLogger(__name__)
@@ -48,6 +66,43 @@ class CourseViewSet(viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(category__slug=category)
         return queryset
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsCourseInstructor])
+    def publish(self, request, pk=None):
+        """Publie le cours, ou une nouvelle version de son contenu s'il a été modifié"""
+        course = self.get_object()
+        if course.status != 'published':
+            Course.objects.filter(pk=course.pk).update(status='published')
+        version, created = versions.publish(course.pk, request.user)
+        return Response(
+            {'version': version.number, 'created': created, 'lesson_count': len(version.lesson_ids)},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsCourseInstructor])
+    def export(self, request, pk=None):
+        """Archive complète du cours (voir courses.bundles)"""
+        course = self.get_object()
+        # Le répertoire central du zip est écrit en dernier : passage par un fichier temporaire
+        export_file = tempfile.TemporaryFile()
+        bundles.export_bundle([course.pk], export_file)
+        export_file.seek(0)
+        return FileResponse(export_file, as_attachment=True, filename=f"course-{course.slug or course.pk}.zip")
+    
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        permission_classes=[IsAuthenticated, IsInstructor], parser_classes=[MultiPartParser]
+    )
+    def import_bundle(self, request):
+        """Importe les cours d'une archive en brouillon ; l'utilisateur connecté en devient le propriétaire"""
+        upload = request.FILES.get('bundle')
+        if upload is None:
+            return Response({"detail": "Fichier 'bundle' manquant."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course_ids, counts = bundles.import_bundle(upload, request.user)
+        except bundles.BundleError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'courses': course_ids, 'counts': counts}, status=status.HTTP_201_CREATED)
 
 class CourseSectionViewSet(viewsets.ModelViewSet):
     queryset = CourseSection.objects.all()
@@ -258,13 +313,25 @@ class QuizDetailView(APIView):
         # Récupérer les dernières tentatives pour ce quiz
         latest_attempt = QuizAttempt.objects.filter(
             user=user, quiz=quiz
-        ).order_by('-created_at').first()
+        ).order_by('-created_at', '-id').first()
+        
+        # Mode banque : seules les questions tirées pour cette tentative sont servies
+        sample_token = None
+        if quiz.questions_per_attempt:
+            question_ids = quizzes.sample_questions(quiz)
+            prefetch_related_objects([quiz], Prefetch(
+                'questions', queryset=Question.objects.filter(id__in=question_ids).prefetch_related('answers')
+            ))
+            sample_token = quizzes.sample_token(
+                user.id, quiz.id, question_ids, latest_attempt.id if latest_attempt else 0
+            )
         
         # Sérialiser les données du quiz
         serializer = QuizSerializer(quiz)
         
         response_data = {
             **serializer.data,
+            'sample_token': sample_token,
             'latest_attempt': QuizAttemptSerializer(latest_attempt).data if latest_attempt else None
         }
         
@@ -281,7 +348,7 @@ class SubmitQuizView(APIView):
         lesson = get_object_or_404(Lesson, id=lesson_id)
         
         # Vérifier que l'utilisateur est inscrit au cours
-        get_object_or_404(Enrollment, user=user, course=lesson.course)
+        enrollment = get_object_or_404(Enrollment, user=user, course=lesson.course)
         
         # Récupérer le quiz associé à cette leçon
         quiz = get_object_or_404(Quiz, lesson=lesson)
@@ -293,23 +360,49 @@ class SubmitQuizView(APIView):
         
         submitted_answers = serializer.validated_data['answers']
         
+        # Mode banque : la tentative porte sur les questions du tirage servi
+        question_ids = None
+        if quiz.questions_per_attempt:
+            sample = quizzes.read_sample(serializer.validated_data.get('sample_token'), user.id, quiz.id)
+            if sample is None:
+                return Response(
+                    {"detail": "Tirage de questions invalide ou expiré : rechargez le quiz."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            previous_attempt_id, question_ids = sample
+        
         # Créer une nouvelle tentative
         with transaction.atomic():
-            # Calculer le score
+            if question_ids is not None:
+                # Un tirage ne sert qu'une fois : l'inscription verrouillée sérialise les soumissions
+                Enrollment.objects.select_for_update().filter(pk=enrollment.pk).first()
+                if quizzes.latest_attempt_id(user.id, quiz.id) != previous_attempt_id:
+                    return Response(
+                        {"detail": "Tirage de questions déjà utilisé : rechargez le quiz."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            
+            # Calculer le score (seules les questions de la tentative sont lues)
             questions = Question.objects.filter(quiz=quiz).prefetch_related('answers')
-            total_questions = questions.count()
+            if question_ids is not None:
+                questions = questions.filter(id__in=question_ids)
+            questions = list(questions)
+            total_questions = len(questions)
             correct_answers = 0
             
             # Préparer le feedback pour chaque question
             feedback = {}
+            mistakes = []
             
             # Créer la nouvelle tentative
             attempt = QuizAttempt.objects.create(
                 user=user,
                 quiz=quiz,
                 score=0,  # À mettre à jour
-                passed=False  # À mettre à jour
+                passed=False,  # À mettre à jour
+                question_ids=quizzes.pack_ids(question_ids) if question_ids is not None else None
             )
+            quiz_answers = []
             
             # Traiter chaque réponse
             for question in questions:
@@ -317,21 +410,25 @@ class SubmitQuizView(APIView):
                 if str(question.id) not in submitted_answers:
                     continue
                 
-                # Récupérer la réponse sélectionnée
+                # Récupérer la réponse sélectionnée (parmi les réponses préchargées)
                 answer_id = submitted_answers[str(question.id)]
-                answer = get_object_or_404(Answer, id=answer_id, question=question)
+                answer = next((answer for answer in question.answers.all() if answer.id == answer_id), None)
+                if answer is None:
+                    raise Http404("No Answer matches the given query.")
                 
                 # Créer l'entrée QuizAnswer
-                QuizAnswer.objects.create(
+                quiz_answers.append(QuizAnswer(
                     attempt=attempt,
                     question=question,
                     answer=answer,
                     is_correct=answer.is_correct
-                )
+                ))
                 
                 # Mettre à jour le score et le feedback
                 if answer.is_correct:
                     correct_answers += 1
+                else:
+                    mistakes.append(question.id)
                 
                 # Préparer le feedback pour cette question
                 feedback[question.id] = {
@@ -343,6 +440,12 @@ class SubmitQuizView(APIView):
             score = (correct_answers / total_questions * 100) if total_questions > 0 else 0
             passed = score >= quiz.pass_percentage
             
+            QuizAnswer.objects.bulk_create(quiz_answers)
+            item_analysis.record_attempt(quiz_answers)
+            
+            # Questions ratées : ajoutées à la file de révision
+            reviews.schedule_mistakes(user, mistakes)
+            
             # Mettre à jour la tentative
             attempt.score = score
             attempt.passed = passed
@@ -359,14 +462,25 @@ class SubmitQuizView(APIView):
             )
             
             # Si le quiz est réussi, marquer la leçon comme complète
+            newly_completed = False
             if passed:
                 lesson_progress, created = LessonProgress.objects.get_or_create(
                     user=user,
                     lesson=lesson
                 )
+                newly_completed = not lesson_progress.completed
+                if newly_completed:
+                    # Comme CompleteLesson : progression rattachée à la version publiée du cours
+                    follow_published([enrollment])
+                    lesson_progress.course_version_id = enrollment.course_version_id
                 lesson_progress.completed = True
                 lesson_progress.completed_at = timezone.now()
                 lesson_progress.save()
+                if newly_completed:
+                    recompute_course_progress(enrollment)
+            
+            # Série du jour et classements (après validation)
+            gamification.record_progress(user.id, lesson.course, completions=int(newly_completed))
         
         # Réponse finale
         response_data = {
@@ -384,35 +498,21 @@ class LessonDetailView(APIView):
     def get(self, request, lesson_id):
         user = request.user
         
-        # Récupérer la leçon
-        lesson = get_object_or_404(Lesson, id=lesson_id)
-        
-        # Vérifier si l'utilisateur est inscrit au cours
-        enrollment = get_object_or_404(Enrollment, user=user, course=lesson.course)
-        
-        # Récupérer ou créer l'objet de progression
-        lesson_progress, created = LessonProgress.objects.get_or_create(
-            user=user, 
-            lesson=lesson
+        # Vérifier l'accès et charger la leçon en une requête. Comme pour l'URL de contenu,
+        # les leçons gratuites et les instructeurs du cours passent sans inscription.
+        lesson = content.authorize(
+            user, lesson_id, fields=('description', 'video_url', 'duration', 'order', 'attachment')
         )
+        if not lesson:
+            return Response({"detail": "Leçon introuvable."}, status=status.HTTP_404_NOT_FOUND)
         
-        # Mettre à jour la date de dernier accès
-        lesson_progress.save()  # auto_now met automatiquement à jour last_accessed
-        
-        # Enregistrer l'activité si c'est la première consultation
-        if created:
-            UserActivity.objects.create(
-                user=user,
-                activity_type='lesson_started',
-                description=f"A commencé la leçon '{lesson.title}'",
-                related_course=lesson.course,
-                related_lesson=lesson
-            )
+        # Le suivi (progression, activité de première consultation) des inscrits est enregistré en arrière-plan
+        content.track_access(user, lesson)
         
-        # Sérialiser la leçon avec son contexte
+        # Sérialiser la leçon avec son contexte (l'accès est vérifié : URL signée de la pièce jointe)
         serializer = LessonSerializer(
             lesson,
-            context={'request': request}
+            context={'request': request, 'sign_attachment': True}
         )
         
         return Response(serializer.data)
@@ -437,23 +537,31 @@ class CompleteLesson(APIView):
         # Vérifier si l'utilisateur est inscrit au cours
         enrollment = get_object_or_404(Enrollment, user=user, course=lesson.course)
         
+        # Terminer une leçon fait passer l'inscription à la version publiée du cours
+        follow_published([enrollment])
+        
         # Récupérer ou créer l'objet de progression
         progress, created = LessonProgress.objects.get_or_create(
             user=user, 
             lesson=lesson,
             defaults={
                 'completed': True,
-                'completed_at': timezone.now()
+                'completed_at': timezone.now(),
+                'course_version_id': enrollment.course_version_id
             }
         )
         
         # Si la progression existe déjà mais n'était pas complétée
+        newly_completed = created
         if not created and not progress.completed:
+            newly_completed = True
             progress.completed = True
             progress.completed_at = timezone.now()
+            progress.course_version_id = enrollment.course_version_id
             progress.save()
-            
-            # Enregistrer l'activité
+        
+        if newly_completed:
+            # Enregistrer l'activité (première complétion comprise : le flux d'événements la diffuse)
             UserActivity.objects.create(
                 user=user,
                 activity_type='lesson_completed',
@@ -462,16 +570,10 @@ class CompleteLesson(APIView):
                 related_lesson=lesson
             )
         
-        # Mettre à jour la progression globale du cours
+        # Mettre à jour la progression globale du cours (leçons de la version suivie)
         course = lesson.course
-        total_lessons = course.lessons.count()
+        completed_lessons, total_lessons = progress_counts(enrollment)
         if total_lessons > 0:
-            completed_lessons = LessonProgress.objects.filter(
-                user=user, 
-                lesson__course=course,
-                completed=True
-            ).count()
-            
             progress_percentage = (completed_lessons / total_lessons) * 100
             
             enrollment.progress = progress_percentage
@@ -511,6 +613,9 @@ class CompleteLesson(APIView):
             
             enrollment.save()
         
+        # Série du jour et classements
+        gamification.record_progress(user.id, course, completions=int(newly_completed))
+        
         # Retourner la progression mise à jour
         return Response({
             "success": True,
@@ -527,7 +632,7 @@ class CourseProgressView(APIView):
         course = get_object_or_404(Course, id=course_id)
         
         # Vérifier si l'utilisateur est inscrit au cours
-        enrollment = get_object_or_404(Enrollment, user=user, course=course)
+        enrollment = get_object_or_404(Enrollment, user_id=user.id, course=course)
         
         # Récupérer les leçons du cours avec leur progression
         sections = CourseSection.objects.filter(course=course).prefetch_related('lessons')
@@ -538,7 +643,7 @@ class CourseProgressView(APIView):
             lessons_data = []
             for lesson in section.lessons.all():
                 try:
-                    progress = LessonProgress.objects.get(user=user, lesson=lesson)
+                    progress = LessonProgress.objects.get(user_id=user.id, lesson=lesson)
                     lesson_progress = {
                         'completed': progress.completed,
                         'last_position': progress.last_position,
@@ -600,6 +705,11 @@ class LessonProgressView(APIView):
             lesson=lesson
         )
         
+        # Position reçue par la synchronisation mais pas encore écrite en base
+        position = pending_position(user.id, lesson.id)
+        if position is not None:
+            progress.last_position = position
+        
         serializer = LessonProgressSerializer(progress)
         return Response(serializer.data)
     
@@ -618,8 +728,13 @@ class LessonProgressView(APIView):
         
         # Mettre à jour les champs
         data = request.data
+        was_completed = progress.completed
         if 'completed' in data:
             progress.completed = data['completed']
+            if progress.completed and not was_completed:
+                # Comme CompleteLesson : progression rattachée à la version publiée du cours
+                follow_published([enrollment])
+                progress.course_version_id = enrollment.course_version_id
             if data['completed'] and not progress.completed_at:
                 progress.completed_at = timezone.now()
                 
@@ -634,32 +749,82 @@ class LessonProgressView(APIView):
                 
         if 'last_position' in data:
             progress.last_position = data['last_position']
+            progress.position_updated_at = timezone.now()
             
+        time_increment = 0
         if 'time_spent' in data:
-            progress.time_spent = data['time_spent']
+            try:
+                time_spent = int(data['time_spent'])
+            except (TypeError, ValueError):
+                return Response(
+                    {"detail": "time_spent doit être un entier."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Comme TrackLessonTime : le temps ne diminue pas et progresse d'au plus MAX_TIME_INCREMENT
+            time_increment = min(max(time_spent - progress.time_spent, 0), gamification.MAX_TIME_INCREMENT)
+            progress.time_spent += time_increment
             
         if 'notes' in data:
             progress.notes = data['notes']
         
         progress.save()
         
-        # Mettre à jour la progression du cours
-        course = lesson.course
-        total_lessons = Lesson.objects.filter(section__course=course).count()
-        completed_lessons = LessonProgress.objects.filter(
-            user=user,
-            lesson__section__course=course,
-            completed=True
-        ).count()
+        # Mettre à jour la progression du cours seulement si l'état de complétion a changé
+        if progress.completed != was_completed:
+            recompute_course_progress(enrollment)
         
-        if total_lessons > 0:
-            progress_percentage = (completed_lessons / total_lessons) * 100
-            enrollment.progress = progress_percentage
-            enrollment.save()
+        # Série du jour et classements
+        gamification.record_progress(
+            user.id, lesson.course,
+            completions=int(progress.completed and not was_completed), time_spent=time_increment
+        )
         
         serializer = LessonProgressSerializer(progress)
         return Response(serializer.data)
 
+class LessonPositionSyncView(APIView):
+    """Vue légère pour synchroniser la position de lecture d'une leçon"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, lesson_id):
+        try:
+            position = int(request.data.get('last_position'))
+        except (TypeError, ValueError):
+            position = -1
+        if position < 0:
+            return Response(
+                {"detail": "last_position doit être un entier positif."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # flush=true force l'écriture immédiate (pause, fermeture du lecteur)
+        flush = str(request.data.get('flush', '')).lower() in ('1', 'true')
+        saved, coalesced = sync_position(request.user, lesson_id, position, flush=flush)
+        
+        return Response({
+            "lesson_id": lesson_id,
+            "last_position": position,
+            "saved": saved,
+            "coalesced": coalesced
+        })
+
+class ProgressSyncView(APIView):
+    """Vue pour appliquer en une fois les événements de progression d'un client hors ligne"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = ProgressSyncSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, courses = apply_progress_events(
+            request.user, serializer.validated_data['events']
+        )
+        return Response({
+            "results": results,
+            "courses": courses
+        })
+
 class TrackLessonTimeView(APIView):
     """Vue pour suivre le temps passé sur une leçon"""
     permission_classes = [IsAuthenticated]
@@ -667,12 +832,17 @@ class TrackLessonTimeView(APIView):
     def post(self, request):
         user = request.user
         lesson_id = request.data.get('lesson_id')
-        time_increment = request.data.get('time_increment', 0)  # Temps en secondes
+        try:
+            time_increment = int(request.data.get('time_increment', 0))  # Temps en secondes
+        except (TypeError, ValueError):
+            time_increment = 0
         
-        if not lesson_id or not time_increment:
+        if not lesson_id or time_increment <= 0:
             return Response({
-                "detail": "lesson_id et time_increment sont requis."
+                "detail": "lesson_id et time_increment (entier positif) sont requis."
             }, status=status.HTTP_400_BAD_REQUEST)
+        # Un seul envoi ne peut pas gonfler le temps passé (et les classements) sans limite
+        time_increment = min(time_increment, gamification.MAX_TIME_INCREMENT)
         
         # Récupérer la leçon
         lesson = get_object_or_404(Lesson, id=lesson_id)
@@ -687,13 +857,16 @@ class TrackLessonTimeView(APIView):
         )
         
         # Incrémenter le temps passé
-        progress.time_spent += int(time_increment)
+        progress.time_spent += time_increment
         progress.save()
         
         # Mettre à jour l'activité du cours
         enrollment.last_activity = timezone.now()
         enrollment.save()
         
+        # Série du jour et classements
+        gamification.record_progress(user.id, lesson.course, time_spent=time_increment)
+        
         return Response({
             "success": True,
             "time_spent": progress.time_spent
@@ -795,4 +968,266 @@ class EnrollInCourseView(APIView):
         serializer = EnrollmentSerializer(enrollment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+class GradebookExportView(APIView):
+    """Vue pour exporter le carnet de notes d'un cours (réservée aux instructeurs)"""
+    permission_classes = [IsAuthenticated, IsCourseInstructor]
+    
+    def get(self, request, course_id):
+        course = get_object_or_404(Course, id=course_id)
+        self.check_object_permissions(request, course)
+        
+        # "format" est réservé par DRF pour la négociation de contenu
+        output = request.query_params.get('output', 'csv')
+        if output not in FORMATS:
+            return Response(
+                {"detail": f"Format inconnu, formats disponibles : {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        book = Gradebook(course)
+        filename = f"gradebook-{course.slug or course.id}.{output}"
+        
+        if output == 'csv':
+            # Les lignes sont envoyées au fur et à mesure de la lecture des curseurs
+            response = StreamingHttpResponse(iter_csv(book), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        
+        if not PARQUET_AVAILABLE:
+            return Response(
+                {"detail": "L'export Parquet n'est pas disponible sur ce serveur."},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        # Parquet écrit son pied de fichier en dernier : passage par un fichier temporaire
+        export_file = tempfile.TemporaryFile()
+        write_parquet(book, export_file)
+        export_file.seek(0)
+        return FileResponse(export_file, as_attachment=True, filename=filename)
+
+class CourseAnalyticsView(APIView):
+    """Vue pour les statistiques d'un cours, lues depuis les agrégats matérialisés"""
+    permission_classes = [IsAuthenticated, IsCourseInstructor]
+    
+    def get(self, request, course_id):
+        course = get_object_or_404(Course, id=course_id)
+        self.check_object_permissions(request, course)
+        
+        # Les agrégats sont tenus à jour par refresh_analytics ; calcul unique au premier accès
+        analytics = CourseAnalytics.objects.filter(course=course).select_related('course').first()
+        if analytics is None:
+            refresh_course(course)
+            analytics = CourseAnalytics.objects.select_related('course').get(course=course)
+        
+        lessons = LessonAnalytics.objects.filter(course=course).select_related('lesson')
+        quizzes = QuizAnalytics.objects.filter(course=course).select_related('quiz').order_by('quiz__lesson_id')
+        
+        return Response({
+            **CourseAnalyticsSerializer(analytics).data,
+            'lessons': LessonAnalyticsSerializer(lessons, many=True).data,
+            'quizzes': QuizAnalyticsSerializer(quizzes, many=True).data,
+        })
+
+class ItemStatisticsView(APIView):
+    """Vue pour les statistiques d'item des questions de quiz d'un cours (JSON ou CSV)"""
+    permission_classes = [IsAuthenticated, IsCourseInstructor]
+    
+    def get(self, request, course_id):
+        course = get_object_or_404(Course, id=course_id)
+        self.check_object_permissions(request, course)
+        
+        report = item_analysis.ItemReport(course)
+        # "format" est réservé par DRF pour la négociation de contenu
+        output = request.query_params.get('output', 'json')
+        if output == 'json':
+            return Response(report.data())
+        if output != 'csv':
+            return Response(
+                {"detail": "Format inconnu, formats disponibles : json, csv."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response = StreamingHttpResponse(iter_csv(report), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="item-statistics-{course.slug or course.id}.csv"'
+        return response
+
+class InstructorAnalyticsView(APIView):
+    """Vue pour l'entonnoir de tous les cours créés ou enseignés par l'utilisateur"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        analytics = CourseAnalytics.objects.filter(
+            Q(course__created_by=user) | Q(course__instructors=user)
+        ).select_related('course').distinct().order_by('course__title')
+        
+        return Response({
+            'courses': CourseAnalyticsSerializer(analytics, many=True).data
+        })
+
+class LessonAttachmentView(APIView):
+    """Vue pour obtenir une URL signée et temporaire de la pièce jointe d'une leçon"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, lesson_id):
+        lesson = get_object_or_404(Lesson.objects.select_related('course'), id=lesson_id)
+        if not lesson.attachment:
+            return Response({"detail": "Cette leçon n'a pas de pièce jointe."}, status=status.HTTP_404_NOT_FOUND)
+        
+        # L'accès est vérifié ici une fois pour toutes : la lecture ne vérifie que la signature
+        enrolled = Enrollment.objects.filter(user=request.user, course_id=lesson.course_id).exists()
+        if not enrolled and not is_course_instructor(request.user, lesson.course):
+            return Response({"detail": "Vous n'êtes pas inscrit à ce cours."}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            "url": media.attachment_url(request, lesson, request.user),
+            "expires_in": media.URL_TTL
+        })
+
+class LessonMediaView(APIView):
+    """Vue de diffusion d'une pièce jointe par URL signée (requêtes Range prises en charge)"""
+    authentication_classes = []  # Le jeton signé tient lieu d'authentification
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, token, filename):
+        name = media.read_token(token)
+        return media.serve_file(request, Lesson._meta.get_field('attachment').storage, name)
+
+class LessonAccessView(APIView):
+    """Vue d'autorisation : émet l'URL signée et partageable du contenu d'une leçon"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, lesson_id):
+        lesson = content.authorize(request.user, lesson_id)
+        if lesson is None:
+            return Response({"detail": "Leçon introuvable."}, status=status.HTTP_404_NOT_FOUND)
+        if lesson is False:
+            return Response({"detail": "Vous n'êtes pas inscrit à ce cours."}, status=status.HTTP_403_FORBIDDEN)
+        
+        content.track_access(request.user, lesson)
+        url, expires = content.content_url(request, lesson)
+        return Response({
+            "lesson_id": lesson.id,
+            "version": lesson.content_version,
+            "content_url": url,
+            "expires_at": expires
+        })
+
+class LessonContentView(APIView):
+    """Vue de contenu d'une leçon, indépendante de l'utilisateur et mise en cache (CDN, cache partagé)"""
+    authentication_classes = []  # Le jeton signé tient lieu d'autorisation
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, token):
+        payload = content.read_token(token)
+        if payload is None:
+            return Response({"detail": "Lien invalide ou expiré."}, status=status.HTTP_404_NOT_FOUND)
+        lesson_id, version, expires = payload
+        
+        etag = f'"{version}"'
+        max_age = max(0, int(expires - timezone.now().timestamp()))
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            body = content.rendered_content(lesson_id, version)
+            if body is None:
+                # Le contenu a changé depuis l'émission du lien : le client doit en redemander un
+                return Response({"detail": "Contenu modifié, lien périmé."}, status=status.HTTP_410_GONE)
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = f'public, max-age={max_age}'
+        return response
+
+class EventTicketView(APIView):
+    """Vue pour obtenir l'URL signée du flux d'événements (EventSource)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        response = Response({
+            'url': events.stream_ticket(request, request.user, token_auth_time(request.auth)),
+            'expires_in': events.TICKET_TTL
+        })
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+class CourseVersionView(APIView):
+    """Vue pour lire le document compilé d'une version publiée d'un cours"""
+    authentication_classes = []  # Contenu public du catalogue : aucune requête par utilisateur
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, course_id, number=None):
+        # Seuls les cours publiés et actifs sont lisibles, y compris leurs anciennes versions
+        current = versions.current_number(course_id)
+        if number is None:
+            # Version actuelle : le pointeur change à chaque publication
+            number = current
+            cache_control = 'public, max-age=60'
+        else:
+            cache_control = 'public, max-age=31536000, immutable'
+        body = versions.document_body(course_id, number) if current is not None else None
+        if body is None:
+            return Response({"detail": "Aucune version publiée."}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{course_id}-{number}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+class LearningStreakView(APIView):
+    """Vue pour afficher la série de jours d'apprentissage de l'utilisateur connecté"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        streak = LearningStreak.objects.filter(user=request.user).first()
+        return Response(gamification.streak_status(streak))
+
+class LeaderboardView(APIView):
+    """Vue pour afficher le classement d'un cours ou d'une catégorie"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, scope, scope_id):
+        metric = request.query_params.get('metric', 'completions')
+        if scope not in gamification.SCOPES or metric not in gamification.METRICS:
+            return Response(
+                {"detail": "Classement inconnu (scope : course ou category, metric : completions ou time_spent)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        model = Course if scope == 'course' else Category
+        get_object_or_404(model, id=scope_id)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            limit = 10
+        return Response(gamification.leaderboard_data(scope, scope_id, metric, limit, request.user))
+
+class ReviewQueueView(APIView):
+    """Vue pour obtenir les questions à revoir aujourd'hui (répétition espacée)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', reviews.DEFAULT_BATCH_SIZE)), 1), reviews.MAX_BATCH_SIZE)
+        except ValueError:
+            limit = reviews.DEFAULT_BATCH_SIZE
+        items, due_count = reviews.due_items(request.user, limit)
+        return Response({
+            "due_count": due_count,
+            "items": items
+        })
+
+class ReviewSubmitView(APIView):
+    """Vue pour enregistrer une séance de révision et replanifier les questions"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ReviewSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = reviews.submit_reviews(request.user, serializer.validated_data['reviews'])
+        return Response({"results": results})
+
 # ... other existing classes if any ...
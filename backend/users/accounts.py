@@ -0,0 +1,78 @@
+"""
+Bulk account provisioning for a whole intake year.
+
+Rows are consumed in batches: per batch, one query finds the usernames and
+emails that already exist, then the new users and their profile and settings
+rows are inserted with bulk_create in a single transaction. The password is
+hashed once per run, not once per account.
+"""
+import csv
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .backends import normalize_email
+from .models import create_settings_rows
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_accounts(lines):
+    """Parse username,email[,first_name,last_name] CSV lines (a header row is skipped)"""
+    for row in csv.reader(lines):
+        if len(row) < 2 or '@' not in row[1]:
+            continue
+        username, email, *names = [value.strip() for value in row]
+        yield {
+            'username': username,
+            'email': normalize_email(email),
+            'first_name': names[0] if names else username,
+            'last_name': names[1] if len(names) > 1 else '',
+        }
+
+
+def provision_batch(accounts, password_hash):
+    """Create the accounts of one batch that don't exist yet, return how many were created"""
+    existing = User.objects.annotate(email_key=Lower('email')).filter(
+        Q(username__in=[account['username'] for account in accounts])
+        | Q(email_key__in=[account['email'] for account in accounts])
+    ).values_list('username', 'email_key')
+    taken = {value for row in existing for value in row}
+
+    new_users = []
+    for account in accounts:
+        if account['username'] in taken or account['email'] in taken:
+            continue
+        # Duplicates within the file are skipped too
+        taken.update((account['username'], account['email']))
+        new_users.append(User(password=password_hash, **account))
+    if not new_users:
+        return 0
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(new_users)
+        create_settings_rows(users)
+    return len(users)
+
+
+def provision_accounts(accounts, password=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Provision a stream of account dicts. Without a password the accounts get an
+    unusable password and are activated through a password reset.
+    """
+    password_hash = make_password(password)
+    stats = Counter()
+    accounts = iter(accounts)
+    while True:
+        batch = list(islice(accounts, batch_size))
+        if not batch:
+            return stats
+        created = provision_batch(batch, password_hash)
+        stats['rows'] += len(batch)
+        stats['created'] += created
+        stats['skipped'] += len(batch) - created
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.models import User
 
 # Register your models here.
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    # Prefix search on the case-insensitive username index (migration 0009,
+    # built per database vendor); it also backs the user autocomplete widgets
+    # of the courses admin (a substring search over four columns would scan
+    # the whole table on every keystroke)
+    search_fields = ('^username',)
@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import cache_is_shared, user_cache_key, USER_CACHE_TIMEOUT
+
+# Login time, copied into every token derived from the login (rotation keeps it)
+AUTH_TIME_CLAIM = 'auth_time'
+
+
+def token_auth_time(payload):
+    """Login time of a token payload; tokens issued before the claim existed fall back to iat"""
+    return payload.get(AUTH_TIME_CLAIM, payload.get('iat', 0))
+
+
+def check_password_unchanged(password_changed_at, auth_time):
+    """Reject a token whose login predates the user's last password change"""
+    if password_changed_at is not None and auth_time < password_changed_at.timestamp():
+        raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users from a short-lived cache entry
+    keyed by user ID, loaded together with the profile and preferences.
+
+    The token carries its login time (AUTH_TIME_CLAIM), which is checked
+    against the cached Profile.password_changed_at: tokens issued before a
+    password change stop working even while the entry is still cached. A
+    rehash at login (users.hashers) does not touch password_changed_at, so it
+    does not log the user out of other devices. User, Profile and
+    UserPreference saves and deletes drop the entry once their transaction
+    commits (see users.models).
+
+    Entries are only cached when the cache is shared by all workers: with a
+    per-process cache, a save in one worker could not drop the copies held by
+    the others, and the user is loaded with a single query instead.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        shared = cache_is_shared()
+        key = user_cache_key(user_id)
+        user = cache.get(key) if shared else None
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related('profile', 'preferences').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if shared:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        Async variant for plain Django async views (DRF views are sync-only):
+        returns the user or None, and raises like authenticate().
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        return self.check_user(await self.aget_user(user_id), validated_token)
+
+    async def aget_user(self, user_id):
+        """The user (cached like get_user), before the active and password checks of check_user"""
+        shared = cache_is_shared()
+        key = user_cache_key(user_id)
+        user = await cache.aget(key) if shared else None
+        if user is None:
+            try:
+                user = await self.user_model.objects.select_related('profile', 'preferences').aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if shared:
+                await cache.aset(key, user, USER_CACHE_TIMEOUT)
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        profile = getattr(user, 'profile', None)
+        check_password_unchanged(
+            profile.password_changed_at if profile is not None else None, token_auth_time(validated_token)
+        )
+        return user
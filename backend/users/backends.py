@@ -1,22 +1,48 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
-class EmailBackend(ModelBackend):
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Authenticates with either the username or the email address in a single
+    query. Emails are matched on LOWER(email), which is indexed (see
+    users/migrations/0005_auth_user_email_lower_index.py).
+
+    Unknown identifiers and ambiguous emails (shared by several accounts)
+    still run the password hasher once, so misses take as long as hits.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Try to find a user matching the email
-            user = User.objects.get(Q(email=username))
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
             return None
+
+        candidates = list(
+            User.objects.annotate(email_key=Lower('email')).filter(
+                Q(username=username) | Q(email_key=normalize_email(username))
+            )[:3]
+        )
+        user = next((c for c in candidates if c.username == username), None)
+        if user is None and len(candidates) == 1:
+            user = candidates[0]
+
+        if user is None:
+            # Run the default password hasher to even out response times
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
         return None
 
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None 
\ No newline at end of file
+
+# Kept for sessions created with the previous backend path
+EmailBackend = UsernameOrEmailBackend
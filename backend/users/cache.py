@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Durée de vie des utilisateurs mis en cache par CachedJWTAuthentication
+USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def cache_is_shared():
+    """Vrai si le cache par défaut est commun à tous les processus (pas la mémoire locale)"""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+)
+
+# Cost parameters come from settings.PASSWORD_HASHING_PARAMS. The algorithm
+# names are unchanged, so existing hashes keep verifying; when a parameter
+# changes, must_update() makes Django rehash the password at the next login.
+PARAMS = getattr(settings, 'PASSWORD_HASHING_PARAMS', {})
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = PARAMS.get('pbkdf2_iterations', PBKDF2PasswordHasher.iterations)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = PARAMS.get('scrypt_work_factor', ScryptPasswordHasher.work_factor)
+    block_size = PARAMS.get('scrypt_block_size', ScryptPasswordHasher.block_size)
+    parallelism = PARAMS.get('scrypt_parallelism', ScryptPasswordHasher.parallelism)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Requires the argon2-cffi package."""
+    time_cost = PARAMS.get('argon2_time_cost', Argon2PasswordHasher.time_cost)
+    memory_cost = PARAMS.get('argon2_memory_cost', Argon2PasswordHasher.memory_cost)
+    parallelism = PARAMS.get('argon2_parallelism', Argon2PasswordHasher.parallelism)
+
+
+PROFILES = {
+    'pbkdf2': TunedPBKDF2PasswordHasher,
+    'scrypt': TunedScryptPasswordHasher,
+    'argon2': TunedArgon2PasswordHasher,
+}
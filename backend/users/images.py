@@ -0,0 +1,200 @@
+"""
+Renditions of uploaded pictures (profile pictures, course images).
+
+Uploads are validated synchronously. Once the transaction commits, they are
+resized in a background thread pool into WebP and JPEG renditions, whose
+storage names are recorded in a JSONField next to the image field. Replaced
+files and their renditions are deleted in the same pool, so requests never
+wait on image work or file deletion.
+"""
+import io
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .storage import is_referenced
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_SIZE = getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', 15 * 1024 * 1024)
+MAX_PIXELS = getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 50_000_000)
+WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+QUALITY = getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+OUTPUT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+# (name, width, height, crop): cropped renditions are cut to the exact ratio,
+# the others fit inside the box. Images are never upscaled.
+RENDITIONS = {
+    'avatar': [('sm', 48, 48, True), ('md', 96, 96, True), ('lg', 256, 256, True)],
+    'card': [('sm', 320, 180, True), ('md', 640, 360, True), ('lg', 1280, 720, True)],
+    'cover': [('md', 960, 960, False), ('lg', 1920, 1920, False)],
+}
+
+
+def validate_image_upload(file):
+    """Rejects oversized files, decompression bombs and formats other than JPEG/PNG/WebP"""
+    if getattr(file, '_committed', False):
+        return  # Already stored: validated when it was uploaded
+    if file.size > MAX_UPLOAD_SIZE:
+        raise ValidationError(f"Image too large (maximum {MAX_UPLOAD_SIZE // (1024 * 1024)} MB).")
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            if image.format not in ALLOWED_FORMATS:
+                raise ValidationError("Unsupported image format (use JPEG, PNG or WebP).")
+            if image.width * image.height > MAX_PIXELS:
+                raise ValidationError("Image dimensions are too large.")
+            image.verify()
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError("Upload a valid image.")
+    finally:
+        file.seek(position)
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or None
+
+
+def rendition_names(renditions):
+    return [entry[ext] for entry in (renditions or {}).values() for ext, _ in OUTPUT_FORMATS if ext in entry]
+
+
+def _resize(image, width, height, crop):
+    if crop:
+        scale = min(1, image.width / width, image.height / height)
+        return ImageOps.fit(image, (max(1, round(width * scale)), max(1, round(height * scale))))
+    resized = image.copy()
+    resized.thumbnail((width, height))
+    return resized
+
+
+def render(storage, name, kind):
+    """Writes the renditions of a stored image, returns {rendition: {format: name, width, height}}"""
+    base = os.path.splitext(name)[0]
+    largest = max(max(width, height) for _, width, height, _ in RENDITIONS[kind])
+    renditions = {}
+    with storage.open(name) as handle, Image.open(handle) as image:
+        # JPEG decoding can skip straight to a reduced scale
+        image.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for rendition, width, height, crop in RENDITIONS[kind]:
+            resized = _resize(image, width, height, crop)
+            entry = {'width': resized.width, 'height': resized.height}
+            for ext, image_format in OUTPUT_FORMATS:
+                output = resized.convert('RGB') if image_format == 'JPEG' else resized
+                buffer = io.BytesIO()
+                output.save(buffer, image_format, quality=QUALITY)
+                entry[ext] = storage.save(f"renditions/{base}/{rendition}.{ext}", ContentFile(buffer.getvalue()))
+            renditions[rendition] = entry
+    return renditions
+
+
+def process_image(model_label, pk, field_name):
+    """Renders the current file of an image field and records its renditions"""
+    started = time.time()
+    model = apps.get_model(model_label)
+    renditions_field, kind = model.RENDITION_FIELDS[field_name]
+    row = model.objects.filter(pk=pk).values(field_name, renditions_field).first()
+    if row is None or not row[field_name]:
+        return
+    name = row[field_name]
+    storage = model._meta.get_field(field_name).storage
+    renditions = render(storage, name, kind)
+
+    # The file may have been replaced while rendering: only record renditions of the current one
+    updated = model.objects.filter(pk=pk, **{field_name: name}).update(**{renditions_field: renditions})
+    current, previous = set(rendition_names(renditions)), set(rendition_names(row[renditions_field]))
+    if not updated:
+        current, previous = previous, current
+    # Identical uploads share their (content-addressed) files with other rows
+    storage.discard(previous - current, lambda: is_referenced(model, field_name, name, exclude_pk=pk), started)
+
+
+def delete_unreferenced(model_label, field_name, names, since):
+    """Deletes a replaced file and its renditions unless another row still uses the file"""
+    model = apps.get_model(model_label)
+    model._meta.get_field(field_name).storage.discard(
+        names, lambda: is_referenced(model, field_name, names[0]), since
+    )
+
+
+_executor = None
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Image job %s failed", func.__name__)
+    finally:
+        connection.close()
+
+
+def submit(func, *args):
+    """Runs func in the image worker pool once the current transaction commits"""
+    def start():
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='images')
+        _executor.submit(_run, func, *args)
+    transaction.on_commit(start)
+
+
+class RenditionsMixin:
+    """
+    Model mixin for image fields with renditions. RENDITION_FIELDS maps each
+    image field to (renditions JSONField, rendition kind). When an image
+    changes, its renditions are reset, the new file is rendered in the
+    background and the previous file and renditions are deleted.
+    """
+    RENDITION_FIELDS = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_images = {
+            field_name: _file_name(instance.__dict__[field_name])
+            for field_name in cls.RENDITION_FIELDS if field_name in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        stored = getattr(self, '_stored_images', {})
+        update_fields = kwargs.get('update_fields')
+        changed = []
+        for field_name, (renditions_field, kind) in self.RENDITION_FIELDS.items():
+            if field_name not in self.__dict__ or (update_fields is not None and field_name not in update_fields):
+                continue
+            old_name = stored.get(field_name)
+            if _file_name(self.__dict__[field_name]) == old_name:
+                continue
+            changed.append((field_name, old_name, getattr(self, renditions_field)))
+            setattr(self, renditions_field, {})
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = [*update_fields, renditions_field]
+
+        replaced_at = time.time()
+        super().save(*args, **kwargs)
+
+        for field_name, old_name, old_renditions in changed:
+            if old_name:
+                submit(
+                    delete_unreferenced, self._meta.label, field_name,
+                    [old_name, *rendition_names(old_renditions)], replaced_at
+                )
+            new_name = _file_name(self.__dict__[field_name])
+            if new_name:
+                submit(process_image, self._meta.label, self.pk, field_name)
+            stored[field_name] = new_name
+        self._stored_images = stored
@@ -0,0 +1,60 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import CachedJWTAuthentication
+from users.cache import user_cache_key
+
+
+class Command(BaseCommand):
+    help = 'Measures JWT authentication overhead per request (default vs cached)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='User to authenticate (defaults to the first active user)')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of authenticated requests per scenario')
+
+    def run(self, authenticator, view, token, count):
+        factory = APIRequestFactory()
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                request = Request(
+                    factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'),
+                    parser_context={'view': view},
+                )
+                started = time.perf_counter()
+                user, _ = authenticator().authenticate(request)
+                # Views usually touch the profile right after authentication
+                getattr(user, 'profile', None)
+                samples.append((time.perf_counter() - started) * 1_000_000)
+        samples.sort()
+        return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], len(queries) / count
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError("No active user found")
+
+        token = str(AccessToken.for_user(user))
+        count = options['requests']
+        cache.delete(user_cache_key(user.pk))
+
+        scenarios = [
+            ('JWTAuthentication', JWTAuthentication, None),
+            ('CachedJWTAuthentication', CachedJWTAuthentication, None),
+        ]
+        for label, authenticator, view in scenarios:
+            median, p99, queries = self.run(authenticator, view, token, count)
+            self.stdout.write(
+                f"{label:<25} median {median:8.1f} µs   p99 {p99:8.1f} µs   {queries:.2f} queries/request"
+            )
@@ -0,0 +1,80 @@
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users.hashers import PROFILES
+
+BENCHMARK_USERNAME = 'benchmark-hashing'
+BENCHMARK_PASSWORD = 'Benchmark-Hashing-2025'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Measures password verification and login latency (p50/p99) under concurrent load for each hashing profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50, help='Number of verifications per profile')
+        parser.add_argument(
+            '--concurrency', type=int, default=os.cpu_count() or 1,
+            help='Number of concurrent workers (defaults to the number of cores)'
+        )
+
+    def run(self, func, count, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            func()
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(count)))
+        elapsed = time.perf_counter() - started
+        return statistics.median(samples), percentile(samples, 0.99), count / elapsed
+
+    def report(self, label, result):
+        median, p99, throughput = result
+        self.stdout.write(f"{label:<28} p50 {median:8.2f} ms   p99 {p99:8.2f} ms   {throughput:7.1f} /s")
+
+    def handle(self, *args, **options):
+        count = options['logins']
+        concurrency = options['concurrency']
+        self.stdout.write(
+            f"{concurrency} concurrent workers, {count} verifications per profile "
+            f"(active profile: {settings.PASSWORD_HASHING_PROFILE})"
+        )
+
+        for profile, hasher_class in PROFILES.items():
+            hasher = hasher_class()
+            try:
+                encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+            except ValueError as exc:  # argon2-cffi not installed
+                self.stdout.write(f"{profile:<28} skipped: {exc}")
+                continue
+            self.report(profile, self.run(lambda: hasher.verify(BENCHMARK_PASSWORD, encoded), count, concurrency))
+
+        # End-to-end login through the authentication backend with the active profile
+        user, created = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'email': f'{BENCHMARK_USERNAME}@etu.univh2c.ma'}
+        )
+        if created or not user.check_password(BENCHMARK_PASSWORD):
+            user.set_password(BENCHMARK_PASSWORD)
+            user.save(update_fields=['password'])
+
+        def login():
+            try:
+                authenticate(None, username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+            finally:
+                connection.close()
+
+        self.report(f"login ({settings.PASSWORD_HASHING_PROFILE})", self.run(login, count, concurrency))
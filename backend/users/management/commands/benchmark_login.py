@@ -0,0 +1,48 @@
+import statistics
+import time
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BENCHMARK_USERNAME = 'benchmark-login'
+BENCHMARK_PASSWORD = 'Benchmark-Login-2025'
+
+
+class Command(BaseCommand):
+    help = 'Measures login throughput and hit/miss timing of the configured authentication backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Number of logins per scenario')
+
+    def run(self, username, password, count):
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                started = time.perf_counter()
+                authenticate(None, username=username, password=password)
+                samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples), sum(samples), len(queries) / count
+
+    def handle(self, *args, **options):
+        user, created = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'email': f'{BENCHMARK_USERNAME}@etu.univh2c.ma'}
+        )
+        if created or not user.check_password(BENCHMARK_PASSWORD):
+            user.set_password(BENCHMARK_PASSWORD)
+            user.save()
+
+        count = options['logins']
+        scenarios = [
+            ('username hit', user.username, BENCHMARK_PASSWORD),
+            ('email hit (mixed case)', user.email.upper(), BENCHMARK_PASSWORD),
+            ('wrong password', user.username, 'wrong-password'),
+            ('unknown user', 'nobody@etu.univh2c.ma', BENCHMARK_PASSWORD),
+        ]
+        for label, username, password in scenarios:
+            median, total, queries = self.run(username, password, count)
+            self.stdout.write(
+                f"{label:<24} median {median:8.2f} ms   {count / (total / 1000):7.1f} logins/s   {queries:.1f} queries/login"
+            )
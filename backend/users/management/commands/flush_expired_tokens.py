@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding and blacklisted tokens in batches (schedule it, e.g. hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of tokens deleted per batch')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        now = aware_utcnow()
+        batch_size = options['batch_size']
+        deleted = 0
+
+        while True:
+            # Expired tokens are the oldest ones: walking the primary key stops early
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"{deleted} expired tokens deleted"))
@@ -0,0 +1,62 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import FileField
+from users.storage import ContentHashedStorage, is_hashed_name, is_referenced
+
+
+class Command(BaseCommand):
+    help = 'Moves existing uploads of content-hashed fields to their hashed names, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of files rewritten in parallel')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files to rewrite')
+
+    def jobs(self):
+        """One job per distinct file name: rows sharing a file are rewritten together"""
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, FileField) or not isinstance(field.storage, ContentHashedStorage):
+                    continue
+                names = model.objects.exclude(**{field.name: ''}).exclude(
+                    **{f"{field.name}__isnull": True}
+                ).values_list(field.name, flat=True).distinct()
+                for name in names.iterator():
+                    if not is_hashed_name(name):
+                        yield model, field, name
+
+    def rewrite(self, model, field, name):
+        try:
+            storage = field.storage
+            if not storage.exists(name):
+                return 'missing'
+            with storage.open(name) as handle:
+                new_name = storage.save(name, handle)
+            model.objects.filter(**{field.name: name}).update(**{field.name: new_name})
+            if not is_referenced(model, field.name, name):
+                storage.delete(name)
+            return 'rewritten'
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        jobs = list(self.jobs())
+        if options['dry_run']:
+            self.stdout.write(f"{len(jobs)} files to rewrite")
+            return
+
+        stats = Counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [(job, pool.submit(self.rewrite, *job)) for job in jobs]
+            for (model, field, name), future in futures:
+                try:
+                    stats[future.result()] += 1
+                except Exception as exc:
+                    stats['failed'] += 1
+                    self.stdout.write(self.style.WARNING(f"{model._meta.label}.{field.name} {name}: {exc}"))
+
+        if stats['missing']:
+            self.stdout.write(self.style.WARNING(f"{stats['missing']} files referenced in the database are missing"))
+        self.stdout.write(self.style.SUCCESS(f"{stats['rewritten']} files rewritten, {stats['failed']} failed"))
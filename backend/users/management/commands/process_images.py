@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from users.images import RenditionsMixin, WORKERS, process_image
+
+
+class Command(BaseCommand):
+    help = 'Renders the missing renditions of stored images (profile pictures, course images)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every image, not only those without renditions')
+        parser.add_argument('--workers', type=int, default=WORKERS, help='Number of images rendered in parallel')
+
+    def jobs(self, rerender):
+        for model in apps.get_models():
+            if not issubclass(model, RenditionsMixin):
+                continue
+            for field_name, (renditions_field, kind) in model.RENDITION_FIELDS.items():
+                queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f"{field_name}__isnull": True})
+                if not rerender:
+                    queryset = queryset.filter(**{renditions_field: {}})
+                for pk in queryset.values_list('pk', flat=True).iterator():
+                    yield model._meta.label, pk, field_name
+
+    def handle(self, *args, **options):
+        jobs = list(self.jobs(options['all']))
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [(job, pool.submit(process_image, *job)) for job in jobs]
+            for job, future in futures:
+                try:
+                    future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{job[0]} #{job[1]} {job[2]}: {exc}"))
+
+        self.stdout.write(self.style.SUCCESS(f"{len(jobs) - failed} images rendered, {failed} failed"))
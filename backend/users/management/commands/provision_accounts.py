@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from users.accounts import DEFAULT_BATCH_SIZE, provision_accounts, read_accounts
+
+
+class Command(BaseCommand):
+    help = 'Creates the accounts of an intake year from a CSV file (username,email[,first_name,last_name])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='CSV file with one account per line')
+        parser.add_argument(
+            '--initial-password', type=str, default=None,
+            help='Password given to every new account (default: unusable password, activated by password reset)'
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Number of accounts created per batch')
+
+    def handle(self, *args, **options):
+        # The file is streamed: memory only depends on --batch-size
+        with open(options['csv_file'], newline='', encoding='utf-8-sig') as handle:
+            stats = provision_accounts(
+                read_accounts(handle),
+                password=options['initial_password'],
+                batch_size=options['batch_size'],
+            )
+
+        if stats['skipped']:
+            self.stdout.write(self.style.WARNING(f"{stats['skipped']} rows skipped (username or email already taken)"))
+        self.stdout.write(self.style.SUCCESS(f"{stats['created']} accounts created from {stats['rows']} rows"))
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_remove_profile_avatar_alter_profile_bio_and_more'),
+    ]
+
+    # auth.User belongs to another app: the normalized email index is created in SQL
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX users_auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX users_auth_user_email_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+SETTINGS_MODELS = ('Profile', 'UserPreference', 'UserNotificationSetting', 'UserPrivacySetting')
+BATCH_SIZE = 1000
+
+
+def backfill_settings_rows(apps, schema_editor):
+    """Create the settings rows that used to be created lazily on first access"""
+    User = apps.get_model('auth', 'User')
+    for model_name in SETTINGS_MODELS:
+        model = apps.get_model('users', model_name)
+        missing = User.objects.exclude(
+            id__in=model.objects.values('user_id')
+        ).values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE)
+        model.objects.bulk_create(
+            (model(user_id=user_id) for user_id in missing),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_auth_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_settings_rows, migrations.RunPython.noop),
+    ]
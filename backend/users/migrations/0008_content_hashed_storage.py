@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:17
+
+import django.core.validators
+import users.images
+import users.models
+import users.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.content_hashed_storage, upload_to=users.models.user_profile_picture_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']), users.images.validate_image_upload]),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_username_index(apps, schema_editor):
+    # Case-insensitive prefix search on usernames (admin search, autocomplete).
+    # SQLite: LIKE 'x%' can only use an index built with the NOCASE collation.
+    # PostgreSQL: istartswith compares UPPER(username::text) with LIKE, which
+    # needs an expression index with text_pattern_ops.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        expression = 'username COLLATE NOCASE'
+    elif vendor == 'postgresql':
+        expression = '(UPPER(username::text)) text_pattern_ops'
+    else:
+        return
+    schema_editor.execute(f'CREATE INDEX users_auth_user_username_nocase_idx ON auth_user ({expression})')
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP INDEX IF EXISTS users_auth_user_username_nocase_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0008_content_hashed_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_auth_user_username_nocase_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='password_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
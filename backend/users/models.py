@@ -1,24 +1,20 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 import os
 from django.core.validators import FileExtensionValidator
+from .cache import invalidate_cached_user
+from .images import RenditionsMixin, validate_image_upload
+from .storage import content_hashed_storage
 
 def user_profile_picture_path(instance, filename):
-    # Get file extension
-    ext = filename.split('.')[-1]
-    # If user has a profile picture, use their first name initial
-    if instance.user.first_name:
-        filename = f"{instance.user.first_name[0].lower()}.{ext}"
-    else:
-        # If no first name, use username initial
-        filename = f"{instance.user.username[0].lower()}.{ext}"
+    # The storage renames the file after its content hash (see users.storage)
     return os.path.join('profile_pictures', filename)
 
-class Profile(models.Model):
+class Profile(RenditionsMixin, models.Model):
     LANGUAGE_CHOICES = (
         ('en', 'English'),
         ('fr', 'Français'),
@@ -29,12 +25,15 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     profile_picture = models.ImageField(
         upload_to=user_profile_picture_path,
+        storage=content_hashed_storage,
         null=True,
         blank=True,
         validators=[
             FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']),
+            validate_image_upload,
         ]
     )
+    picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True, null=True)
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES, default='en')
     dark_mode = models.BooleanField(default=False)
@@ -42,35 +41,15 @@ class Profile(models.Model):
     address = models.CharField(max_length=255, blank=True)
     phone = models.CharField(max_length=20, blank=True)
     birthdate = models.DateField(null=True, blank=True)
+    # Tokens issued for a login before this instant are rejected (see users.authentication)
+    password_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Renditions are rendered and replaced files deleted in the background (see users.images)
+    RENDITION_FIELDS = {'profile_picture': ('picture_renditions', 'avatar')}
 
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-    def save(self, *args, **kwargs):
-        # Delete old profile picture if it exists and a new one is being uploaded
-        if self.pk:
-            try:
-                old_profile = Profile.objects.get(pk=self.pk)
-                if old_profile.profile_picture and self.profile_picture and old_profile.profile_picture != self.profile_picture:
-                    old_profile.profile_picture.delete(save=False)
-            except Profile.DoesNotExist:
-                pass
-        super().save(*args, **kwargs)
-
-# Signal to create a profile automatically for each new user
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
-
-# Signal to create a profile for existing users who don't have one
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        instance.profile
-    except Profile.DoesNotExist:
-        Profile.objects.create(user=instance)
-
 class UserPreference(models.Model):
     LANGUAGE_CHOICES = (
         ('fr', 'Français'),
@@ -119,3 +98,43 @@ class UserPrivacySetting(models.Model):
     
     def __str__(self):
         return f"{self.user.username}'s privacy settings"
+
+SETTINGS_MODELS = (Profile, UserPreference, UserNotificationSetting, UserPrivacySetting)
+
+def create_settings_rows(users, batch_size=None):
+    """Create the profile and settings rows of new users: one bulk INSERT per table"""
+    for model in SETTINGS_MODELS:
+        model.objects.bulk_create(
+            [model(user=user) for user in users], batch_size=batch_size, ignore_conflicts=True
+        )
+        # ignore_conflicts returns no primary keys: drop the unsaved rows cached on
+        # each user so that user.profile and friends are loaded from the database
+        relation = model._meta.get_field('user').remote_field
+        for user in users:
+            if relation.is_cached(user):
+                relation.delete_cached_value(user)
+
+# Settings rows are created together with the user (in the same transaction
+# when the caller uses one); ordinary User saves return immediately.
+# bulk_create does not send post_save: bulk callers use create_settings_rows.
+@receiver(post_save, sender=User)
+def create_user_settings(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        create_settings_rows([instance])
+
+# Drop the cached authentication user when the user or its cached relations
+# change or go away. The entry is dropped once the transaction commits: dropped
+# earlier, a concurrent request could cache the old rows again until timeout.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+def invalidate_user_cache_for_settings(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
@@ -3,6 +3,16 @@ from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from .models import Profile, UserPreference, UserNotificationSetting, UserPrivacySetting
 from django.core.validators import FileExtensionValidator
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer, TokenBlacklistSerializer
+)
+from django.db import transaction
+from django.db.models.functions import Lower
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import check_password_unchanged, token_auth_time
+from .tokens import CachedRefreshToken
+from .backends import normalize_email
+from .images import validate_image_upload
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -26,8 +36,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         if User.objects.filter(username=attrs['username']).exists():
             raise serializers.ValidationError({"username": "Username is already taken."})
         
-        # Check if email exists
-        if User.objects.filter(email=attrs['email']).exists():
+        # Check if email exists (case-insensitive, uses the LOWER(email) index)
+        attrs['email'] = normalize_email(attrs['email'])
+        if User.objects.annotate(email_key=Lower('email')).filter(email_key=attrs['email']).exists():
             raise serializers.ValidationError({"email": "Email is already registered."})
         
         # Validate email domain
@@ -39,27 +50,52 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password2')
         password = validated_data.pop('password')
-        user = User.objects.create(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            first_name=validated_data['username'],  # Set first_name to username
-            last_name=''  # Set last_name to empty string
-        )
-        user.set_password(password)
-        user.save()
+        # create_user hashes the password before the INSERT: a single write.
+        # The profile and settings rows are bulk-inserted by the post_save
+        # receiver inside the same transaction.
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=validated_data['username'],
+                email=validated_data['email'],
+                password=password,
+                first_name=validated_data['username'],  # Set first_name to username
+                last_name=''  # Set last_name to empty string
+            )
         return user
 
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    Rendition URLs of an image field ({size: {webp, jpg, width, height}}),
+    empty until the background worker has rendered the current file.
+    """
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+        urls = {}
+        for size, entry in (value or {}).items():
+            urls[size] = dict(entry)
+            for ext in ('webp', 'jpg'):
+                url = storage.url(entry[ext])
+                urls[size][ext] = request.build_absolute_uri(url) if request else url
+        return urls
+
 class ProfileSerializer(serializers.ModelSerializer):
     profile_picture = serializers.ImageField(
         required=False,
         validators=[
             FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']),
+            validate_image_upload,
         ]
     )
+    picture_renditions = RenditionsField('profile_picture')
 
     class Meta:
         model = Profile
-        fields = ('profile_picture', 'language', 'dark_mode')
+        fields = ('profile_picture', 'picture_renditions', 'language', 'dark_mode')
 
 class UserProfileSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(required=False)
@@ -73,10 +109,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', None)
         
-        # Update user fields
+        # Update user fields: only those sent, so that a cached copy of the
+        # user never writes back stale columns (password, is_active, ...)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
         
         if profile_data:
             # Ensure the user has a profile
@@ -84,6 +122,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             for attr, value in profile_data.items():
                 setattr(profile, attr, value)
             profile.save()
+            instance.profile = profile  # The response shows the updated profile
         return instance
 
 class UserPreferenceSerializer(serializers.ModelSerializer):
@@ -101,6 +140,43 @@ class UserPrivacySettingSerializer(serializers.ModelSerializer):
         model = UserPrivacySetting
         exclude = ('user',)
 
+class MeSerializer(serializers.ModelSerializer):
+    """
+    The user with its profile and settings. Nested objects are updated
+    partially: a PATCH only needs the fields that change.
+    """
+    profile = ProfileSerializer(required=False)
+    preferences = UserPreferenceSerializer(required=False)
+    notifications = UserNotificationSettingSerializer(source='notification_settings', required=False)
+    privacy = UserPrivacySettingSerializer(source='privacy_settings', required=False)
+
+    NESTED = ('profile', 'preferences', 'notification_settings', 'privacy_settings')
+
+    class Meta:
+        model = User
+        fields = (
+            'id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser',
+            'profile', 'preferences', 'notifications', 'privacy',
+        )
+        read_only_fields = ('username', 'email', 'is_staff', 'is_superuser')
+
+    def update(self, instance, validated_data):
+        nested = {name: validated_data.pop(name, None) for name in self.NESTED}
+
+        with transaction.atomic():
+            if validated_data:
+                for attr, value in validated_data.items():
+                    setattr(instance, attr, value)
+                instance.save(update_fields=list(validated_data))
+            for name, data in nested.items():
+                if not data:
+                    continue
+                related = getattr(instance, name)
+                for attr, value in data.items():
+                    setattr(related, attr, value)
+                related.save(update_fields=list(data))
+        return instance
+
 class ChangePasswordSerializer(serializers.Serializer):
     current_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True, validators=[validate_password])
@@ -117,3 +193,22 @@ class ChangePasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError({"confirm_password": "Password fields didn't match."})
             
         return attrs
+
+# Token serializers using the cache-backed blacklist (see SIMPLE_JWT settings)
+class CachedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = CachedRefreshToken
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedRefreshToken
+
+    def validate(self, attrs):
+        # Refresh tokens from a login older than the last password change are not rotated
+        refresh = self.token_class(attrs['refresh'])
+        password_changed_at = Profile.objects.filter(
+            user_id=refresh.payload.get(api_settings.USER_ID_CLAIM)
+        ).values_list('password_changed_at', flat=True).first()
+        check_password_unchanged(password_changed_at, token_auth_time(refresh.payload))
+        return super().validate(attrs)
+
+class CachedTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = CachedRefreshToken
@@ -0,0 +1,122 @@
+"""
+Content-addressed storage for uploaded media.
+
+Files are stored under <upload prefix>/<ab>/<cd>/<hash>.<ext>, where the
+hash is computed from the content: names never collide, never change once
+written and can be cached forever. Uploading identical content twice stores
+a single file, so a file is only deleted once no row references it.
+
+Saving content that is already stored refreshes the file's modification
+time, and deletions first move files aside: an identical upload running
+concurrently with a deletion either marks the file before it is moved (the
+deletion then puts it back) or writes it again after.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.views.static import serve
+
+HASH_LENGTH = 32
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{%d}(\.\w+)?$' % HASH_LENGTH)
+IMMUTABLE_MAX_AGE = getattr(settings, 'MEDIA_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60)
+# Upload prefixes served by serve_media (profile pictures, course images and their renditions)
+PUBLIC_PREFIXES = tuple(getattr(settings, 'MEDIA_PUBLIC_PREFIXES', (
+    'profile_pictures/', 'courses/', 'renditions/profile_pictures/', 'renditions/courses/',
+)))
+# Files saved again less than this many seconds before a deletion was requested are kept
+REUSE_GRACE = getattr(settings, 'MEDIA_REUSE_GRACE', 10)
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def is_hashed_name(name):
+    return bool(name and HASHED_NAME.search(name))
+
+
+def hashed_name(name, digest):
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest[2:4], f"{digest}{extension}")
+
+
+class ContentHashedStorage(FileSystemStorage):
+    """Stores files under their content hash; the upload_to prefix is kept as the top directory"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = hashed_name(name, content_hash(content))
+        try:
+            # Same content already stored: mark it as reused for a concurrent discard()
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            return super().save(name, content, max_length=max_length)
+
+    def discard(self, names, in_use, since):
+        """
+        Deletes stored files unless in_use() is true or one of them was saved
+        again after since (a timestamp, minus REUSE_GRACE). Returns whether
+        the files were deleted.
+        """
+        moved = []
+        for name in filter(None, names):
+            path = self.path(name)
+            aside = f"{path}.{uuid.uuid4().hex}.deleted"
+            try:
+                os.rename(path, aside)
+            except FileNotFoundError:
+                continue
+            moved.append((path, aside))
+
+        keep = any(os.stat(aside).st_mtime >= since - REUSE_GRACE for _, aside in moved) or in_use()
+        for path, aside in moved:
+            if keep:
+                os.replace(aside, path)
+            else:
+                os.remove(aside)
+        return not keep
+
+
+_storage = None
+
+
+def content_hashed_storage():
+    """Storage callable for model fields (keeps the storage out of migrations)"""
+    global _storage
+    if _storage is None:
+        _storage = ContentHashedStorage()
+    return _storage
+
+
+def is_referenced(model, field_name, name, exclude_pk=None):
+    """Whether a row other than exclude_pk still points at a stored file"""
+    rows = model.objects.filter(**{field_name: name})
+    if exclude_pk is not None:
+        rows = rows.exclude(pk=exclude_pk)
+    return rows.exists()
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    django.views.static.serve with far-future caching of content-hashed
+    files, limited to the public upload prefixes: lesson attachments and
+    certificates are only served through signed URLs (courses.media).
+    """
+    if not posixpath.normpath(path).lstrip('/').startswith(PUBLIC_PREFIXES):
+        raise Http404("Not a public upload")
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_hashed_name(path):
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
@@ -1,3 +1,350 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .authentication import CachedJWTAuthentication
+from . import images
+from .accounts import provision_accounts, read_accounts
+from .cache import user_cache_key
+from .hashers import TunedPBKDF2PasswordHasher
+from .models import SETTINGS_MODELS, Profile, UserPreference
+from .storage import serve_media
+from .tokens import CachedRefreshToken
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TokenRevocationTests(TestCase):
+    """Tokens stop working after a password change, but not after a rehash at login"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+
+    def login(self, password='password'):
+        response = APIClient().post(
+            reverse('token_obtain_pair'), {'username': 'student', 'password': password}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_me(self, tokens):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return client.get(reverse('me'))
+
+    def test_rehash_at_login_keeps_other_devices_logged_in(self):
+        first = self.login()
+        old_hash = User.objects.get(pk=self.user.pk).password
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.ScryptPasswordHasher'] + FAST_HASHERS):
+            self.login()
+        self.assertNotEqual(User.objects.get(pk=self.user.pk).password, old_hash)
+        self.assertEqual(self.get_me(first).status_code, 200)
+
+    def test_password_change_revokes_earlier_tokens(self):
+        tokens = self.login()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = client.post(reverse('change-password'), {
+            'current_password': 'password', 'new_password': 'n3w-Passw0rd!', 'confirm_password': 'n3w-Passw0rd!'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get_me(tokens).status_code, 401)
+        refresh = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refresh.status_code, 401)
+        self.assertEqual(self.get_me(self.login('n3w-Passw0rd!')).status_code, 200)
+
+
+class ServeMediaTests(SimpleTestCase):
+    """Only public upload prefixes are served by the media route"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        for name in ('profile_pictures/ab/cd/' + 'a' * 32 + '.png', 'lessons/ab/cd/' + 'b' * 32 + '.pdf'):
+            path = os.path.join(self.root.name, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as handle:
+                handle.write(b'data')
+
+    def serve(self, path):
+        return serve_media(RequestFactory().get('/media/' + path), path, document_root=self.root.name)
+
+    def test_profile_pictures_are_served_with_immutable_caching(self):
+        response = self.serve('profile_pictures/ab/cd/' + 'a' * 32 + '.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_lesson_attachments_are_refused(self):
+        for path in ('lessons/ab/cd/' + 'b' * 32 + '.pdf', 'profile_pictures/../lessons/ab/cd/' + 'b' * 32 + '.pdf'):
+            with self.assertRaises(Http404):
+                self.serve(path)
+
+
+class UserCacheInvalidationTests(TestCase):
+    """The cached authentication user is dropped once user or settings changes commit"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.key = user_cache_key(self.user.pk)
+
+    def assertDroppedOnCommit(self, change):
+        cache.set(self.key, self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            change()
+        self.assertIsNotNone(cache.get(self.key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(self.key))
+
+    def test_saves_drop_the_entry_on_commit(self):
+        # The settings rows created with the user are loaded from the database, not a pk-less copy
+        self.user.profile.bio = 'Bio'
+        self.assertDroppedOnCommit(self.user.profile.save)
+        self.user.preferences.theme = 'dark'
+        self.assertDroppedOnCommit(self.user.preferences.save)
+        self.assertDroppedOnCommit(self.user.save)
+
+    def test_deletes_drop_the_entry_on_commit(self):
+        self.assertDroppedOnCommit(UserPreference.objects.get(user=self.user).delete)
+        self.assertDroppedOnCommit(self.user.delete)
+
+
+class CachedAuthenticationTests(TestCase):
+    """JWT users are resolved from the shared cache, together with their profile and preferences"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.auth = CachedJWTAuthentication()
+        self.token = self.auth.get_validated_token(str(CachedRefreshToken.for_user(self.user).access_token))
+
+    def shared_cache(self, shared=True):
+        return mock.patch('users.authentication.cache_is_shared', return_value=shared)
+
+    def test_cached_user_needs_no_query_until_a_change_commits(self):
+        with self.shared_cache():
+            with self.assertNumQueries(1):
+                self.auth.get_user(self.token)
+            with self.assertNumQueries(0):
+                user = self.auth.get_user(self.token)
+                self.assertEqual((user.profile.user_id, user.preferences.user_id), (self.user.pk, self.user.pk))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Profile.objects.get(user=self.user).save()
+            with self.assertNumQueries(1):
+                self.auth.get_user(self.token)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.get_user(self.token)
+
+    def test_per_process_cache_is_not_used(self):
+        with self.shared_cache(False):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    self.auth.get_user(self.token)
+
+
+class TokenBlacklistTests(TestCase):
+    """Refresh token blacklist checks served from the cache, with the database as fallback"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.refresh = str(CachedRefreshToken.for_user(self.user))
+
+    def post(self, name, refresh):
+        return APIClient().post(reverse(name), {'refresh': refresh}, format='json')
+
+    def test_rotated_token_is_rejected_from_the_cache_and_after_eviction(self):
+        response = self.post('token_refresh', self.refresh)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post('token_refresh', self.refresh).status_code, 401)
+        cache.clear()
+        self.assertEqual(self.post('token_refresh', self.refresh).status_code, 401)
+        self.assertEqual(self.post('token_refresh', response.json()['refresh']).status_code, 200)
+
+    def test_logout_blacklists_once(self):
+        self.assertEqual(self.post('token_blacklist', self.refresh).status_code, 200)
+        self.assertEqual(self.post('token_blacklist', self.refresh).status_code, 401)
+        self.assertEqual(BlacklistedToken.objects.filter(token__jti=CachedRefreshToken(self.refresh, verify=False)['jti']).count(), 1)
+
+    def test_expired_tokens_are_flushed_in_batches(self):
+        self.post('token_blacklist', self.refresh)
+        for _ in range(2):
+            CachedRefreshToken.for_user(self.user)
+        OutstandingToken.objects.update(expires_at=timezone.now())
+        CachedRefreshToken.for_user(self.user)
+
+        call_command('flush_expired_tokens', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class UsernameOrEmailBackendTests(TestCase):
+    """Login with the username or the email address, in a single query"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'Student@Example.com', 'password')
+
+    def test_username_or_case_insensitive_email_in_one_query(self):
+        for identifier in ('student', 'student@example.com', ' STUDENT@example.COM '):
+            with self.assertNumQueries(1):
+                self.assertEqual(authenticate(username=identifier, password='password'), self.user)
+        self.assertIsNone(authenticate(username='student', password='wrong'))
+
+    def test_ambiguous_emails_and_misses_still_hash_the_password(self):
+        User.objects.create_user('other', 'student@example.com', 'password')
+        with mock.patch.object(User, 'set_password') as set_password:
+            self.assertIsNone(authenticate(username='student@example.com', password='password'))
+            self.assertIsNone(authenticate(username='nobody', password='password'))
+        self.assertEqual(set_password.call_count, 2)
+        self.assertEqual(authenticate(username='other', password='password').username, 'other')
+
+
+@override_settings(PASSWORD_HASHERS=['users.hashers.TunedPBKDF2PasswordHasher'])
+class PasswordHashingProfileTests(TestCase):
+    """A changed hashing cost is applied to each password at its next login"""
+
+    def hash_iterations(self):
+        return int(User.objects.get(username='student').password.split('$')[1])
+
+    def test_login_rehashes_with_the_new_cost(self):
+        with mock.patch.object(TunedPBKDF2PasswordHasher, 'iterations', 1000):
+            User.objects.create_user('student', 'student@example.com', 'password')
+        self.assertEqual(self.hash_iterations(), 1000)
+        self.assertTrue(User.objects.get(username='student').password.startswith('pbkdf2_sha256$'))
+
+        with mock.patch.object(TunedPBKDF2PasswordHasher, 'iterations', 2000):
+            self.assertIsNotNone(authenticate(username='student', password='password'))
+        self.assertEqual(self.hash_iterations(), 2000)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AccountProvisioningTests(TestCase):
+    """Bulk provisioning creates every account row in a few queries per batch"""
+
+    def test_new_accounts_get_every_settings_row_and_existing_ones_are_skipped(self):
+        User.objects.create_user('taken', 'taken@example.com', 'password')
+        lines = io.StringIO(
+            'username,email,first_name,last_name\n'
+            'amina,Amina@Example.com,Amina,Alaoui\n'
+            'taken,new@example.com\n'
+            'other,TAKEN@example.com\n'
+            'amina2,amina@example.com\n'
+            'youssef,youssef@example.com\n'
+        )
+        stats = provision_accounts(read_accounts(lines), password='password', batch_size=2)
+
+        self.assertEqual((stats['rows'], stats['created'], stats['skipped']), (5, 2, 3))
+        users = User.objects.filter(username__in=['amina', 'youssef'])
+        self.assertEqual(users.get(username='amina').email, 'amina@example.com')
+        for model in SETTINGS_MODELS:
+            self.assertEqual(model.objects.filter(user__in=users).count(), 2, model.__name__)
+        self.assertEqual(authenticate(username='youssef', password='password').username, 'youssef')
+
+
+class MeViewTests(TestCase):
+    """Combined settings endpoint: one query for the read, ETag and If-Match"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_get_reads_everything_in_one_query_and_honours_if_none_match(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('me'))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({'profile', 'preferences', 'notifications', 'privacy'}, set(response.json()))
+        response = self.client.get(reverse('me'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_patch_with_a_stale_etag_is_refused(self):
+        etag = self.client.get(reverse('me'))['ETag']
+        response = self.client.patch(
+            reverse('me'), {'first_name': 'Amina', 'preferences': {'theme': 'dark'}}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['first_name'], response.json()['preferences']['theme']), ('Amina', 'dark'))
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(UserPreference.objects.get(user=self.user).theme, 'dark')
+
+        response = self.client.patch(reverse('me'), {'last_name': 'Alaoui'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(User.objects.get(pk=self.user.pk).last_name, '')
+
+
+def image_upload(name, size, image_format='PNG', color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImagePipelineTests(TestCase):
+    """Uploads are validated in the request and rendered after commit in the worker pool"""
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media = override_settings(MEDIA_ROOT=root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.profile = Profile.objects.get(user=User.objects.create_user('student', 'student@example.com', 'password'))
+        self.storage = Profile._meta.get_field('profile_picture').storage
+
+    def test_only_reasonable_images_are_accepted(self):
+        images.validate_image_upload(image_upload('a.png', (10, 10)))
+        for upload in (image_upload('a.gif', (10, 10), 'GIF'), SimpleUploadedFile('a.png', b'not an image')):
+            with self.assertRaises(ValidationError):
+                images.validate_image_upload(upload)
+        with mock.patch.object(images, 'MAX_PIXELS', 99):
+            with self.assertRaises(ValidationError):
+                images.validate_image_upload(image_upload('a.png', (10, 10)))
+
+    def test_renditions_are_rendered_in_the_background_and_replaced_files_deleted(self):
+        with mock.patch.object(images, 'submit') as submit:
+            self.profile.profile_picture = image_upload('me.png', (600, 400))
+            self.profile.save()
+        self.assertEqual(self.profile.picture_renditions, {})
+        submit.assert_called_once_with(images.process_image, 'users.Profile', self.profile.pk, 'profile_picture')
+
+        images.process_image('users.Profile', self.profile.pk, 'profile_picture')
+        renditions = Profile.objects.get(pk=self.profile.pk).picture_renditions
+        self.assertEqual([(entry['width'], entry['height']) for entry in renditions.values()], [(48, 48), (96, 96), (256, 256)])
+        old_names = [self.profile.profile_picture.name, *images.rendition_names(renditions)]
+        self.assertTrue(all(self.storage.exists(name) for name in old_names))
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        with mock.patch.object(images, 'submit') as submit:
+            profile.profile_picture = image_upload('new.png', (600, 400), color='blue')
+            profile.save()
+        (delete_call, _) = submit.call_args_list
+        self.assertEqual(delete_call.args[:4], (images.delete_unreferenced, 'users.Profile', 'profile_picture', old_names))
+        # Past the reuse grace period, nothing else references the old file
+        images.delete_unreferenced('users.Profile', 'profile_picture', old_names, delete_call.args[4] + 60)
+        self.assertFalse(any(self.storage.exists(name) for name in old_names))
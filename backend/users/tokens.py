@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .authentication import AUTH_TIME_CLAIM
+from .cache import cache_is_shared
+
+TOKEN_OK = 'ok'
+TOKEN_BLACKLISTED = 'blacklisted'
+
+
+def blacklist_cache_key(jti):
+    return f"jwt-blacklist:{jti}"
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    RefreshToken whose blacklist state is kept in the cache until the token
+    expires, so rotation does not query the blacklist tables on every refresh.
+
+    Every blacklist write goes through this class and overwrites the cache
+    entry, while "not blacklisted" entries are only ever added (cache.add):
+    a concurrent check can never hide a blacklisting. "Not blacklisted" is
+    only cached when the cache is shared by every worker; with a per-process
+    cache, a worker could not see a blacklisting done by another one, so only
+    the (final) blacklisted state is cached. When the entry is missing
+    (eviction, restart), the indexed database lookup is used.
+    """
+
+    def _cache_timeout(self):
+        remaining = datetime_from_epoch(self.payload['exp']) - aware_utcnow()
+        return max(int(remaining.total_seconds()), 1)
+
+    def _cache_ok(self):
+        if cache_is_shared():
+            cache.add(blacklist_cache_key(self.payload[api_settings.JTI_CLAIM]), TOKEN_OK, self._cache_timeout())
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        key = blacklist_cache_key(jti)
+        state = cache.get(key)
+        if state is None:
+            if not BlacklistedToken.objects.filter(token__jti=jti).exists():
+                self._cache_ok()
+                return
+            state = TOKEN_BLACKLISTED
+            cache.set(key, state, self._cache_timeout())
+        if state == TOKEN_BLACKLISTED:
+            raise TokenError("Token is blacklisted")
+
+    def outstand(self):
+        # Called for freshly rotated tokens: the jti is new, no lookup needed
+        token = OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+        self._cache_ok()
+        return token
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        token_id = OutstandingToken.objects.filter(jti=jti).values_list('id', flat=True).first()
+        if token_id is None:
+            token_id = OutstandingToken.objects.create(
+                user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+                jti=jti,
+                token=str(self),
+                created_at=self.current_time,
+                expires_at=datetime_from_epoch(self.payload['exp']),
+            ).id
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=token_id)], ignore_conflicts=True
+        )
+        cache.set(blacklist_cache_key(jti), TOKEN_BLACKLISTED, self._cache_timeout())
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # Kept through rotation (set_iat only resets iat): compared with password changes.
+        # Sub-second precision, unlike iat: a login right after a change stays valid
+        token[AUTH_TIME_CLAIM] = token.current_time.timestamp()
+        token._cache_ok()
+        return token
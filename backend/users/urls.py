@@ -14,5 +14,6 @@ urlpatterns = [
     path('preferences/', views.UserPreferencesView.as_view(), name='preferences'),
     path('notifications/', views.UserNotificationsView.as_view(), name='notifications'),
     path('privacy/', views.UserPrivacyView.as_view(), name='privacy'),
+    path('me/', views.MeView.as_view(), name='me'),
     path('password/change/', views.ChangePasswordView.as_view(), name='change-password'),
 ]
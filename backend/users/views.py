@@ -2,13 +2,21 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import RegisterSerializer, UserProfileSerializer, ChangePasswordSerializer
+from .serializers import RegisterSerializer, UserProfileSerializer, ChangePasswordSerializer, MeSerializer
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
 from rest_framework import permissions
 from django.contrib.auth import update_session_auth_hash
 from .models import Profile, UserPreference, UserNotificationSetting, UserPrivacySetting
+import hashlib
+import json
 import logging
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import quote_etag
+from .cache import invalidate_cached_user
+from .models import create_settings_rows
 from rest_framework import generics
 from .serializers import (
     UserPreferenceSerializer, 
@@ -39,11 +47,10 @@ class UserProfileView(APIView):
         data = request.data.copy()
         
         # Handle profile picture upload
+        # (the previous picture and its renditions are deleted in the background)
         if 'profile[profile_picture]' in request.FILES:
-            profile = user.profile
-            # Delete old profile picture if it exists
-            if profile.profile_picture:
-                profile.profile_picture.delete()
+            # A plain dict: nested data in a QueryDict is parsed as form input and dropped
+            data = data.dict()
             data['profile'] = {
                 'profile_picture': request.FILES['profile[profile_picture]']
             }
@@ -139,8 +146,62 @@ class ChangePasswordView(APIView):
         serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = request.user
-            user.set_password(serializer.validated_data['new_password'])
-            user.save()
+            with transaction.atomic():
+                user.set_password(serializer.validated_data['new_password'])
+                user.save(update_fields=['password'])
+                # Revokes the tokens of every earlier login (a rehash at login does not)
+                Profile.objects.filter(user=user).update(password_changed_at=timezone.now())
+            invalidate_cached_user(user.pk)
             return Response({"message": "Password changed successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+class MeView(APIView):
+    """
+    The user, profile, preferences, notification and privacy settings in one
+    response, read with a single select_related query. GET honours
+    If-None-Match (304) and PATCH honours If-Match (412 on a stale ETag).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    RELATED = ('profile', 'preferences', 'notification_settings', 'privacy_settings')
+
+    def get_user(self, request):
+        user = User.objects.select_related(*self.RELATED).get(pk=request.user.pk)
+        if not all(hasattr(user, name) for name in self.RELATED):
+            # Accounts loaded from raw fixtures may miss some settings rows
+            create_settings_rows([user])
+            user = User.objects.select_related(*self.RELATED).get(pk=user.pk)
+        return user
+
+    def etag(self, data):
+        payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        return quote_etag(hashlib.md5(payload).hexdigest())
+
+    def respond(self, data, status_code=status.HTTP_200_OK):
+        response = Response(data, status=status_code)
+        response['ETag'] = self.etag(data)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def get(self, request):
+        data = MeSerializer(self.get_user(request), context={'request': request}).data
+        etag = self.etag(data)
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return self.respond(data)
+
+    def patch(self, request):
+        with transaction.atomic():
+            user = self.get_user(request)
+            serializer = MeSerializer(user, data=request.data, partial=True, context={'request': request})
+            if_match = request.headers.get('If-Match')
+            if if_match and if_match != self.etag(serializer.to_representation(user)):
+                return Response(
+                    {"detail": "The settings were changed elsewhere, reload them first."},
+                    status=status.HTTP_412_PRECONDITION_FAILED
+                )
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save()
+        return self.respond(serializer.data)